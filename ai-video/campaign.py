@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""Run an image campaign: prompts x models x aspect ratios x seeds from a JSON file.
+
+Usage:
+    python3 ai-video/campaign.py ai-video/campaigns/hooks-todolist.json
+    python3 ai-video/campaign.py ai-video/campaigns/hooks-concurso-v17abc.json --dry-run
+    python3 ai-video/campaign.py my-sweep.json --only 17a 17b --seeds 1 2 3 --imagen-workers 8
+
+Campaign file:
+    {
+      "name": "hooks-todolist",
+      "outdir": "content/hooks-todolist",          # relative to ai-video/ (or --outdir)
+      "output": "hook_{key}_{model}.png",          # fields: key, model (tag), aspect (16x9), seed, n
+                                                   # (without {seed}/{n}: _s<seed> / _v<n> when used)
+      "models": [
+        {"tag": "gemini", "model": "gemini-2.5-flash-image"},
+        {"tag": "imagen", "model": "imagen-4.0-generate-001", "person_generation": "allow_all"}
+      ],
+      "aspect_ratios": ["16:9"],                   # default ["16:9"]
+      "seeds": [null],                             # default [null] (no seed)
+      "variants": 1,                               # samples per prompt/model/aspect/seed (default 1)
+      "lanes": {"imagen": {"workers": 10}},        # optional: workers, max_workers, rpm per lane
+      "prompts": {"01": "prompt", "02": {"prompt": "...", "models": ["imagen"], "seeds": [1, 2]}}
+    }
+
+Each model goes to a lane by API: "native" (generateContent) or "imagen" (predict),
+inferred from the model name unless "api" is set. Optional per model: "modalities"
+(native), "person_generation" (imagen), "timeout". A prompt can narrow "models",
+"aspect_ratios", "seeds" and "variants" for itself.
+
+Imagen variants of the same request are batched: one :predict with sampleCount up to
+--max-samples (API limit 4), each returned image fanned out to its own file. Native
+variants are one request each.
+
+Both lanes run at the same time, each with its own adaptive concurrency (throttle.py),
+so a sweep over both APIs gets their combined throughput. Results already in the
+generation cache (gen_cache.py) are linked without an API call. The manifest goes to
+{outdir}/{name}.manifest.json.
+"""
+import argparse, json, os, sys, time
+
+from gemini_client import IMAGEN_MAX_SAMPLES, GeminiClient, load_api_key
+from throttle import DEFAULT_RETRIES, Limiter, Task, run_tasks
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LANES = ("native", "imagen")
+LANE_DEFAULTS = {"workers": 5, "max_workers": 16, "rpm": None}
+# USD per image (ai.google.dev pricing); unknown models are left out of the estimate
+PRICES = {
+    "gemini-2.5-flash-image": 0.039,
+    "imagen-4.0-fast-generate-001": 0.02,
+    "imagen-4.0-generate-001": 0.04,
+    "imagen-4.0-ultra-generate-001": 0.06,
+}
+
+
+def model_api(spec):
+    return spec.get("api") or ("imagen" if spec["model"].startswith("imagen") else "native")
+
+
+def load_campaign(path):
+    with open(path, encoding="utf-8") as f:
+        campaign = json.load(f)
+    if not isinstance(campaign.get("prompts"), dict) or not campaign["prompts"]:
+        raise ValueError(f"{path}: \"prompts\" must be a non-empty dict {{key: prompt}}")
+    if not campaign.get("models"):
+        raise ValueError(f"{path}: \"models\" must list at least one model")
+    for spec in campaign["models"]:
+        if "model" not in spec:
+            raise ValueError(f"{path}: model entry without \"model\": {spec}")
+        if model_api(spec) not in LANES:
+            raise ValueError(f"{path}: unknown api {spec['api']!r} (use native or imagen)")
+        spec.setdefault("tag", "imagen" if model_api(spec) == "imagen" else "gemini")
+    campaign.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return campaign
+
+
+def expand(campaign, outdir, only=None, seeds=None, variants=None):
+    """Campaign -> [job]. Raises ValueError when two jobs would write the same file."""
+    template = campaign.get("output", "hook_{key}.png")
+    aspects = campaign.get("aspect_ratios", ["16:9"])
+    seeds = seeds or campaign.get("seeds", [None])
+    variants = variants or campaign.get("variants", 1)
+    jobs, outputs = [], {}
+    for key, spec in campaign["prompts"].items():
+        if only and key not in only:
+            continue
+        if isinstance(spec, str):
+            spec = {"prompt": spec}
+        for model in campaign["models"]:
+            if spec.get("models") and model["tag"] not in spec["models"]:
+                continue
+            for aspect in spec.get("aspect_ratios", aspects):
+                for seed in spec.get("seeds", seeds):
+                    count = spec.get("variants", variants)
+                    for variant in range(count):
+                        name = template.format(key=key, model=model["tag"], aspect=aspect.replace(":", "x"),
+                                               seed="" if seed is None else seed, n=variant + 1)
+                        stem, ext = os.path.splitext(name)
+                        if seed is not None and "{seed}" not in template:
+                            stem += f"_s{seed}"
+                        if count > 1 and "{n}" not in template:
+                            stem += f"_v{variant + 1}"
+                        name = stem + ext
+                        if name in outputs:
+                            raise ValueError(f"{name} would be written by {outputs[name]} and {key}/{model['tag']}: "
+                                             f"add {{model}} or {{aspect}} to \"output\" ({template})")
+                        outputs[name] = f"{key}/{model['tag']}"
+                        jobs.append({"id": stem, "key": key, "prompt": spec["prompt"], "lane": model_api(model),
+                                     "model": model, "aspect_ratio": aspect, "seed": seed, "variant": variant,
+                                     "output": os.path.join(outdir, name)})
+    return jobs
+
+
+def batches(jobs, max_samples):
+    """Group Imagen jobs that differ only in variant into [job] lists of up to max_samples."""
+    groups, result = {}, []
+    for job in jobs:
+        if job["lane"] != "imagen":
+            result.append([job])
+            continue
+        signature = (job["prompt"], json.dumps(job["model"], sort_keys=True), job["aspect_ratio"], job["seed"])
+        group = groups.get(signature)
+        if group is None or len(group) >= max_samples:
+            group = groups[signature] = []
+            result.append(group)
+        group.append(job)
+    return result
+
+
+def request(client, job, cached_only=False):
+    model = job["model"]
+    if job["lane"] == "imagen":
+        return client.imagen(job["prompt"], model["model"], job["aspect_ratio"], model.get("person_generation"),
+                             seed=job["seed"], timeout=model.get("timeout"), cached_only=cached_only,
+                             variant=job["variant"])
+    return client.native(job["prompt"], model["model"], job["aspect_ratio"], model.get("modalities", ("IMAGE",)),
+                         seed=job["seed"], timeout=model.get("timeout"), cached_only=cached_only,
+                         variant=job["variant"])
+
+
+def generate(client, jobs):
+    """One request for jobs (a single native job, or an Imagen batch); sets each job's status."""
+    first, model = jobs[0], jobs[0]["model"]
+    if first["lane"] == "imagen":
+        generations = client.imagen_batch(first["prompt"], model["model"], first["aspect_ratio"],
+                                          model.get("person_generation"), [job["variant"] for job in jobs],
+                                          seed=first["seed"], timeout=model.get("timeout"))
+    else:
+        generations = [request(client, first)]
+    ok = 0
+    for job, generation in zip(jobs, generations):
+        job["cache_key"] = generation.key
+        if len(generation):
+            generation.save(0, job["output"])
+            job.update(status="OK", detail=job["output"])
+            ok += 1
+        else:
+            job.update(status="FAIL", detail="no image data in response")
+    if len(jobs) == 1:
+        return first["status"], first["detail"]
+    return ("OK" if ok else "FAIL"), f"{ok}/{len(jobs)} images in one request"
+
+
+def lane_settings(campaign, args):
+    settings = {}
+    for lane in LANES:
+        conf = dict(LANE_DEFAULTS, **campaign.get("lanes", {}).get(lane, {}))
+        for field in ("workers", "max_workers", "rpm"):
+            value = getattr(args, f"{lane}_{field}")
+            if value is not None:
+                conf[field] = value
+        settings[lane] = conf
+    return settings
+
+
+def write_manifest(path, campaign, jobs, limiters, started):
+    entries = []
+    for job in jobs:
+        model = job["model"]
+        entries.append({
+            "id": job["id"], "key": job["key"], "model": model["model"], "tag": model["tag"], "lane": job["lane"],
+            "aspect_ratio": job["aspect_ratio"], "seed": job["seed"], "variant": job["variant"] + 1,
+            "prompt": job["prompt"],
+            "output": os.path.relpath(job["output"], os.path.dirname(path)),
+            "status": job.get("status", "PENDING"), "detail": job.get("detail"),
+            "attempts": job.get("attempts", 0), "cache_key": job.get("cache_key"),
+        })
+    counts = {}
+    for job in jobs:
+        counts[job.get("status", "PENDING")] = counts.get(job.get("status", "PENDING"), 0) + 1
+    manifest = {
+        "campaign": campaign["name"],
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "counts": counts,
+        "lanes": {lane: dict(limiter.stats, window=round(limiter.window, 1), summary=limiter.summary())
+                  for lane, limiter in limiters.items() if limiter.started is not None},
+        "jobs": entries,
+    }
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Generate a prompts x models x aspect ratios x seeds image campaign")
+    p.add_argument("campaign", help="Campaign JSON file")
+    p.add_argument("--outdir", help="Output directory (default: the campaign's outdir, relative to ai-video/)")
+    p.add_argument("--only", nargs="+", metavar="KEY", help="Only these prompt keys")
+    p.add_argument("--seeds", nargs="+", type=int, help="Override the campaign seeds")
+    p.add_argument("--variants", type=int, help="Override the campaign variants per request")
+    p.add_argument("--max-samples", type=int, default=IMAGEN_MAX_SAMPLES,
+                   help=f"Imagen variants per :predict (sampleCount), 1 = no batching (default: {IMAGEN_MAX_SAMPLES})")
+    p.add_argument("--dry-run", action="store_true", help="List the jobs (and cache hits) without calling the API")
+    p.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                   help=f"Retries per job on 429/5xx/network errors (default: {DEFAULT_RETRIES})")
+    p.add_argument("--no-cache", action="store_true", help="Bypass the generation cache (always call the API)")
+    for lane in LANES:
+        p.add_argument(f"--{lane}-workers", type=int, help=f"Initial concurrency of the {lane} lane "
+                                                            f"(default: {LANE_DEFAULTS['workers']})")
+        p.add_argument(f"--{lane}-max-workers", type=int, help=f"Upper bound for the {lane} lane "
+                                                                f"(default: {LANE_DEFAULTS['max_workers']})")
+        p.add_argument(f"--{lane}-rpm", type=float, help=f"Requests per minute cap of the {lane} lane")
+    args = p.parse_args()
+
+    try:
+        campaign = load_campaign(args.campaign)
+        outdir = args.outdir or os.path.join(BASE_DIR, campaign.get("outdir", os.path.join("content", campaign["name"])))
+        jobs = expand(campaign, outdir, args.only, args.seeds, args.variants)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not jobs:
+        print("ERROR: no jobs (check --only)", file=sys.stderr)
+        sys.exit(1)
+
+    os.makedirs(outdir, exist_ok=True)
+    api_key = "" if args.dry_run else load_api_key()
+    client = GeminiClient(api_key, cache=None) if args.no_cache else GeminiClient(api_key)
+    settings = lane_settings(campaign, args)
+    per_lane = {lane: sum(1 for job in jobs if job["lane"] == lane) for lane in LANES}
+
+    print(f"Campaign {campaign['name']}: {len(jobs)} images "
+          f"({per_lane['native']} native, {per_lane['imagen']} imagen)")
+    for lane in LANES:
+        if per_lane[lane]:
+            conf = settings[lane]
+            rpm = f", RPM cap {conf['rpm']:g}" if conf["rpm"] else ""
+            print(f"  {lane} lane: {conf['workers']} workers (adaptive, max {conf['max_workers']}){rpm}")
+    print(f"Output: {outdir}\n")
+
+    counts = {"OK": 0, "CACHED": 0, "SKIP": 0, "FAIL": 0, "ERROR": 0}
+    new = []
+    for job in jobs:
+        hit = request(client, job, cached_only=True)
+        if hit is not None:
+            job["cache_key"] = hit.key
+            if args.dry_run:
+                print(f"CACHED {job['id']} ({job['model']['model']}, {job['aspect_ratio']}, seed {job['seed']})")
+                continue
+            job["status"] = "CACHED" if hit.save(0, job["output"]) else "SKIP"
+            job["detail"] = job["output"]
+            counts[job["status"]] += 1
+            print(f"{job['status']} {job['id']} -> {job['output']}")
+            continue
+        if args.dry_run:
+            print(f"NEW    {job['id']} ({job['model']['model']}, {job['aspect_ratio']}, seed {job['seed']})")
+        new.append(job)
+
+    groups = batches(new, max(1, min(args.max_samples, IMAGEN_MAX_SAMPLES)))
+    tasks = [Task(group[0]["id"] + (f" (+{len(group) - 1})" if len(group) > 1 else ""), group[0]["lane"],
+                  generate, client, group) for group in groups]
+    cost = sum(PRICES.get(job["model"]["model"], 0) for job in new)
+    if args.dry_run:
+        print(f"\n{len(new)} to generate in {len(tasks)} requests, {len(jobs) - len(new)} in cache. "
+              f"Estimated cost: ${cost:.3f}")
+        return
+
+    limiters = {lane: Limiter(lane, conf["workers"], conf["max_workers"], rpm=conf["rpm"])
+                for lane, conf in settings.items()}
+    manifest_path = os.path.join(outdir, f"{campaign['name']}.manifest.json")
+    started = time.time()
+
+    def on_result(task, status, detail):
+        for job in task.args[1]:
+            if status == "ERROR" or "status" not in job:
+                job.update(status=status, detail=detail)
+            job["attempts"] = task.attempt
+            counts[job["status"]] += 1
+            print(f"{job['status']} {job['id']} -> {job['detail']}")
+
+    def on_retry(task, error, delay):
+        print(f"RETRY {task.key} (attempt {task.attempt}) in {delay:.1f}s -> {error}")
+
+    try:
+        run_tasks(tasks, limiters, on_result, retries=args.retries, on_retry=on_retry)
+    finally:
+        write_manifest(manifest_path, campaign, jobs, limiters, started)
+
+    elapsed = time.time() - started
+    print(f"\nDone: {counts['OK']} ok, {counts['CACHED']} from cache, {counts['SKIP']} up to date, "
+          f"{counts['FAIL']} failed, {counts['ERROR']} errors in {elapsed:.1f}s")
+    for limiter in limiters.values():
+        if limiter.started is not None:
+            print(f"  {limiter.summary()}")
+    print(f"HTTP: {client.pool.requests} requests over {client.pool.opened} connections")
+    print(f"Manifest: {manifest_path}")
+    paid = sum(PRICES.get(job["model"]["model"], 0) for job in new if job.get("status") == "OK")
+    if paid > 0:
+        print(f"Estimated cost: ${paid:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+"""Shared Gemini API client for the ai-video scripts.
+
+One GeminiClient per run, shared by all worker threads:
+- keep-alive http.client connections pooled per host (no TCP+TLS handshake per request)
+- gzip responses (Accept-Encoding: gzip), decoded transparently, also when streaming downloads
+- redirects followed (Veo download URIs redirect to a storage host; the API key is only sent to the API host)
+- structured errors: every failure is a GeminiError with HTTP status, API status/reason,
+  message and Retry-After (header or google.rpc.RetryInfo), plus .retryable
+- image generations go through the shared content-addressed cache (gen_cache.py):
+  an identical request (model + payload) is served from disk instead of the API
+- media is streamed (json_stream.py): FileData(path) in a payload is base64-encoded onto
+  the socket in chunks, and image responses are decoded to disk while they are parsed
+
+Usage:
+    from gemini_client import GeminiClient, GeminiError, load_api_key
+    client = GeminiClient(load_api_key())
+    png = client.generate_native("a red fox", aspect_ratio="9:16")      # bytes or None
+    pngs = client.generate_imagen("a red fox", aspect_ratio="16:9")     # [bytes]
+    gen = client.native("a red fox", seed=7)                            # Generation (cached)
+    gen.save(0, "out/fox.png")                                          # hardlink into the cache
+    gens = client.imagen_batch("a red fox", variants=[0, 1, 2, 3])      # one :predict, sampleCount 4
+    op = client.predict_long_running("veo-3.1-fast-generate-preview", payload)
+"""
+import base64, contextlib, gzip, http.client, json, os, re, shutil, socket, sys, tempfile, threading, zlib
+from urllib.parse import urljoin, urlsplit
+
+from gen_cache import Generation, GenerationCache, request_key
+from json_stream import Blob, FileData, JsonBody, parse  # noqa: F401 (FileData is re-exported for payloads)
+
+# GEMINI_API_BASE points the scripts at another endpoint (e.g. a local mock server)
+API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+NATIVE_MODEL = "gemini-2.5-flash-image"
+IMAGEN_MODEL = "imagen-4.0-generate-001"
+IMAGEN_MAX_SAMPLES = 4  # sampleCount limit of :predict
+DEFAULT_TIMEOUT = 120
+MAX_IDLE_PER_HOST = 16
+MAX_REDIRECTS = 5
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+
+# Errors from a kept-alive connection the server already closed: safe to resend once on a new one
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionResetError,
+                 BrokenPipeError, ConnectionAbortedError)
+
+
+def load_api_key():
+    key = os.environ.get("GEMINI_API_KEY")
+    if key:
+        return key
+    if os.path.exists(ENV_FILE):
+        with open(ENV_FILE) as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("GEMINI_API_KEY="):
+                    return line.split("=", 1)[1].strip().strip('"').strip("'")
+    print("ERROR: GEMINI_API_KEY not found in env or .env file", file=sys.stderr)
+    sys.exit(1)
+
+
+class GeminiError(Exception):
+    """API or network failure. status is the HTTP status (None for network errors)."""
+
+    def __init__(self, message, status=None, reason=None, body=None, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.reason = reason
+        self.body = body
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status is None or self.status in RETRYABLE_STATUS
+
+    def __str__(self):
+        head = f"HTTP {self.status}" if self.status else "network"
+        if self.reason:
+            head += f" {self.reason}"
+        return f"{head}: {self.message}"
+
+    @classmethod
+    def from_response(cls, status, headers, body):
+        text = body.decode("utf-8", "replace") if isinstance(body, bytes) else (body or "")
+        message, reason, retry_after = text[:500] or http.client.responses.get(status, ""), None, None
+        try:
+            error = json.loads(text)["error"]
+            message = error.get("message", message)
+            reason = error.get("status")
+            for detail in error.get("details", []):
+                delay = detail.get("retryDelay")
+                if delay:
+                    retry_after = _parse_seconds(delay)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            pass
+        header = headers.get("Retry-After") if headers is not None else None
+        if header:
+            retry_after = _parse_seconds(header) if retry_after is None else retry_after
+        return cls(message, status=status, reason=reason, body=text, retry_after=retry_after)
+
+
+def _parse_seconds(value):
+    """'13s', '1.5s', '30' -> seconds (None if not a number; HTTP dates are ignored)."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)s?\s*", str(value))
+    return float(match.group(1)) if match else None
+
+
+class Response:
+    """HTTP response on a pooled connection. read()/iter_chunks() give decoded bytes and release the connection."""
+
+    __slots__ = ("status", "headers", "_pool", "_key", "_conn", "_resp")
+
+    def __init__(self, pool, key, conn, resp):
+        self.status = resp.status
+        self.headers = resp.headers
+        self._pool, self._key, self._conn, self._resp = pool, key, conn, resp
+
+    @property
+    def gzipped(self):
+        return (self.headers.get("Content-Encoding") or "").lower() == "gzip"
+
+    def read(self):
+        try:
+            data = self._resp.read()
+        except BaseException:
+            self.close()
+            raise
+        self._release()
+        return gzip.decompress(data) if self.gzipped and data else data
+
+    def iter_chunks(self, size=1 << 16):
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if self.gzipped else None
+        try:
+            while True:
+                chunk = self._resp.read(size)
+                if not chunk:
+                    break
+                yield decoder.decompress(chunk) if decoder else chunk
+            if decoder:
+                yield decoder.flush()
+        except BaseException:
+            self.close()
+            raise
+        self._release()
+
+    def _release(self):
+        if self._conn is not None:
+            if self._resp.will_close:
+                self._conn.close()
+            else:
+                self._pool.release(self._key, self._conn)
+            self._conn = None
+
+    def close(self):
+        """Drop the connection without reusing it (body not fully read)."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port). Thread-safe."""
+
+    def __init__(self, max_idle=MAX_IDLE_PER_HOST):
+        self.max_idle = max_idle
+        self.opened = 0
+        self.requests = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, key, timeout):
+        with self._lock:
+            self.requests += 1
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+            self.opened += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None, timeout=DEFAULT_TIMEOUT):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                return Response(self, key, conn, conn.getresponse())
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+def native_payload(prompt, aspect_ratio="16:9", modalities=("IMAGE",), seed=None):
+    config = {"responseModalities": list(modalities), "imageConfig": {"aspectRatio": aspect_ratio}}
+    if seed is not None:
+        config["seed"] = seed
+    return {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": config}
+
+
+def imagen_payload(prompt, aspect_ratio="16:9", person_generation=None, sample_count=1, seed=None):
+    params = {"sampleCount": sample_count, "aspectRatio": aspect_ratio}
+    if person_generation:
+        params["personGeneration"] = person_generation
+    if seed is not None:
+        params["seed"] = seed
+    return {"instances": [{"prompt": prompt}], "parameters": params}
+
+
+IMAGE_BLOB_KEYS = ("data", "bytesBase64Encoded")
+
+
+def _image(value):
+    return value if isinstance(value, Blob) else base64.b64decode(value)
+
+
+def _read(image):
+    return image.read() if isinstance(image, Blob) else image
+
+
+def _extract_images(method, data):
+    """API response -> ([image bytes or Blob], [mime type], response metadata)."""
+    images, mimes = [], []
+    if method == "predict":
+        predictions = data.get("predictions", [])
+        for p in predictions:
+            if p.get("bytesBase64Encoded"):
+                images.append(_image(p["bytesBase64Encoded"]))
+                mimes.append(p.get("mimeType"))
+        filtered = [p["raiFilteredReason"] for p in predictions if p.get("raiFilteredReason")]
+        return images, mimes, {"rai_filtered": filtered} if filtered else {}
+    candidate = (data.get("candidates") or [{}])[0]
+    texts = []
+    for part in candidate.get("content", {}).get("parts", []):
+        inline = part.get("inlineData", {})
+        if inline.get("data"):
+            images.append(_image(inline["data"]))
+            mimes.append(inline.get("mimeType"))
+        elif part.get("text"):
+            texts.append(part["text"])
+    meta = {"finish_reason": candidate.get("finishReason"), "model_version": data.get("modelVersion"),
+            "usage": data.get("usageMetadata")}
+    if texts:
+        meta["text"] = "\n".join(texts)
+    return images, mimes, {k: v for k, v in meta.items() if v is not None}
+
+
+class GeminiClient:
+    """Gemini REST client over a ConnectionPool; one instance is shared by all threads of a run.
+
+    cache: GenerationCache for native()/imagen() (default: the shared one; None disables it).
+    """
+
+    def __init__(self, api_key, base=API_BASE, timeout=DEFAULT_TIMEOUT, pool=None, cache="default"):
+        self.api_key = api_key
+        self.base = base.rstrip("/")
+        self.timeout = timeout
+        self.pool = pool or ConnectionPool()
+        self.cache = GenerationCache() if cache == "default" else cache
+        self._api_host = urlsplit(self.base).hostname
+
+    def url(self, path):
+        return path if "://" in path else f"{self.base}/{path.lstrip('/')}"
+
+    def request(self, method, path, payload=None, timeout=None):
+        """Send the request (following redirects) and return a Response with status < 300."""
+        url = self.url(path)
+        body = JsonBody(payload) if payload is not None else None
+        if body is not None and not body.streaming:
+            body = b"".join(body)
+        for _ in range(MAX_REDIRECTS + 1):
+            headers = {"Accept-Encoding": "gzip"}
+            if urlsplit(url).hostname == self._api_host:
+                headers["x-goog-api-key"] = self.api_key
+            if body is not None:
+                headers["Content-Type"] = "application/json"
+                headers["Content-Length"] = str(len(body))
+            try:
+                resp = self.pool.request(method, url, body, headers, timeout or self.timeout)
+            except (OSError, http.client.HTTPException) as e:
+                raise GeminiError(f"{type(e).__name__}: {e}" if str(e) else type(e).__name__) from e
+            if resp.status in (301, 302, 303, 307, 308) and resp.headers.get("Location"):
+                resp.read()
+                url = urljoin(url, resp.headers["Location"])
+                if resp.status == 303:
+                    method, body = "GET", None
+                continue
+            if resp.status >= 400:
+                try:
+                    data = resp.read()
+                except (OSError, http.client.HTTPException, zlib.error):
+                    data = b""
+                raise GeminiError.from_response(resp.status, resp.headers, data)
+            return resp
+        raise GeminiError(f"too many redirects ({url})")
+
+    def call(self, method, path, payload=None, timeout=None, blob_keys=(), blob_dir=None):
+        """JSON request -> dict. An "error" object in a 200 response is raised as GeminiError too.
+        blob_dir: parse the response as it arrives; strings under blob_keys become Blob files there."""
+        resp = self.request(method, path, payload, timeout)
+        try:
+            if blob_dir is not None:
+                data = parse(resp.iter_chunks(), blob_keys, blob_dir)
+            else:
+                raw = resp.read()
+                data = json.loads(raw)
+        except (OSError, http.client.HTTPException, zlib.error) as e:
+            raise GeminiError(f"{type(e).__name__} reading response: {e}") from e
+        except ValueError as e:
+            resp.close()
+            raise GeminiError(f"invalid JSON response: {e}", status=resp.status)
+        if isinstance(data, dict) and "error" in data:
+            error = data["error"]
+            if isinstance(error, dict):
+                raise GeminiError(error.get("message", str(error)), status=error.get("code"), reason=error.get("status"))
+            raise GeminiError(str(error))
+        return data
+
+    def post(self, path, payload, timeout=None):
+        return self.call("POST", path, payload, timeout)
+
+    def get(self, path, timeout=None):
+        return self.call("GET", path, None, timeout)
+
+    # --- endpoints ---
+
+    def generate_content(self, model, payload, timeout=None):
+        return self.post(f"models/{model}:generateContent", payload, timeout)
+
+    def predict(self, model, payload, timeout=None):
+        return self.post(f"models/{model}:predict", payload, timeout)
+
+    def predict_long_running(self, model, payload, timeout=60):
+        """Start a long-running prediction (Veo). Returns the operation name."""
+        return self.post(f"models/{model}:predictLongRunning", payload, timeout)["name"]
+
+    def operation(self, name, timeout=30):
+        return self.get(name, timeout)
+
+    def download(self, uri, output_path, timeout=None):
+        """Stream uri to output_path (written to .part, then renamed). Returns the byte count."""
+        resp = self.request("GET", uri, timeout=timeout)
+        part = output_path + ".part"
+        size = 0
+        try:
+            with open(part, "wb") as f:
+                for chunk in resp.iter_chunks():
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException as e:
+            if os.path.exists(part):
+                os.remove(part)
+            if isinstance(e, (http.client.HTTPException, zlib.error, socket.timeout, ConnectionError)):
+                raise GeminiError(f"{type(e).__name__} downloading {uri}: {e}") from e
+            raise
+        os.replace(part, output_path)
+        return size
+
+    # --- image helpers shared by the scripts ---
+
+    def generate(self, method, model, payload, timeout=None, cached_only=False, variant=0):
+        """Image request ("generateContent" or "predict") through the cache -> Generation.
+        Responses without images are not cached. cached_only: None instead of calling the API.
+        variant: another sample of the same request (a separate cache entry)."""
+        key = request_key(method, model, payload, variant)
+        if self.cache is not None:
+            hit = self.cache.get(key)
+            if hit is not None or cached_only:
+                return hit
+        elif cached_only:
+            return None
+        with self._blob_dir() as blob_dir:
+            data = self.call("POST", f"models/{model}:{method}", payload, timeout, IMAGE_BLOB_KEYS, blob_dir)
+            images, mimes, response = _extract_images(method, data)
+            meta = {"method": method, "model": model, "payload": payload, "variant": variant, "response": response}
+            if self.cache is None or not images:
+                return Generation(key, meta, images=[_read(image) for image in images])
+            return self.cache.put(key, images, meta, mimes)
+
+    def native(self, prompt, model=NATIVE_MODEL, aspect_ratio="16:9", modalities=("IMAGE",), seed=None,
+               timeout=None, cached_only=False, variant=0):
+        """Gemini native image generation -> Generation."""
+        return self.generate("generateContent", model, native_payload(prompt, aspect_ratio, modalities, seed),
+                             timeout, cached_only, variant)
+
+    def imagen(self, prompt, model=IMAGEN_MODEL, aspect_ratio="16:9", person_generation=None, sample_count=1,
+               seed=None, timeout=None, cached_only=False, variant=0):
+        """Imagen :predict -> Generation, possibly with fewer images than sample_count."""
+        payload = imagen_payload(prompt, aspect_ratio, person_generation, sample_count, seed)
+        return self.generate("predict", model, payload, timeout, cached_only, variant)
+
+    def imagen_batch(self, prompt, model=IMAGEN_MODEL, aspect_ratio="16:9", person_generation=None, variants=(0,),
+                     seed=None, timeout=None):
+        """Variants of one Imagen request in a single :predict (sampleCount = uncached variants, at most
+        IMAGEN_MAX_SAMPLES). Each image is cached as imagen(..., variant=v) would be.
+        -> [Generation] in variants order (no images for the ones the API did not return)."""
+        payload = imagen_payload(prompt, aspect_ratio, person_generation, 1, seed)
+        results, missing = {}, []
+        for variant in variants:
+            hit = self.cache.get(request_key("predict", model, payload, variant)) if self.cache is not None else None
+            if hit is not None:
+                results[variant] = hit
+            else:
+                missing.append(variant)
+        if len(missing) > IMAGEN_MAX_SAMPLES:
+            raise ValueError(f"imagen_batch: {len(missing)} samples, the API limit is {IMAGEN_MAX_SAMPLES}")
+        if missing:
+            batch = imagen_payload(prompt, aspect_ratio, person_generation, len(missing), seed)
+            with self._blob_dir() as blob_dir:
+                data = self.call("POST", f"models/{model}:predict", batch, timeout, IMAGE_BLOB_KEYS, blob_dir)
+                images, mimes, response = _extract_images("predict", data)
+                for i, variant in enumerate(missing):
+                    key = request_key("predict", model, payload, variant)
+                    meta = {"method": "predict", "model": model, "payload": payload, "variant": variant,
+                            "batch": len(missing), "response": response}
+                    if i >= len(images):
+                        results[variant] = Generation(key, meta, images=[])
+                    elif self.cache is None:
+                        results[variant] = Generation(key, meta, images=[_read(images[i])])
+                    else:
+                        results[variant] = self.cache.put(key, [images[i]], meta, [mimes[i]])
+        return [results[variant] for variant in variants]
+
+    @contextlib.contextmanager
+    def _blob_dir(self):
+        """Scratch dir for decoded response media (inside the cache, so entries are renamed, not copied)."""
+        root = self.cache.root if self.cache is not None else None
+        if root:
+            os.makedirs(root, exist_ok=True)
+        path = tempfile.mkdtemp(prefix=".blobs-", dir=root)
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def generate_native(self, prompt, model=NATIVE_MODEL, aspect_ratio="16:9", modalities=("IMAGE",), seed=None,
+                        timeout=None):
+        """Gemini native image generation. Returns the first image (bytes) or None."""
+        images = self.native(prompt, model, aspect_ratio, modalities, seed, timeout).images
+        return images[0] if images else None
+
+    def generate_imagen(self, prompt, model=IMAGEN_MODEL, aspect_ratio="16:9", person_generation=None,
+                        sample_count=1, seed=None, timeout=None):
+        """Imagen :predict. Returns the generated images (bytes), possibly fewer than sample_count."""
+        return self.imagen(prompt, model, aspect_ratio, person_generation, sample_count, seed, timeout).images
+
+    def close(self):
+        self.pool.close()
@@ -4,71 +4,30 @@
 Usage:
     python3 ai-video/gen-images.py --prompts prompts.json --outdir ai-video/content/my-topic/
     python3 ai-video/gen-images.py --prompts prompts.json --outdir output/ --aspect-ratio 9:16 --workers 3
+    python3 ai-video/gen-images.py --prompts prompts.json --outdir output/ --rpm 60 --max-workers 10
 
 Input JSON format: {"key": "prompt text", ...}
-Output: {outdir}/hook_{key}.png for each entry
+Output: {outdir}/hook_{key}.png for each entry, hardlinked into the generation cache
+(gen_cache.py): a prompt generated before (any key, any script) is not paid for again,
+and an edited prompt always regenerates. --no-cache bypasses it.
+
+Concurrency adapts to the quota (see throttle.py): --workers is the starting window,
+grown on success up to --max-workers and halved on 429/503; throttled or failed
+requests are retried in the same run (up to --retries), after Retry-After when the
+API sends one. --rpm caps the request rate when the quota is known.
 """
-import argparse, json, base64, os, sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
-
-MODEL = "gemini-2.5-flash-image"
-ENDPOINT = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL}:generateContent"
-
-
-def load_api_key():
-    key = os.environ.get("GEMINI_API_KEY")
-    if key:
-        return key
-    envfile = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
-    if os.path.exists(envfile):
-        with open(envfile) as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("GEMINI_API_KEY="):
-                    return line.split("=", 1)[1].strip().strip('"').strip("'")
-    print("ERROR: GEMINI_API_KEY not found in env or .env file", file=sys.stderr)
-    sys.exit(1)
-
-
-def generate(api_key, key, prompt, outdir, aspect_ratio):
-    outfile = os.path.join(outdir, f"hook_{key}.png")
-    if os.path.exists(outfile):
-        return "SKIP", key, outfile
-    body = json.dumps({
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "responseModalities": ["IMAGE"],
-            "imageConfig": {
-                "aspectRatio": aspect_ratio
-            }
-        }
-    }).encode()
-    req = Request(ENDPOINT, data=body, headers={
-        "x-goog-api-key": api_key,
-        "Content-Type": "application/json",
-    })
-    try:
-        resp = urlopen(req, timeout=120)
-        data = json.loads(resp.read())
-        candidates = data.get("candidates", [])
-        if not candidates:
-            return "FAIL", key, "no candidates"
-        parts = candidates[0].get("content", {}).get("parts", [])
-        for part in parts:
-            if "inlineData" in part:
-                b64 = part["inlineData"].get("data", "")
-                if b64:
-                    with open(outfile, "wb") as f:
-                        f.write(base64.b64decode(b64))
-                    return "OK", key, outfile
-        return "FAIL", key, "no image data in response"
-    except HTTPError as e:
-        err_body = e.read().decode() if e.readable() else ""
-        return "ERROR", key, f"HTTP {e.code} - {err_body[:200]}"
-    except Exception as e:
-        return "ERROR", key, str(e)
+import argparse, json, os, sys
+
+from gemini_client import NATIVE_MODEL as MODEL, GeminiClient, load_api_key
+from throttle import DEFAULT_RETRIES, Limiter, Task, run_tasks
+
+
+def generate(client, prompt, outfile, aspect_ratio):
+    generation = client.native(prompt, MODEL, aspect_ratio)
+    if not len(generation):
+        return "FAIL", "no image data in response"
+    generation.save(0, outfile)
+    return "OK", outfile
 
 
 def main():
@@ -76,7 +35,12 @@ def main():
     p.add_argument("--prompts", required=True, help="JSON file with {key: prompt} dict")
     p.add_argument("--outdir", required=True, help="Output directory for generated images")
     p.add_argument("--aspect-ratio", default="16:9", help="Aspect ratio (default: 16:9)")
-    p.add_argument("--workers", type=int, default=5, help="Concurrent workers (default: 5)")
+    p.add_argument("--workers", type=int, default=5, help="Initial concurrent workers (default: 5)")
+    p.add_argument("--max-workers", type=int, default=16, help="Upper bound for the adaptive workers (default: 16)")
+    p.add_argument("--rpm", type=float, help="Requests per minute cap for the model (default: no cap)")
+    p.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                   help=f"Retries per key on 429/5xx/network errors (default: {DEFAULT_RETRIES})")
+    p.add_argument("--no-cache", action="store_true", help="Bypass the generation cache (always call the API)")
     args = p.parse_args()
 
     with open(args.prompts) as f:
@@ -87,24 +51,40 @@ def main():
         sys.exit(1)
 
     os.makedirs(args.outdir, exist_ok=True)
-    api_key = load_api_key()
+    client = GeminiClient(load_api_key(), cache=None) if args.no_cache else GeminiClient(load_api_key())
 
     print(f"Generating {len(prompts)} images with {MODEL}")
-    print(f"Aspect ratio: {args.aspect_ratio} | Workers: {args.workers}")
+    rpm = f" | RPM cap: {args.rpm:g}" if args.rpm else ""
+    print(f"Aspect ratio: {args.aspect_ratio} | Workers: {args.workers} (adaptive, max {args.max_workers}){rpm}")
     print(f"Output: {args.outdir}\n")
 
-    counts = {"OK": 0, "SKIP": 0, "FAIL": 0, "ERROR": 0}
-    with ThreadPoolExecutor(max_workers=args.workers) as pool:
-        futures = {
-            pool.submit(generate, api_key, key, prompt, args.outdir, args.aspect_ratio): key
-            for key, prompt in prompts.items()
-        }
-        for future in as_completed(futures):
-            status, key, detail = future.result()
+    counts = {"OK": 0, "CACHED": 0, "SKIP": 0, "FAIL": 0, "ERROR": 0}
+    tasks = []
+    for key, prompt in prompts.items():
+        outfile = os.path.join(args.outdir, f"hook_{key}.png")
+        hit = client.native(prompt, MODEL, args.aspect_ratio, cached_only=True)
+        if hit is not None:
+            status = "CACHED" if hit.save(0, outfile) else "SKIP"
             counts[status] += 1
-            print(f"{status} {key} -> {detail}")
+            print(f"{status} {key} -> {outfile}")
+            continue
+        tasks.append(Task(key, MODEL, generate, client, prompt, outfile, args.aspect_ratio))
+
+    def on_result(task, status, detail):
+        counts[status] += 1
+        print(f"{status} {task.key} -> {detail}")
+
+    def on_retry(task, error, delay):
+        print(f"RETRY {task.key} (attempt {task.attempt}) in {delay:.1f}s -> {error}")
+
+    limiter = Limiter(MODEL, args.workers, args.max_workers, rpm=args.rpm)
+    run_tasks(tasks, {MODEL: limiter}, on_result, retries=args.retries, on_retry=on_retry)
 
-    print(f"\nDone: {counts['OK']} ok, {counts['SKIP']} skipped, {counts['FAIL']} failed, {counts['ERROR']} errors")
+    print(f"\nDone: {counts['OK']} ok, {counts['CACHED']} from cache, {counts['SKIP']} up to date, "
+          f"{counts['FAIL']} failed, {counts['ERROR']} errors")
+    if tasks:
+        print(f"Throughput: {limiter.summary()}")
+    print(f"HTTP: {client.pool.requests} requests over {client.pool.opened} connections")
     cost = counts["OK"] * 0.039
     if cost > 0:
         print(f"Estimated cost: ${cost:.3f} ({counts['OK']} images x $0.039)")
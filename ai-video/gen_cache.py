@@ -0,0 +1,135 @@
+"""Content-addressed cache of generated images, shared by all ai-video scripts.
+
+An entry is keyed by sha256 of (API method, model, request payload[, variant]): prompt,
+aspect ratio, seed, sample count and every other parameter are part of the key, so an
+edited prompt is a new entry and an identical request (any script, any key name)
+is never paid for twice. Variants 1, 2, ... of a request are separate entries (variant 0
+is the plain request), whether they were generated one by one or in a batch. Output
+files are hardlinks into the cache (copies where hardlinks are not supported).
+
+Layout: {GEMINI_CACHE_DIR or ai-video/.cache/generations}/ab/abcdef.../
+    meta.json   method, model, payload, created, images, response metadata
+    0.png ...   the generated images
+
+Usage:
+    cache = GenerationCache()
+    entry = cache.get(request_key("generateContent", model, payload))    # Generation or None
+    entry = cache.put(key, [png_bytes], {"method": ..., "model": ..., "payload": ...})   # bytes or Blob
+    entry.save(0, "out/hook_01.png")    # False if it already links to this image
+"""
+import hashlib, json, os, shutil, tempfile, time
+
+CACHE_DIR = os.environ.get("GEMINI_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "generations")
+EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/webp": ".webp"}
+
+
+def request_key(method, model, payload, variant=0):
+    request = {"method": method, "model": model, "payload": payload}
+    if variant:
+        request["variant"] = variant
+    blob = json.dumps(request,
+                      sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Generation:
+    """Images of one request: files in the cache (paths) or, without a cache, in memory."""
+
+    __slots__ = ("key", "meta", "paths", "cached", "_images")
+
+    def __init__(self, key, meta, paths=None, images=None, cached=False):
+        self.key = key
+        self.meta = meta
+        self.paths = paths
+        self.cached = cached
+        self._images = images
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = []
+            for path in self.paths or ():
+                with open(path, "rb") as f:
+                    self._images.append(f.read())
+        return self._images
+
+    def __len__(self):
+        return len(self.paths) if self.paths is not None else len(self._images or ())
+
+    def save(self, index, output_path):
+        """Link (or write) image `index` to output_path. False if it already is that image."""
+        if self.paths is None:
+            with open(output_path, "wb") as f:
+                f.write(self._images[index])
+            return True
+        src = self.paths[index]
+        try:
+            if os.path.samefile(src, output_path):
+                return False
+        except OSError:
+            pass
+        tmp = output_path + ".part"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, output_path)
+        return True
+
+
+class GenerationCache:
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        entry_dir = self.path(key)
+        try:
+            with open(os.path.join(entry_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        paths = [os.path.join(entry_dir, image["file"]) for image in meta.get("images", [])]
+        if not paths or not all(os.path.exists(p) for p in paths):
+            return None
+        return Generation(key, meta, paths, cached=True)
+
+    def put(self, key, images, meta, mime_types=None):
+        """Store images (bytes, or Blob files that are moved in) + meta atomically.
+        A concurrent writer of the same key wins."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            files = []
+            for i, data in enumerate(images):
+                mime = (mime_types or [None] * len(images))[i] or "image/png"
+                name = f"{i}{EXTENSIONS.get(mime, '.png')}"
+                if isinstance(data, bytes):
+                    with open(os.path.join(tmp, name), "wb") as f:
+                        f.write(data)
+                    size = len(data)
+                else:
+                    shutil.move(data.path, os.path.join(tmp, name))
+                    size = data.size
+                files.append({"file": name, "mime_type": mime, "bytes": size})
+            meta = dict(meta, key=key, created=time.strftime("%Y-%m-%dT%H:%M:%S"), images=files)
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2, ensure_ascii=False)
+            entry_dir = self.path(key)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            try:
+                os.rename(tmp, entry_dir)
+            except OSError:
+                if self.get(key) is None:  # incomplete entry left by an interrupted run
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                    os.rename(tmp, entry_dir)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        entry = self.get(key)
+        entry.cached = False
+        return entry
@@ -0,0 +1,255 @@
+"""Streaming JSON bodies with base64 media, so large files never sit in memory.
+
+Requests: put FileData(path) where the API expects a base64 string. JsonBody(payload)
+serializes the payload with each file base64-encoded chunk by chunk while http.client
+sends it; it has an exact len() (Content-Length) and can be iterated again (resend on
+a stale connection, 307/308 redirects).
+
+Responses: parse(chunks, blob_keys, blob_dir) parses JSON incrementally. String values
+under a key in blob_keys (e.g. "data", "bytesBase64Encoded") are base64-decoded in
+chunks straight into a file in blob_dir and returned as Blob(path, size); everything
+else is parsed as usual.
+
+Usage:
+    body = JsonBody({"instances": [{"video": {"inlineData": {"data": FileData("in.mp4")}}}]})
+    conn.request("POST", path, body=body, headers={"Content-Length": str(len(body))})
+    data = parse(resp.iter_chunks(), ("data",), "/tmp/blobs")   # {..."data": Blob(...)}
+"""
+import binascii, json, os, tempfile, uuid
+
+CHUNK = 3 * 64 * 1024  # multiple of 3: each chunk encodes to base64 without padding
+_WS = b" \t\r\n"
+_SCALAR_END = b" \t\r\n,]}"
+
+
+class FileData:
+    """A file sent as a base64 JSON string."""
+
+    __slots__ = ("path",)
+
+    def __init__(self, path):
+        self.path = path
+
+    def __len__(self):
+        return 4 * ((os.path.getsize(self.path) + 2) // 3)
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK)
+                if not chunk:
+                    break
+                yield binascii.b2a_base64(chunk, newline=False)
+
+
+class JsonBody:
+    """Re-iterable JSON request body with FileData values streamed as base64."""
+
+    def __init__(self, payload):
+        files = []
+        token = f"@@file-{uuid.uuid4().hex}-"
+
+        def replace(value):
+            if isinstance(value, FileData):
+                files.append(value)
+                return f"{token}{len(files) - 1}@@"
+            if isinstance(value, dict):
+                return {k: replace(v) for k, v in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [replace(v) for v in value]
+            return value
+
+        text = json.dumps(replace(payload))
+        self.parts = []
+        for i, piece in enumerate(text.split(token)):
+            if i:
+                index, piece = piece.split("@@", 1)
+                self.parts.append(files[int(index)])
+            self.parts.append(piece.encode())
+        self.length = sum(len(part) for part in self.parts)
+
+    @property
+    def streaming(self):
+        return len(self.parts) > 1
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, FileData):
+                yield from part
+            elif part:
+                yield part
+
+
+class Blob:
+    """A base64 string of a response, decoded into a file."""
+
+    __slots__ = ("path", "size")
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __repr__(self):
+        return f"Blob({self.path!r}, {self.size})"
+
+
+class _Reader:
+    """Byte reader over an iterator of chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = b""
+        self.pos = 0
+
+    def fill(self):
+        for chunk in self.chunks:
+            if chunk:
+                self.buf = self.buf[self.pos:] + chunk
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self):
+        """Next non-whitespace byte (not consumed), b"" at the end."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            if not self.fill():
+                return b""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"invalid JSON: expected {char!r}, got {self.peek()!r}")
+        self.pos += 1
+
+    def string_segments(self):
+        """Raw bytes of a JSON string (after the opening quote) up to the closing quote, in pieces.
+        Escapes are yielded whole (backslash + next byte; \\u + 4 hex)."""
+        while True:
+            if self.pos >= len(self.buf) and not self.fill():
+                raise ValueError("invalid JSON: unterminated string")
+            quote = self.buf.find(b'"', self.pos)
+            slash = self.buf.find(b"\\", self.pos)
+            end = len(self.buf) if quote < 0 else quote
+            if 0 <= slash < end:
+                yield self.buf[self.pos:slash]
+                self.pos = slash
+                need = 2
+                while True:
+                    if self.buf[self.pos + 1:self.pos + 2] == b"u":
+                        need = 6
+                    if len(self.buf) - self.pos >= need:
+                        break
+                    if not self.fill():
+                        raise ValueError("invalid JSON: unterminated escape")
+                yield self.buf[self.pos:self.pos + need]
+                self.pos += need
+                continue
+            yield self.buf[self.pos:end]
+            self.pos = end
+            if quote >= 0:
+                self.pos += 1
+                return
+
+
+def _parse_string(reader):
+    raw = b"".join(reader.string_segments())
+    return json.loads(b'"' + raw + b'"') if b"\\" in raw else raw.decode("utf-8")
+
+
+def _parse_blob(reader, blob_dir):
+    fd, path = tempfile.mkstemp(prefix="blob-", dir=blob_dir)
+    size, rest = 0, b""
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for segment in reader.string_segments():
+                if segment[:1] == b"\\":
+                    segment = json.loads(b'"' + segment + b'"').encode()
+                data = rest + segment.translate(None, _WS)
+                cut = len(data) - len(data) % 4
+                rest = data[cut:]
+                if cut:
+                    decoded = binascii.a2b_base64(data[:cut])
+                    f.write(decoded)
+                    size += len(decoded)
+            if rest:
+                decoded = binascii.a2b_base64(rest + b"=" * (-len(rest) % 4))
+                f.write(decoded)
+                size += len(decoded)
+    except BaseException:
+        os.remove(path)
+        raise
+    os.chmod(path, 0o644)  # mkstemp creates 0600; the file ends up as a user-visible output
+    return Blob(path, size)
+
+
+def _parse_value(reader, key, blob_keys, blob_dir):
+    char = reader.peek()
+    if char == b"{":
+        reader.pos += 1
+        obj = {}
+        if reader.peek() == b"}":
+            reader.pos += 1
+            return obj
+        while True:
+            reader.expect(b'"')
+            name = _parse_string(reader)
+            reader.expect(b":")
+            obj[name] = _parse_value(reader, name, blob_keys, blob_dir)
+            if reader.peek() == b",":
+                reader.pos += 1
+                continue
+            reader.expect(b"}")
+            return obj
+    if char == b"[":
+        reader.pos += 1
+        items = []
+        if reader.peek() == b"]":
+            reader.pos += 1
+            return items
+        while True:
+            items.append(_parse_value(reader, None, blob_keys, blob_dir))
+            if reader.peek() == b",":
+                reader.pos += 1
+                continue
+            reader.expect(b"]")
+            return items
+    if char == b'"':
+        reader.pos += 1
+        if key in blob_keys:
+            return _parse_blob(reader, blob_dir)
+        return _parse_string(reader)
+    if not char:
+        raise ValueError("invalid JSON: unexpected end")
+    token = b""
+    while True:
+        end = reader.pos
+        while end < len(reader.buf) and reader.buf[end] not in _SCALAR_END:
+            end += 1
+        token += reader.buf[reader.pos:end]
+        reader.pos = end
+        if end < len(reader.buf) or not reader.fill():
+            return json.loads(token)
+
+
+def parse(chunks, blob_keys=(), blob_dir=None):
+    """Parse a JSON document from byte chunks; blob_keys strings become Blob files in blob_dir."""
+    reader = _Reader(chunks)
+    value = _parse_value(reader, None, frozenset(blob_keys), blob_dir)
+    if reader.peek():
+        raise ValueError("invalid JSON: extra data")
+    return value
+
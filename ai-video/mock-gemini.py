@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Local mock of the Gemini API that throttles like the real quota.
+
+Point the scripts at it with GEMINI_API_BASE (any GEMINI_API_KEY works):
+    python3 ai-video/mock-gemini.py --port 8765 --quota 20 --window 10 --concurrency 4 &
+    GEMINI_API_BASE=http://127.0.0.1:8765/v1beta GEMINI_API_KEY=x \\
+        python3 ai-video/gen-images.py --prompts prompts.json --outdir /tmp/out --workers 8
+
+Per model:
+- more than --quota requests in the last --window seconds -> 429 RESOURCE_EXHAUSTED,
+  with RetryInfo and Retry-After (seconds until the oldest request leaves the window)
+- more than --concurrency requests in flight -> 503 UNAVAILABLE (no Retry-After)
+- each request takes --latency seconds
+- --image-bytes pads the returned PNG (large responses); request bodies over 16 MB
+  (e.g. a Veo --video) are read in chunks and discarded
+
+Endpoints: models/*:generateContent (1x1 PNG), models/*:predict (sampleCount PNGs),
+models/*:predictLongRunning + operations/* (done after --veo-seconds, plus up to
+--veo-spread at random per operation) + files/*:download,
+and GET /stats (per-model counters as JSON).
+
+test_throttle.py serves Handler in-process on a free port and checks that run_tasks
+converges under the quota.
+"""
+import argparse, base64, collections, json, math, random, sys, threading, time, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def tiny_png():
+    def chunk(kind, data):
+        return len(data).to_bytes(4, "big") + kind + data + zlib.crc32(kind + data).to_bytes(4, "big")
+    ihdr = (1).to_bytes(4, "big") * 2 + bytes([8, 2, 0, 0, 0])
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\x00\xff\x00\x00"))
+            + chunk(b"IEND", b""))
+
+
+PNG_B64 = base64.b64encode(tiny_png()).decode()
+MAX_PARSED_BODY = 16 * 1024 * 1024
+
+
+class Quota:
+    """Sliding-window request quota + concurrency cap for one model."""
+
+    def __init__(self, limit, window, concurrency):
+        self.limit, self.window, self.concurrency = limit, window, concurrency
+        self.recent = collections.deque()
+        self.in_flight = 0
+        self.stats = collections.Counter()
+
+    def admit(self, now):
+        """-> (None, None) if admitted, else (status, retry_after)."""
+        while self.recent and self.recent[0] <= now - self.window:
+            self.recent.popleft()
+        if self.limit and len(self.recent) >= self.limit:
+            self.stats["429"] += 1
+            return 429, max(1, math.ceil(self.recent[0] + self.window - now))
+        if self.concurrency and self.in_flight >= self.concurrency:
+            self.stats["503"] += 1
+            return 503, None
+        self.recent.append(now)
+        self.in_flight += 1
+        self.stats["ok"] += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.in_flight)
+        return None, None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        if self.server.opts.verbose:
+            super().log_message(fmt, *args)
+
+    def send_json(self, code, obj, headers=()):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def throttled(self, status, retry_after):
+        if status == 429:
+            error = {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded (mock)",
+                     "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                                  "retryDelay": f"{retry_after}s"}]}
+            return self.send_json(429, {"error": error}, [("Retry-After", str(retry_after))])
+        error = {"code": 503, "status": "UNAVAILABLE", "message": "The model is overloaded (mock)"}
+        return self.send_json(503, {"error": error})
+
+    def quota(self, model):
+        server = self.server
+        with server.lock:
+            if model not in server.quotas:
+                opts = server.opts
+                server.quotas[model] = Quota(opts.quota, opts.window, opts.concurrency)
+            return server.quotas[model]
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_PARSED_BODY:
+            while length > 0:
+                length -= len(self.rfile.read(min(length, 1 << 20)))
+            payload = {}
+        else:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?")[0]
+        model = path.rsplit("/", 1)[-1].split(":")[0]
+        quota = self.quota(model)
+        with self.server.lock:
+            status, retry_after = quota.admit(time.monotonic())
+        if status:
+            return self.throttled(status, retry_after)
+        try:
+            time.sleep(self.server.opts.latency)
+            if path.endswith(":generateContent"):
+                part = {"inlineData": {"mimeType": "image/png", "data": self.server.image_b64}}
+                return self.send_json(200, {"candidates": [{"content": {"parts": [part]}}]})
+            if path.endswith(":predictLongRunning"):
+                with self.server.lock:
+                    ready = time.monotonic() + self.server.opts.veo_seconds + random.uniform(0, self.server.opts.veo_spread)
+                    self.server.operations.append(ready)
+                    name = f"models/{model}/operations/op{len(self.server.operations) - 1}"
+                return self.send_json(200, {"name": name})
+            if path.endswith(":predict"):
+                count = payload.get("parameters", {}).get("sampleCount", 1)
+                prediction = {"mimeType": "image/png", "bytesBase64Encoded": self.server.image_b64}
+                return self.send_json(200, {"predictions": [prediction] * count})
+            return self.send_json(404, {"error": {"code": 404, "status": "NOT_FOUND", "message": path}})
+        finally:
+            with self.server.lock:
+                quota.in_flight -= 1
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/stats":
+            with self.server.lock:
+                return self.send_json(200, {model: dict(q.stats) for model, q in self.server.quotas.items()})
+        if "/operations/op" in path:
+            index = int(path.rsplit("op", 1)[1])
+            with self.server.lock:
+                ready = self.server.operations[index]
+            if time.monotonic() < ready:
+                return self.send_json(200, {"name": path.split("/v1beta/")[-1], "done": False})
+            host = self.headers.get("Host")
+            uri = f"http://{host}/v1beta/files/op{index}:download?alt=media"
+            sample = {"video": {"uri": uri}}
+            return self.send_json(200, {"done": True, "response": {"generateVideoResponse": {"generatedSamples": [sample]}}})
+        if path.endswith(":download"):
+            body = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 4096
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            return self.wfile.write(body)
+        return self.send_json(404, {"error": {"code": 404, "status": "NOT_FOUND", "message": path}})
+
+
+def main():
+    p = argparse.ArgumentParser(description="Throttling mock of the Gemini API")
+    p.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    p.add_argument("--quota", type=int, default=20, help="Requests per window per model, 0 = unlimited (default: 20)")
+    p.add_argument("--window", type=float, default=10.0, help="Quota window in seconds (default: 10)")
+    p.add_argument("--concurrency", type=int, default=0, help="In-flight requests per model before 503, 0 = unlimited")
+    p.add_argument("--latency", type=float, default=0.5, help="Seconds per request (default: 0.5)")
+    p.add_argument("--veo-seconds", type=float, default=3.0, help="Seconds until a Veo operation is done (default: 3)")
+    p.add_argument("--veo-spread", type=float, default=0.0, help="Extra random seconds per Veo operation, 0..S (default: 0)")
+    p.add_argument("--image-bytes", type=int, default=0, help="Extra bytes appended to each returned PNG (default: 0)")
+    p.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    opts = p.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", opts.port), Handler)
+    server.daemon_threads = True
+    server.opts = opts
+    server.lock = threading.Lock()
+    server.quotas = {}
+    server.operations = []
+    server.image_b64 = base64.b64encode(tiny_png() + b"\0" * opts.image_bytes).decode() if opts.image_bytes else PNG_B64
+    print(f"Mock Gemini on http://127.0.0.1:{opts.port}/v1beta | quota {opts.quota}/{opts.window:g}s | "
+          f"concurrency {opts.concurrency or 'unlimited'} | latency {opts.latency:g}s", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
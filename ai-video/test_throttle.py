@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Tests for throttle.py, the last one against mock-gemini.py served in-process.
+
+    python3 ai-video/test_throttle.py      (or: python3 -m pytest ai-video)
+
+The mock run (15 keys, quota 6/3s, concurrency 3) takes about 10 seconds.
+"""
+import argparse, importlib.util, json, os, random, sys, threading, time, unittest
+from http.server import ThreadingHTTPServer
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from gemini_client import GeminiClient, GeminiError  # noqa: E402
+from throttle import BACKOFF_CAP, Limiter, Task, TokenBucket, backoff_delay, run_tasks  # noqa: E402
+
+
+def load_mock():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock-gemini.py")
+    spec = importlib.util.spec_from_file_location("mock_gemini", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_mock(**opts):
+    """ThreadingHTTPServer with the mock Handler on a free port -> (server, base url)."""
+    mock = load_mock()
+    defaults = {"quota": 20, "window": 10.0, "concurrency": 0, "latency": 0.0, "veo_seconds": 3.0,
+                "veo_spread": 0.0, "image_bytes": 0, "verbose": False}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), mock.Handler)
+    server.daemon_threads = True
+    server.opts = argparse.Namespace(**dict(defaults, **opts))
+    server.lock = threading.Lock()
+    server.quotas = {}
+    server.operations = []
+    server.image_b64 = mock.PNG_B64
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+
+
+class BackoffDelayTest(unittest.TestCase):
+    def test_retry_after_plus_jitter(self):
+        for _ in range(200):
+            self.assertTrue(3.0 <= backoff_delay(1, retry_after=3.0) <= 4.1)
+            self.assertTrue(0.5 <= backoff_delay(4, retry_after=0.5) <= 1.1)
+
+    def test_full_jitter_exponential_capped(self):
+        random.seed(0)
+        for attempt in (1, 2, 3):
+            delays = [backoff_delay(attempt) for _ in range(200)]
+            self.assertTrue(all(0 <= d <= 2.0 * 2 ** (attempt - 1) for d in delays))
+            self.assertGreater(max(delays), 2 ** (attempt - 1))
+        self.assertTrue(all(backoff_delay(20) <= BACKOFF_CAP for _ in range(200)))
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_rate_and_burst(self):
+        bucket = TokenBucket(rate=2.0, burst=2)
+        now = bucket.updated
+        self.assertTrue(bucket.try_take(now))
+        self.assertTrue(bucket.try_take(now))
+        self.assertFalse(bucket.try_take(now))
+        self.assertAlmostEqual(bucket.wait_time(now), 0.5)
+        self.assertTrue(bucket.try_take(now + 0.5))
+        # the refill stops at burst
+        self.assertTrue(bucket.try_take(now + 10))
+        self.assertTrue(bucket.try_take(now + 10))
+        self.assertFalse(bucket.try_take(now + 10))
+
+    def test_unlimited(self):
+        bucket = TokenBucket()
+        self.assertTrue(all(bucket.try_take() for _ in range(100)))
+        self.assertEqual(bucket.wait_time(), 0.0)
+
+
+class LimiterTest(unittest.TestCase):
+    def test_window_grows_on_success_up_to_max(self):
+        limiter = Limiter("m", workers=2, max_workers=3)
+        limiter.success()
+        self.assertAlmostEqual(limiter.window, 2.5)
+        for _ in range(20):
+            limiter.success()
+        self.assertEqual(limiter.window, 3)
+        self.assertEqual(limiter.stats["ok"], 21)
+
+    def test_halved_once_per_round_trip(self):
+        limiter = Limiter("m", workers=8)
+        limiter.throttled(started_at=0.0, now=1.0)
+        self.assertEqual(limiter.window, 4)
+        # started before the cut: same congestion event, no second cut
+        limiter.throttled(started_at=0.5, now=1.2)
+        self.assertEqual(limiter.window, 4)
+        limiter.throttled(started_at=1.5, now=2.0)
+        self.assertEqual(limiter.window, 2)
+        self.assertEqual(limiter.stats["throttled"], 3)
+        for now in (3.0, 4.0, 5.0):
+            limiter.throttled(started_at=now - 0.1, now=now)
+        self.assertEqual(limiter.window, limiter.min_workers)
+
+    def test_window_and_retry_after_pause(self):
+        limiter = Limiter("m", workers=2)
+        self.assertTrue(limiter.try_acquire(0.0))
+        self.assertTrue(limiter.try_acquire(0.0))
+        self.assertFalse(limiter.try_acquire(0.0))
+        self.assertEqual(limiter.wait_time(0.0), float("inf"))
+        limiter.release(0.5)
+        limiter.release(0.5)
+        limiter.throttled(started_at=0.0, now=0.5, retry_after=2.0)
+        self.assertAlmostEqual(limiter.wait_time(1.0), 1.5)
+        self.assertFalse(limiter.try_acquire(1.0))
+        self.assertTrue(limiter.try_acquire(2.5))
+
+
+class RunTasksTest(unittest.TestCase):
+    def run_lane(self, tasks, retries=3):
+        limiter = Limiter("m", workers=2)
+        results, retried = {}, []
+        run_tasks(tasks, {"m": limiter}, lambda task, status, detail: results.setdefault(task.key, (status, detail)),
+                  retries=retries, on_retry=lambda task, error, delay: retried.append(task.key))
+        return limiter, results, retried
+
+    def test_retry_then_ok(self):
+        calls = []
+
+        def flaky(key):
+            calls.append(key)
+            if calls.count(key) == 1:
+                raise GeminiError("overloaded", status=503, retry_after=0.01)
+            return "OK", key
+
+        limiter, results, retried = self.run_lane([Task(k, "m", flaky, k) for k in ("a", "b")])
+        self.assertEqual(results, {"a": ("OK", "a"), "b": ("OK", "b")})
+        self.assertEqual(sorted(retried), ["a", "b"])
+        self.assertEqual((limiter.stats["throttled"], limiter.stats["retries"], limiter.stats["failed"]), (2, 2, 0))
+
+    def test_errors(self):
+        def quota(key):
+            raise GeminiError("quota", status=429, retry_after=0.01)
+
+        def bad_request(key):
+            raise GeminiError("invalid prompt", status=400)
+
+        def missing_file(key):
+            raise FileNotFoundError(f"no such file: {key}.png")
+
+        tasks = [Task("quota", "m", quota, "q"), Task("bad", "m", bad_request, "b"),
+                 Task("file", "m", missing_file, "f")]
+        limiter, results, retried = self.run_lane(tasks, retries=2)
+        self.assertEqual({key: status for key, (status, _) in results.items()},
+                         {"quota": "ERROR", "bad": "ERROR", "file": "ERROR"})
+        self.assertIn("no such file", results["file"][1])
+        self.assertEqual(retried, ["quota", "quota"])
+        self.assertEqual(limiter.stats["failed"], 3)
+        self.assertEqual(limiter.in_flight, 0)
+
+
+class MockServerTest(unittest.TestCase):
+    KEYS, QUOTA, WINDOW, CONCURRENCY = 15, 6, 3.0, 3
+
+    def test_converges_under_quota(self):
+        server, base = start_mock(quota=self.QUOTA, window=self.WINDOW, concurrency=self.CONCURRENCY, latency=0.2)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = GeminiClient("test-key", base=base, cache=None)
+        self.addCleanup(client.pool.close)
+
+        def generate(prompt):
+            generation = client.native(prompt)
+            return ("OK", prompt) if len(generation) else ("FAIL", "no image data in response")
+
+        limiter = Limiter("native", workers=5, max_workers=8)
+        results = {}
+        started = time.monotonic()
+        run_tasks([Task(f"k{i}", "native", generate, f"prompt {i}") for i in range(self.KEYS)], {"native": limiter},
+                  lambda task, status, detail: results.__setitem__(task.key, status))
+        elapsed = time.monotonic() - started
+
+        with urlopen(base.rsplit("/v1beta", 1)[0] + "/stats") as resp:
+            stats = next(iter(json.load(resp).values()))
+        self.assertEqual(results, {f"k{i}": "OK" for i in range(self.KEYS)})
+        self.assertEqual((limiter.stats["ok"], limiter.stats["failed"]), (self.KEYS, 0))
+        self.assertGreater(limiter.stats["throttled"], 0)
+        self.assertGreater(limiter.stats["retries"], 0)
+        self.assertEqual(limiter.stats["throttled"], stats.get("429", 0) + stats.get("503", 0))
+        self.assertEqual(stats["ok"], self.KEYS)
+        self.assertLessEqual(stats["peak_in_flight"], self.CONCURRENCY)
+        # 15 requests at 6 per 3s need at least two more windows
+        self.assertGreaterEqual(elapsed, 2 * self.WINDOW)
+
+
+if __name__ == "__main__":
+    unittest.main()
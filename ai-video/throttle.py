@@ -0,0 +1,203 @@
+"""Adaptive request throttling for the Gemini scripts.
+
+Per lane (a model, or an API shared by several models), a Limiter combines:
+- a token bucket (--rpm): hard cap on the request rate, for a known quota
+- AIMD on the concurrency window: +1/window per success, halved on 429/503
+  (once per round trip: throttles of requests started before the last cut are ignored)
+- a pause until Retry-After (header or RetryInfo) after a throttle
+
+run_tasks() is the dispatcher: it starts tasks while their lane's limiter allows,
+retries failed keys within the same run (Retry-After, else exponential backoff with
+full jitter) and reports each final result. All limiter state lives in the
+dispatcher thread; workers only run the requests.
+
+Usage:
+    limiters = {MODEL: Limiter(MODEL, workers=5, max_workers=16, rpm=None)}
+    run_tasks([Task(key, MODEL, fn, prompt) for ...], limiters, on_result=print_result)
+    for limiter in limiters.values():
+        print(limiter.summary())
+"""
+import heapq, random, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from gemini_client import GeminiError
+
+THROTTLE_STATUS = (429, 503)
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 60.0
+DEFAULT_RETRIES = 5
+IDLE_WAIT = 0.05
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds before retry number `attempt` (1-based): Retry-After plus jitter, else full-jitter exponential."""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, min(retry_after, 1.0) + 0.1)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+class TokenBucket:
+    """rate tokens/s, up to burst. rate None = unlimited."""
+
+    def __init__(self, rate=None, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now=None):
+        if not self.rate:
+            return True
+        self._refill(now or time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self, now=None):
+        """Seconds until a token is available."""
+        if not self.rate:
+            return 0.0
+        self._refill(now or time.monotonic())
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class Limiter:
+    """Concurrency window (AIMD) + token bucket + Retry-After pause for one lane."""
+
+    def __init__(self, name, workers=5, max_workers=16, min_workers=1, rpm=None):
+        self.name = name
+        self.window = float(max(min_workers, workers))
+        self.min_workers = min_workers
+        self.max_workers = max(max_workers, workers)
+        self.bucket = TokenBucket(rpm / 60.0 if rpm else None, burst=max(1, int(workers)))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.cut_at = 0.0
+        self.started = None
+        self.finished = None
+        self.stats = {"ok": 0, "throttled": 0, "retries": 0, "failed": 0}
+        self.peak_window = self.window
+
+    def wait_time(self, now):
+        """0 if a request may start now, else seconds to wait (inf while the window is full)."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.window):
+            return float("inf")
+        return self.bucket.wait_time(now)
+
+    def try_acquire(self, now):
+        if self.wait_time(now) > 0 or not self.bucket.try_take(now):
+            return False
+        self.in_flight += 1
+        if self.started is None:
+            self.started = now
+        return True
+
+    def release(self, now):
+        self.in_flight -= 1
+        self.finished = now
+
+    def success(self):
+        self.stats["ok"] += 1
+        self.window = min(self.max_workers, self.window + 1.0 / self.window)
+        self.peak_window = max(self.peak_window, self.window)
+
+    def throttled(self, started_at, now, retry_after=None):
+        """429/503: halve the window (once per round trip) and pause until Retry-After."""
+        self.stats["throttled"] += 1
+        if started_at >= self.cut_at:
+            self.window = max(self.min_workers, self.window / 2)
+            self.cut_at = now
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+    def summary(self):
+        elapsed = (self.finished or 0) - (self.started or 0)
+        rate = self.stats["ok"] / elapsed * 60 if elapsed > 0 else 0.0
+        return (f"{self.name}: {self.stats['ok']} ok in {elapsed:.1f}s ({rate:.1f}/min), "
+                f"window {self.window:.1f} (peak {self.peak_window:.1f}), {self.stats['throttled']} throttled, "
+                f"{self.stats['retries']} retries, {self.stats['failed']} failed")
+
+
+class Task:
+    """One request: fn(*args) -> (status, detail); a GeminiError means the request failed (retried if
+    retryable), any other exception is reported as ERROR for this task."""
+
+    __slots__ = ("key", "lane", "fn", "args", "attempt")
+
+    def __init__(self, key, lane, fn, *args):
+        self.key = key
+        self.lane = lane
+        self.fn = fn
+        self.args = args
+        self.attempt = 0
+
+
+def run_tasks(tasks, limiters, on_result, retries=DEFAULT_RETRIES, on_retry=None, max_threads=None):
+    """Run tasks under their lane's limiter ({lane: Limiter}). on_result(task, status, detail) once per task;
+    on_retry(task, error, delay) before each automatic retry."""
+    pending = {lane: deque() for lane in limiters}
+    for task in tasks:
+        pending[task.lane].append(task)
+    delayed = []  # heap (ready_at, seq, task)
+    running = {}
+    seq = 0
+    threads = max_threads or sum(limiter.max_workers for limiter in limiters.values())
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while running or delayed or any(pending.values()):
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                task = heapq.heappop(delayed)[2]
+                pending[task.lane].appendleft(task)
+
+            next_wake = delayed[0][0] - now if delayed else IDLE_WAIT
+            for lane, queue in pending.items():
+                limiter = limiters[lane]
+                while queue and limiter.try_acquire(now):
+                    task = queue.popleft()
+                    task.attempt += 1
+                    running[pool.submit(task.fn, *task.args)] = (task, now)
+                if queue:
+                    next_wake = min(next_wake, limiter.wait_time(now))
+
+            if not running:
+                time.sleep(min(max(next_wake, 0.0), 1.0) or IDLE_WAIT)
+                continue
+            done, _ = wait(running, timeout=min(max(next_wake, IDLE_WAIT), 1.0), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in done:
+                task, started_at = running.pop(future)
+                limiter = limiters[task.lane]
+                limiter.release(now)
+                try:
+                    status, detail = future.result()
+                except GeminiError as e:
+                    if e.status in THROTTLE_STATUS:
+                        limiter.throttled(started_at, now, e.retry_after)
+                    if e.retryable and task.attempt <= retries:
+                        delay = backoff_delay(task.attempt, e.retry_after)
+                        limiter.stats["retries"] += 1
+                        if on_retry:
+                            on_retry(task, e, delay)
+                        seq += 1
+                        heapq.heappush(delayed, (now + delay, seq, task))
+                        continue
+                    limiter.stats["failed"] += 1
+                    on_result(task, "ERROR", str(e)[:300])
+                    continue
+                except Exception as e:  # disk full, permissions, bad input: fails this task, not the run
+                    limiter.stats["failed"] += 1
+                    on_result(task, "ERROR", str(e)[:300] or type(e).__name__)
+                    continue
+                if status == "OK":
+                    limiter.success()
+                on_result(task, status, detail)
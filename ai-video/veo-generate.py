@@ -1,31 +1,46 @@
 #!/usr/bin/env python3
-"""Generate video using Veo API with polling and automatic download."""
-import argparse, base64, json, os, sys, time
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError
+"""Generate video using Veo API with polling and automatic download.
 
-API_BASE = "https://generativelanguage.googleapis.com/v1beta"
-DEFAULT_MODEL = "veo-3.1-fast-generate-preview"
+Usage:
+    python3 ai-video/veo-generate.py "a red fox in the snow" -o fox.mp4
+    python3 ai-video/veo-generate.py --batch clips.json --workers 4
+
+Batch file (relative paths are relative to it):
+    {
+      "defaults": {"model": "veo-3.1-fast-generate-preview", "resolution": "720p", "duration": 8},
+      "jobs": [
+        {"name": "clip01", "prompt": "...", "output": "clips/clip01.mp4", "image": "frames/01.png"},
+        {"prompt": "...", "aspect_ratio": "9:16"}
+      ]
+    }
+Job fields mirror the options: prompt, output, model, negative_prompt, aspect_ratio, resolution,
+duration, person_generation, num_videos, seed, image, last_frame, video, ref_images.
 
+Jobs are submitted concurrently under an adaptive limit (throttle.py: AIMD on 429/503,
+Retry-After, retries). One poller checks every pending operation on its own schedule:
+short intervals at first, then, once some clips have finished, it waits until about the
+fastest observed completion time, polls often through the observed range and backs off
+beyond it (PollSchedule). Each video downloads as soon as it is ready, so a batch takes
+about as long as its slowest clip. Results go to <batch>.results.json.
 
-def load_api_key():
-    key = os.environ.get("GEMINI_API_KEY")
-    if key:
-        return key
-    env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
-    if os.path.exists(env_path):
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("GEMINI_API_KEY="):
-                    return line.split("=", 1)[1].strip().strip('"').strip("'")
-    print("ERROR: GEMINI_API_KEY not found in env or .env file", file=sys.stderr)
-    sys.exit(1)
+Input media (--image, --video, --last-frame, --ref-images) is streamed into the request
+as base64 (FileData), so a large --video is never loaded into memory.
+"""
+import argparse, heapq, json, os, queue, sys, threading, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from gemini_client import FileData, GeminiClient, GeminiError, load_api_key
+from throttle import DEFAULT_RETRIES, Limiter, Task, backoff_delay, run_tasks
 
-def read_file_base64(path):
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
+DEFAULT_MODEL = "veo-3.1-fast-generate-preview"
+JOB_DEFAULTS = {
+    "model": DEFAULT_MODEL, "negative_prompt": None, "aspect_ratio": "16:9", "resolution": "720p", "duration": 4,
+    "person_generation": "allow_all", "num_videos": 1, "seed": None, "image": None, "last_frame": None,
+    "video": None, "ref_images": None,
+}
+PATH_FIELDS = ("output", "image", "last_frame", "video", "ref_images")
+DOWNLOAD_ATTEMPTS = 3
+POLL_ERRORS = 5
 
 
 def mime_for(path):
@@ -33,76 +48,236 @@ def mime_for(path):
     return {"png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp", ".mp4": "video/mp4"}.get(ext, "image/png")
 
 
-def submit(api_key, model, prompt, negative_prompt, aspect_ratio, resolution, duration, person_generation, num_videos, seed, image_path, last_frame_path, video_path, ref_image_paths):
-    url = f"{API_BASE}/models/{model}:predictLongRunning"
-    instance = {"prompt": prompt}
-    if negative_prompt:
-        instance["negativePrompt"] = negative_prompt
-    if image_path:
-        instance["image"] = {"inlineData": {"mimeType": mime_for(image_path), "data": read_file_base64(image_path)}}
-    if video_path:
-        instance["video"] = {"inlineData": {"mimeType": "video/mp4", "data": read_file_base64(video_path)}}
-    params = {"aspectRatio": aspect_ratio, "resolution": resolution, "durationSeconds": duration, "personGeneration": person_generation}
-    if num_videos and num_videos > 1:
-        params["numberOfVideos"] = num_videos
-    if seed is not None:
-        params["seed"] = seed
-    if last_frame_path:
-        params["lastFrame"] = {"inlineData": {"mimeType": mime_for(last_frame_path), "data": read_file_base64(last_frame_path)}}
-    if ref_image_paths:
-        params["referenceImages"] = [{"image": {"inlineData": {"mimeType": mime_for(p), "data": read_file_base64(p)}}, "referenceType": "asset"} for p in ref_image_paths]
-    body = json.dumps({"instances": [instance], "parameters": params}).encode()
-    req = Request(url, data=body, headers={"x-goog-api-key": api_key, "Content-Type": "application/json"})
+def build_request(job):
+    instance = {"prompt": job["prompt"]}
+    if job["negative_prompt"]:
+        instance["negativePrompt"] = job["negative_prompt"]
+    if job["image"]:
+        instance["image"] = {"inlineData": {"mimeType": mime_for(job["image"]), "data": FileData(job["image"])}}
+    if job["video"]:
+        instance["video"] = {"inlineData": {"mimeType": "video/mp4", "data": FileData(job["video"])}}
+    params = {"aspectRatio": job["aspect_ratio"], "resolution": job["resolution"], "durationSeconds": job["duration"], "personGeneration": job["person_generation"]}
+    if job["num_videos"] and job["num_videos"] > 1:
+        params["numberOfVideos"] = job["num_videos"]
+    if job["seed"] is not None:
+        params["seed"] = job["seed"]
+    if job["last_frame"]:
+        params["lastFrame"] = {"inlineData": {"mimeType": mime_for(job["last_frame"]), "data": FileData(job["last_frame"])}}
+    if job["ref_images"]:
+        params["referenceImages"] = [{"image": {"inlineData": {"mimeType": mime_for(p), "data": FileData(p)}}, "referenceType": "asset"} for p in job["ref_images"]]
+    return {"instances": [instance], "parameters": params}
+
+
+def input_paths(job):
+    paths = [job[field] for field in ("image", "last_frame", "video") if job[field]]
+    return paths + list(job["ref_images"] or ())
+
+
+def submit(client, job):
     try:
-        resp = urlopen(req, timeout=60)
-        data = json.loads(resp.read())
-    except HTTPError as e:
-        err = e.read().decode()
-        print(f"ERROR submitting: {e.code} {err}", file=sys.stderr)
-        sys.exit(1)
-    if "error" in data:
-        print(f"ERROR: {data['error'].get('message', data['error'])}", file=sys.stderr)
-        sys.exit(1)
-    op_name = data["name"]
-    print(f"Submitted. Operation: {op_name}")
-    return op_name
-
-
-def poll(api_key, op_name, interval=10, max_polls=60):
-    url = f"{API_BASE}/{op_name}"
-    for i in range(1, max_polls + 1):
-        time.sleep(interval)
-        req = Request(url, headers={"x-goog-api-key": api_key})
-        resp = urlopen(req, timeout=30)
-        data = json.loads(resp.read())
-        done = data.get("done", False)
-        print(f"  Poll {i}: done={done}")
-        if done:
-            if "error" in data:
-                print(f"ERROR: {data['error']}", file=sys.stderr)
-                sys.exit(1)
-            samples = data["response"]["generateVideoResponse"]["generatedSamples"]
-            return [s["video"]["uri"] for s in samples]
-    print("ERROR: Timed out waiting for video generation", file=sys.stderr)
-    sys.exit(1)
-
-
-def download(api_key, uri, output_path):
-    req = Request(uri, headers={"x-goog-api-key": api_key})
-    resp = urlopen(req, timeout=120)
-    with open(output_path, "wb") as f:
-        while True:
-            chunk = resp.read(65536)
-            if not chunk:
+        return "OK", client.predict_long_running(job["model"], build_request(job))
+    except GeminiError:
+        raise
+    except Exception as e:  # unreadable input file etc.: fails this job, not the batch
+        return "ERROR", str(e) or type(e).__name__
+
+
+def output_paths(output, count):
+    if count == 1:
+        return [output]
+    base, ext = os.path.splitext(output)
+    return [f"{base}_{i + 1}{ext}" for i in range(count)]
+
+
+def download(client, job, uris):
+    """Download every video of a finished job (retrying transient errors). -> [(path, bytes)]"""
+    saved = []
+    for uri, out in zip(uris, output_paths(job["output"], len(uris))):
+        if os.path.dirname(out):
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                saved.append((out, client.download(uri, out)))
                 break
-            f.write(chunk)
-    size_mb = os.path.getsize(output_path) / (1024 * 1024)
-    print(f"  Saved: {output_path} ({size_mb:.1f} MB)")
+            except GeminiError as e:
+                if not e.retryable or attempt == DOWNLOAD_ATTEMPTS:
+                    raise
+                time.sleep(backoff_delay(attempt, e.retry_after))
+    return saved
+
+
+class PollSchedule:
+    """When to poll an operation next, from the completion times observed in this run."""
+
+    def __init__(self, min_interval=5.0, max_interval=30.0):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.durations = []
+
+    def observe(self, seconds):
+        self.durations.append(seconds)
+        self.durations.sort()
+
+    def quantile(self, q):
+        return self.durations[min(len(self.durations) - 1, int(q * len(self.durations)))]
+
+    def next_delay(self, age, polls):
+        """Seconds until the next poll of an operation submitted `age` seconds ago and polled `polls` times."""
+        backoff = min(self.max_interval, self.min_interval * 1.5 ** polls)
+        if not self.durations:
+            return backoff
+        fastest, slow = self.quantile(0.1), self.quantile(0.9)
+        if age < fastest:
+            return max(self.min_interval, min(self.max_interval, fastest - age))
+        if age <= slow:
+            return max(self.min_interval, min(self.max_interval, (slow - fastest) / 10))
+        return backoff
+
+
+def load_batch(path, outdir=None):
+    with open(path, encoding="utf-8") as f:
+        batch = json.load(f)
+    defaults, entries = ({}, batch) if isinstance(batch, list) else (batch.get("defaults", {}), batch.get("jobs", []))
+    if not entries:
+        raise ValueError(f"{path}: no jobs")
+    base = os.path.dirname(os.path.abspath(path))
+    jobs, names = [], set()
+    for i, entry in enumerate(entries, 1):
+        job = dict(JOB_DEFAULTS, **defaults)
+        job.update(entry)
+        unknown = set(job) - set(JOB_DEFAULTS) - {"name", "prompt", "output"}
+        if unknown:
+            raise ValueError(f"{path}: job {i}: unknown field(s) {', '.join(sorted(unknown))}")
+        if not job.get("prompt"):
+            raise ValueError(f"{path}: job {i} has no prompt")
+        job.setdefault("name", os.path.splitext(os.path.basename(job["output"]))[0] if job.get("output") else f"job{i:02d}")
+        if job["name"] in names:
+            raise ValueError(f"{path}: duplicate job name {job['name']!r}")
+        names.add(job["name"])
+        for field in PATH_FIELDS:
+            value = job.get(field)
+            if isinstance(value, list):
+                job[field] = [os.path.join(base, v) for v in value]
+            elif value:
+                job[field] = os.path.join(base, value)
+        job.setdefault("output", os.path.join(outdir or base, f"{job['name']}.mp4"))
+        missing = [p for p in input_paths(job) if not os.path.isfile(p)]
+        if missing:
+            job.update(status="ERROR", detail=f"missing input: {', '.join(missing)}")
+        jobs.append(job)
+    return jobs
+
+
+def run_batch(client, jobs, args):
+    """Submit all jobs, poll them on a shared adaptive schedule and download each video when ready."""
+    schedule = PollSchedule(args.poll_interval, args.max_poll_interval)
+    limiter = Limiter("veo", args.workers, args.max_workers, rpm=args.rpm)
+    submitted = queue.Queue()
+
+    def on_submitted(task, status, detail):
+        job = task.args[1]
+        if status == "OK":
+            job.update(operation=detail, submitted_at=time.monotonic(), polls=0, poll_errors=0)
+            print(f"SUBMIT {job['name']} -> {detail}")
+            submitted.put(job)
+        else:
+            finish(job, "ERROR", f"submitting: {detail}")
+
+    def on_retry(task, error, delay):
+        print(f"RETRY {task.key} submit in {delay:.1f}s -> {error}")
+
+    def finish(job, status, detail):
+        job.update(status=status, detail=detail)
+        print(f"{status} {job['name']}: {detail}" if status != "OK" else f"OK {job['name']} -> {detail}")
+
+    def submit_all():
+        try:
+            run_tasks(tasks, {"veo": limiter}, on_submitted, retries=args.retries, on_retry=on_retry)
+        except Exception as e:
+            for job in jobs:
+                if not job.get("status") and not job.get("operation"):
+                    finish(job, "ERROR", f"submitting: {e}")
+        finally:
+            submitting.set()
+
+    for job in jobs:
+        if job.get("status"):
+            print(f"SKIP {job['name']}: {job['detail']}")
+    tasks = [Task(job["name"], "veo", submit, client, job) for job in jobs if not job.get("status")]
+    submitting = threading.Event()  # set once every job is submitted or failed, whatever happens to run_tasks
+    threading.Thread(target=submit_all, daemon=True).start()
+    pending = []  # heap (next poll at, seq, job)
+    downloads = {}
+    seq = 0
+    with ThreadPoolExecutor(max_workers=args.download_workers) as pool:
+        while not submitting.is_set() or not submitted.empty() or pending or downloads:
+            now = time.monotonic()
+            while not submitted.empty():
+                job = submitted.get()
+                seq += 1
+                heapq.heappush(pending, (job["submitted_at"] + schedule.next_delay(0, 0), seq, job))
+
+            while pending and pending[0][0] <= now:
+                job = heapq.heappop(pending)[2]
+                age = time.monotonic() - job["submitted_at"]
+                try:
+                    data = client.operation(job["operation"])
+                except GeminiError as e:
+                    job["poll_errors"] += 1
+                    if not e.retryable or job["poll_errors"] > POLL_ERRORS:
+                        finish(job, "ERROR", f"polling: {e}")
+                        continue
+                    seq += 1
+                    heapq.heappush(pending, (time.monotonic() + backoff_delay(job["poll_errors"], e.retry_after), seq, job))
+                    continue
+                job["polls"] += 1
+                if not data.get("done"):
+                    if age > args.timeout:
+                        finish(job, "ERROR", f"timed out after {age:.0f}s ({job['polls']} polls)")
+                        continue
+                    seq += 1
+                    heapq.heappush(pending, (time.monotonic() + schedule.next_delay(age, job["polls"]), seq, job))
+                    continue
+                schedule.observe(age)
+                job["generation_s"] = round(age, 1)
+                response = data.get("response", {}).get("generateVideoResponse", {})
+                uris = [s["video"]["uri"] for s in response.get("generatedSamples") or [] if s.get("video", {}).get("uri")]
+                if not uris:
+                    reasons = response.get("raiMediaFilteredReasons")
+                    finish(job, "FAIL", "no video in response" + (f": {'; '.join(reasons)}" if reasons else ""))
+                    continue
+                print(f"  {job['name']}: ready after {age:.0f}s ({job['polls']} polls), downloading")
+                downloads[pool.submit(download, client, job, uris)] = job
+
+            for future in [f for f in downloads if f.done()]:
+                job = downloads.pop(future)
+                try:
+                    saved = future.result()
+                except Exception as e:  # GeminiError, or OSError from the output dir / disk
+                    finish(job, "ERROR", f"downloading: {e}")
+                    continue
+                job["outputs"] = [path for path, _ in saved]
+                finish(job, "OK", ", ".join(f"{path} ({size / (1024 * 1024):.1f} MB)" for path, size in saved))
+
+            timeout = 0.5 if not pending else max(0.0, min(0.5, pending[0][0] - time.monotonic()))
+            if downloads:
+                wait(downloads, timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                time.sleep(timeout)
+    return schedule, limiter
+
+
+def write_results(path, jobs):
+    fields = ("name", "prompt", "model", "output", "status", "detail", "operation", "polls", "generation_s", "outputs")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{k: job.get(k) for k in fields} for job in jobs], f, indent=2, ensure_ascii=False)
 
 
 def main():
     p = argparse.ArgumentParser(description="Generate video with Veo API")
-    p.add_argument("prompt", help="Video description prompt")
+    p.add_argument("prompt", nargs="?", help="Video description prompt")
+    p.add_argument("--batch", help="JSON file with Veo jobs (see the docstring); replaces the prompt")
+    p.add_argument("--outdir", help="Batch: output dir for jobs without \"output\" (default: next to the batch file)")
     p.add_argument("-o", "--output", default="output.mp4", help="Output file path (default: output.mp4)")
     p.add_argument("-m", "--model", default=DEFAULT_MODEL, help=f"Model ID (default: {DEFAULT_MODEL})")
     p.add_argument("--negative-prompt", help="Elements to exclude from the video")
@@ -116,28 +291,54 @@ def main():
     p.add_argument("--last-frame", help="Last frame image path (interpolation, Veo 3.1 only)")
     p.add_argument("--video", help="Previous video path for extension (Veo 3.1 only)")
     p.add_argument("--ref-images", nargs="+", help="Reference image paths for subject consistency (up to 3, Veo 3.1 only)")
-    p.add_argument("--poll-interval", type=int, default=10, help="Polling interval in seconds (default: 10)")
+    p.add_argument("--poll-interval", type=float, default=5, help="Shortest polling interval in seconds (default: 5)")
+    p.add_argument("--max-poll-interval", type=float, default=30, help="Longest polling interval in seconds (default: 30)")
+    p.add_argument("--timeout", type=float, default=900, help="Give up on a job after this many seconds (default: 900)")
+    p.add_argument("--workers", type=int, default=4, help="Initial concurrent submissions (default: 4)")
+    p.add_argument("--max-workers", type=int, default=10, help="Upper bound for the adaptive submissions (default: 10)")
+    p.add_argument("--rpm", type=float, help="Submissions per minute cap (default: no cap)")
+    p.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                   help=f"Submit retries on 429/5xx/network errors (default: {DEFAULT_RETRIES})")
+    p.add_argument("--download-workers", type=int, default=4, help="Concurrent downloads (default: 4)")
     args = p.parse_args()
 
-    api_key = load_api_key()
-    print(f"Model: {args.model}")
-    print(f"Resolution: {args.resolution} | Duration: {args.duration}s | Aspect: {args.aspect_ratio}")
-    print(f"Prompt: {args.prompt[:100]}{'...' if len(args.prompt) > 100 else ''}")
-
-    op_name = submit(api_key, args.model, args.prompt, args.negative_prompt, args.aspect_ratio, args.resolution, args.duration, args.person_generation, args.num_videos, args.seed, args.image, args.last_frame, args.video, args.ref_images)
+    if bool(args.prompt) == bool(args.batch):
+        p.error("give a prompt or --batch (not both)")
+    if args.batch:
+        try:
+            jobs = load_batch(args.batch, args.outdir)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        job = {field: getattr(args, field) for field in JOB_DEFAULTS}
+        jobs = [dict(job, name=os.path.splitext(os.path.basename(args.output))[0], prompt=args.prompt, output=args.output)]
 
-    print("Waiting for generation...")
-    uris = poll(api_key, op_name, interval=args.poll_interval)
+    client = GeminiClient(load_api_key())
+    if args.batch:
+        print(f"Batch: {len(jobs)} jobs from {args.batch} | Workers: {args.workers} (adaptive, max {args.max_workers})")
+    else:
+        print(f"Model: {args.model}")
+        print(f"Resolution: {args.resolution} | Duration: {args.duration}s | Aspect: {args.aspect_ratio}")
+        print(f"Prompt: {args.prompt[:100]}{'...' if len(args.prompt) > 100 else ''}")
 
-    for i, uri in enumerate(uris):
-        if len(uris) == 1:
-            out = args.output
-        else:
-            base, ext = os.path.splitext(args.output)
-            out = f"{base}_{i+1}{ext}"
-        download(api_key, uri, out)
+    started = time.monotonic()
+    schedule, limiter = run_batch(client, jobs, args)
+    elapsed = time.monotonic() - started
 
-    print("Done!")
+    ok = sum(1 for job in jobs if job.get("status") == "OK")
+    if args.batch:
+        results = os.path.splitext(args.batch)[0] + ".results.json"
+        write_results(results, jobs)
+        slowest = f", slowest clip {schedule.durations[-1]:.0f}s" if schedule.durations else ""
+        print(f"\nDone: {ok}/{len(jobs)} ok in {elapsed:.0f}s{slowest}")
+        print(f"Submit: {limiter.summary()}")
+        print(f"HTTP: {client.pool.requests} requests over {client.pool.opened} connections")
+        print(f"Results: {results}")
+    elif ok:
+        print("Done!")
+    if ok < len(jobs):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
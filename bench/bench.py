@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+bench — Benchmarks das etapas de enhance e legendas em projetos sinteticos
+
+Para cada tamanho (clips), gera um projeto com bench/synth.py e mede:
+    enhance                   vpd-enhance-audio.py --skip-enhance (subprocesso; requer ffmpeg/ffprobe)
+    group_words_into_screens  agrupamento da transcricao sintetica em telas
+    create_text_effect_blocks TextEffectBlocks de todas as telas (modo word)
+    vpd_load                  Project.load do projeto
+    vpd_write                 project.save() depois de trocar as tracks de legenda
+
+Cada medida roda --repeat vezes (min e mediana). Os resultados vao para um JSON
+(default: bench/results/<data>-<commit>.json); --compare mostra a razao contra
+um resultado anterior.
+
+Uso:
+    python3 bench/bench.py
+    python3 bench/bench.py --sizes 10 100 --repeat 5 --only group_words_into_screens create_text_effect_blocks
+    python3 bench/bench.py --compare bench/results/20261019-120000-abc1234.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+ENHANCE_SCRIPT = os.path.join(REPO_DIR, "vpd-enhance-audio", "vpd-enhance-audio.py")
+SUBTITLES_SCRIPT = os.path.join(REPO_DIR, "vpd-add-subtitles", "vpd-add-subtitles.py")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+from vpd import Project  # noqa: E402
+import synth  # noqa: E402
+
+BENCHMARKS = ("enhance", "group_words_into_screens", "create_text_effect_blocks", "vpd_load", "vpd_write")
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_REPEAT = 3
+
+# Opcoes de legenda (defaults do vpd-add-subtitles)
+MAX_LINES = 2
+MAX_CHARS = 28
+GAP_THRESHOLD = 1.5
+HIGHLIGHT_SCALE = 120
+
+
+def load_script(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Quiet:
+    """Silencia o stdout (os scripts imprimem progresso) durante a medida."""
+
+    def __enter__(self):
+        self.stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+
+    def __exit__(self, exc_type, exc, tb):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+        return False
+
+
+def measure(func, repeat, setup=None):
+    """Executa func() repeat vezes (setup() antes de cada uma, fora da medida). -> [segundos]"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with Quiet():
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def style_config_for(subtitles, style):
+    """style_config como o layout_subtitles monta (defaults do vpd-add-subtitles)."""
+    config = subtitles.load_vlogger_style(style)
+    config.update({"highlight_color": "#00FF00", "highlight_scale": HIGHLIGHT_SCALE, "position_y": 0.70,
+                   "margin": 100, "advance_ms": 33, "base_color": "#FFFFFF"})
+    return config
+
+
+def run_size(clips, args, subtitles, work_dir):
+    """Gera o projeto de `clips` clips e roda os benchmarks pedidos. -> [resultado]"""
+    out_dir = os.path.join(work_dir, f"clips_{clips}")
+    info = synth.generate_project(out_dir, clips=clips, seed=args.seed)
+    with open(info["vpd"], "rb") as f:
+        original = f.read()
+
+    def restore():
+        with open(info["vpd"], "wb") as f:
+            f.write(original)
+        for suffix in (".bak", ".cache"):
+            if os.path.exists(info["vpd"] + suffix):
+                os.remove(info["vpd"] + suffix)
+
+    subtitles.VLOGGER_STYLES_DIR = info["styles_dir"]
+    words = subtitles.parse_whisper_json(info["whisper_json"])
+    with Quiet():
+        style_config = style_config_for(subtitles, info["style"])
+        metrics = subtitles.get_font_metrics(style_config["font"], style_config["font_size"],
+                                             style_config["bold"], style_config["space"])
+    screens = subtitles.group_words_into_screens(words, MAX_LINES, MAX_CHARS, GAP_THRESHOLD, HIGHLIGHT_SCALE, metrics)
+
+    def text_blocks():
+        blocks = []
+        for screen in screens:
+            blocks.extend(subtitles.create_text_effect_blocks(screen, style_config, 1080, 1920, 30.0))
+        return blocks
+
+    results = []
+
+    def record(name, times, **extra):
+        result = {
+            "name": name,
+            "clips": clips,
+            "words": info["words"],
+            "runs": [round(t, 6) for t in times],
+            "min_s": round(min(times), 6),
+            "median_s": round(statistics.median(times), 6),
+        }
+        result.update(extra)
+        results.append(result)
+        print(f"  {name:<26} {clips:>5} clips  mediana {result['median_s'] * 1000:>10.1f} ms  "
+              f"min {result['min_s'] * 1000:>10.1f} ms")
+
+    selected = args.only or BENCHMARKS
+    if "enhance" in selected:
+        missing = [b for b in ("ffmpeg", "ffprobe") if not (shutil.which(b) or shutil.which(b + ".exe"))]
+        if missing:
+            print(f"  {'enhance':<26} {clips:>5} clips  pulado: {', '.join(missing)} nao encontrado")
+        else:
+            cmd = [sys.executable, ENHANCE_SCRIPT, info["vpd"], "--skip-enhance"]
+            record("enhance", measure(lambda: subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL),
+                                      args.repeat, restore))
+    if "group_words_into_screens" in selected:
+        record("group_words_into_screens", measure(
+            lambda: subtitles.group_words_into_screens(words, MAX_LINES, MAX_CHARS, GAP_THRESHOLD,
+                                                       HIGHLIGHT_SCALE, metrics),
+            args.repeat), screens=len(screens), metrics=type(metrics).__name__)
+    if "create_text_effect_blocks" in selected:
+        record("create_text_effect_blocks", measure(text_blocks, args.repeat), screens=len(screens))
+    if "vpd_load" in selected:
+        restore()
+        record("vpd_load", measure(lambda: Project.load(info["vpd"]), args.repeat),
+               bytes=len(original))
+    if "vpd_write" in selected:
+        blocks = text_blocks()
+        state = {}
+
+        def prepare():
+            restore()
+            project = Project.load(info["vpd"])
+            with Quiet():
+                subtitles.modify_vpd_subtitles(project, blocks[0::2], blocks[1::2], save=False)
+            state["project"] = project
+
+        record("vpd_write", measure(lambda: state["project"].save(), args.repeat, prepare),
+               blocks=len(blocks))
+    return results
+
+
+def compare(results, base_path):
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = {(r["name"], r["clips"]): r for r in json.load(f)["results"]}
+    print(f"\n=== Comparacao com {os.path.basename(base_path)} (mediana) ===")
+    print(f"{'benchmark':<26} {'clips':>5} {'antes':>11} {'agora':>11} {'razao':>7}")
+    for r in results:
+        old = base.get((r["name"], r["clips"]))
+        if old is None:
+            continue
+        ratio = r["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        flag = "  <-- mais lento" if ratio > 1.1 else ""
+        print(f"{r['name']:<26} {r['clips']:>5} {old['median_s'] * 1000:>9.1f}ms {r['median_s'] * 1000:>9.1f}ms "
+              f"{ratio:>6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de enhance/legendas em projetos .vpd sinteticos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Numero de clips de cada projeto (default: 10 100 1000)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"Repeticoes por medida (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Rodar so estes benchmarks")
+    parser.add_argument("--seed", type=int, default=0, help="Seed dos projetos sinteticos (default: 0)")
+    parser.add_argument("-o", "--output", help="Arquivo JSON de resultados (default: bench/results/<data>-<commit>.json)")
+    parser.add_argument("--compare", help="JSON de um resultado anterior para comparar")
+    parser.add_argument("--keep", action="store_true", help="Manter os projetos gerados (mostra a pasta)")
+    args = parser.parse_args()
+
+    subtitles = load_script("vpd_add_subtitles", SUBTITLES_SCRIPT)
+    commit = git_commit()
+    work_dir = tempfile.mkdtemp(prefix="vpd_bench_")
+    results = []
+    print(f"=== vpd bench ({commit or 'sem git'}) ===")
+    try:
+        for clips in args.sizes:
+            results.extend(run_size(clips, args, subtitles, work_dir))
+    finally:
+        if args.keep:
+            print(f"Projetos gerados: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'local'}.json")
+    payload = {
+        "meta": {
+            "commit": commit,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nResultados: {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
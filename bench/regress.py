@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+regress — Regressao do pipeline completo contra saidas e orcamentos gravados
+
+Roda o vpd-pipeline (render -> enhance -> transcribe -> layout -> write) em um
+conjunto fixo de projetos sinteticos (bench/synth.py, seeds fixas) com dois
+substitutos locais:
+    transcricao  o JSON do whisper gerado junto com o projeto (sem Whisper)
+    enhance      ganho de -6 dB no audio clean (sem Adobe/navegador)
+O resto e o codigo real de vpd-enhance-audio.py e vpd-add-subtitles.py
+(requer ffmpeg/ffprobe).
+
+Para cada fixture confere:
+    audio   hash das amostras do -clean.wav e do -enhanced.wav (identico)
+    vpd     VPD gravado, normalizado (uuids aleatorios e a pasta do projeto
+            trocados por marcadores): sha256 do JSON compacto identico
+    rerun   uma segunda execucao pula todas as etapas
+    etapas  tempo (mediana das repeticoes) e pico de RSS do processo em cada
+            etapa dentro do orcamento gravado + --tolerance
+
+As saidas de referencia ficam versionadas em bench/golden/golden.json e sao
+gravadas com --update. So a fixture small guarda tambem o VPD normalizado
+inteiro (small.vpd.json), para apontar onde a estrutura mudou; nas outras, use
+--keep para guardar o VPD normalizado de cada execucao e comparar localmente.
+
+Os hashes de audio dependem do build do ffmpeg e ficam indexados pela versao
+(primeira linha de ffmpeg -version). Com um ffmpeg sem hashes gravados o audio
+nao e conferido (rode --update com ele para grava-los).
+
+Os orcamentos de tempo/RSS dependem da maquina e ficam so locais, em
+bench/golden/budgets.json (fora do git): grave-os com --update-budgets na
+maquina em que a regressao roda. Sem esse arquivo tempo e RSS so sao medidos e
+o resultado final diz que nao foram conferidos.
+
+Uso:
+    python3 bench/regress.py
+    python3 bench/regress.py --update-budgets
+    python3 bench/regress.py --update
+    python3 bench/regress.py --only small --tolerance 30 -v
+"""
+
+import argparse
+import array
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+PIPELINE_SCRIPT = os.path.join(REPO_DIR, "vpd-pipeline.py")
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+GOLDEN_FILE = os.path.join(GOLDEN_DIR, "golden.json")
+BUDGETS_FILE = os.path.join(GOLDEN_DIR, "budgets.json")  # local, por maquina
+
+sys.path.insert(0, BENCH_DIR)
+import synth  # noqa: E402
+from bench import Quiet, git_commit  # noqa: E402
+from vpd import usage  # noqa: E402
+
+# Projetos fixos (parametros do synth.generate_project)
+FIXTURES = {
+    "small": {"clips": 12, "sources": 2, "sfx": 2, "speed_ratio": 0.25, "mute_ratio": 0.1,
+              "gap_ratio": 0.1, "source_seconds": 30.0, "seed": 1},
+    "speed": {"clips": 40, "sources": 3, "sfx": 4, "speed_ratio": 0.6, "mute_ratio": 0.05,
+              "gap_ratio": 0.05, "source_seconds": 60.0, "seed": 2},
+    "long": {"clips": 200, "sources": 4, "sfx": 10, "speed_ratio": 0.1, "mute_ratio": 0.05,
+             "gap_ratio": 0.05, "source_seconds": 120.0, "seed": 3},
+}
+AUDIO_OUTPUTS = ("clean", "enhanced")
+# Fixtures com o VPD normalizado inteiro em bench/golden/ (as demais so pelo hash)
+FULL_VPD_FIXTURES = ("small",)
+
+DEFAULT_TOLERANCE = 20.0  # %
+DEFAULT_REPEAT = 3
+# Abaixo destas diferencas absolutas o estouro e ruido de medida, nao regressao
+MIN_WALL_S = 0.05
+MIN_RSS_KB = 2048
+
+UUID_RE = re.compile(r"^\{[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}\}$")
+
+
+def load_pipeline():
+    spec = importlib.util.spec_from_file_location("vpd_pipeline", PIPELINE_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+        return result.stdout.split("\n", 1)[0].strip() or None
+    except OSError:
+        return None
+
+
+class StageMeter:
+    """on_event do StageGraph: tempo e pico de RSS de cada etapa executada.
+
+    O grafo mede cada etapa com vpd.usage.measure(), que zera o pico de RSS no
+    inicio; no "done" o VmHWM ainda e o pico da etapa (etapas em sequencia).
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def __call__(self, name, event, elapsed=None):
+        if event == "done":
+            self.stages[name] = {"wall_s": elapsed, "rss_kb": usage.peak_rss_kb() or 0}
+
+
+# ----------------------------------------------------------------------
+# Substitutos de Whisper e Adobe
+# ----------------------------------------------------------------------
+
+def install_stand_ins(pipeline, fixture):
+    """Troca transcribe/enhance_audio dos modulos carregados pelo pipeline (load_stage e cacheado)."""
+    enhance = pipeline.load_stage("vpd_enhance_audio", pipeline.ENHANCE_SCRIPT)
+    subtitles = pipeline.load_stage("vpd_add_subtitles", pipeline.SUBTITLES_SCRIPT)
+    subtitles.VLOGGER_STYLES_DIR = fixture["styles_dir"]
+
+    def transcribe(audio_path, model, language, vpd_dir, pcm=None):
+        basename = os.path.splitext(os.path.basename(audio_path))[0]
+        json_path = os.path.join(vpd_dir, f"{basename}-whisper.json")
+        shutil.copyfile(fixture["whisper_json"], json_path)
+        return subtitles.parse_whisper_json(json_path)
+
+    enhance.enhance_audio = local_enhance
+    subtitles.transcribe = transcribe
+
+
+def local_enhance(input_path, output_path):
+    """Enhance deterministico: mesmo WAV com metade da amplitude."""
+    with wave.open(input_path, "rb") as src:
+        params = src.getparams()
+        frames = src.readframes(params.nframes)
+    if params.sampwidth == 2:
+        samples = array.array("h", frames)
+        frames = array.array("h", (s >> 1 for s in samples)).tobytes()
+    with wave.open(output_path, "wb") as dst:
+        dst.setparams(params)
+        dst.writeframes(frames)
+    return True
+
+
+# ----------------------------------------------------------------------
+# Saidas
+# ----------------------------------------------------------------------
+
+def audio_hash(path):
+    """sha256 do formato + amostras (ignora metadados do cabecalho, ex.: tag de encoder)."""
+    with wave.open(path, "rb") as f:
+        params = f.getparams()
+        digest = hashlib.sha256(f"{params.nchannels}/{params.sampwidth}/{params.framerate}".encode())
+        while True:
+            chunk = f.readframes(65536)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_vpd(vpd_path, project_dir):
+    """JSON do VPD com uuids numerados por ordem de aparicao e a pasta do projeto como <projeto>."""
+    with open(vpd_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    uuids = {}
+    prefixes = sorted({project_dir, project_dir.replace(os.sep, "/")}, key=len, reverse=True)
+
+    def walk(value):
+        if isinstance(value, dict):
+            return {key: walk(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [walk(item) for item in value]
+        if isinstance(value, str):
+            if UUID_RE.match(value):
+                return uuids.setdefault(value.upper(), f"{{uuid-{len(uuids) + 1}}}")
+            for prefix in prefixes:
+                value = value.replace(prefix, "<projeto>")
+        return value
+
+    return walk(data)
+
+
+def dump_json(value):
+    return json.dumps(value, indent=1, sort_keys=True, ensure_ascii=False)
+
+
+def vpd_hash(value):
+    """sha256 do JSON normalizado na forma canonica compacta."""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def json_differences(old, new, path="$", limit=10):
+    """Caminhos (ate limit) em que dois JSONs diferem."""
+    found = []
+
+    def visit(a, b, where):
+        if len(found) >= limit:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in sorted(set(a) | set(b)):
+                if key not in a or key not in b:
+                    found.append(f"{where}.{key}: {'ausente' if key not in b else 'novo'}")
+                else:
+                    visit(a[key], b[key], f"{where}.{key}")
+        elif isinstance(a, list) and isinstance(b, list):
+            if len(a) != len(b):
+                found.append(f"{where}: {len(a)} -> {len(b)} itens")
+            for i, (x, y) in enumerate(zip(a, b)):
+                visit(x, y, f"{where}[{i}]")
+        elif a != b:
+            found.append(f"{where}: {a!r} -> {b!r}")
+
+    visit(old, new, path)
+    return found[:limit]
+
+
+# ----------------------------------------------------------------------
+# Execucao
+# ----------------------------------------------------------------------
+
+def run_once(pipeline, fixture, args_list, verbose):
+    """Uma execucao do pipeline. -> (status, StageMeter)"""
+    meter = StageMeter()
+    args = pipeline.build_parser().parse_args(args_list)
+    if verbose:
+        status = pipeline.run_stages(args, fixture["vpd"], on_event=meter)
+    else:
+        with Quiet():
+            status = pipeline.run_stages(args, fixture["vpd"], on_event=meter)
+    return status, meter
+
+
+def run_fixture(pipeline, name, work_dir, repeat, verbose):
+    """Gera a fixture e roda o pipeline repeat vezes (copia nova a cada vez). -> resultado"""
+    source_dir = os.path.join(work_dir, name, "fonte")
+    template = synth.generate_project(source_dir, name=name, **FIXTURES[name])
+    runs = []
+    result = {}
+    for i in range(repeat):
+        run_dir = os.path.join(work_dir, name, f"run{i}")
+        shutil.copytree(source_dir, run_dir)
+        fixture = {key: value.replace(source_dir, run_dir) if isinstance(value, str) else value
+                   for key, value in template.items()}
+        install_stand_ins(pipeline, fixture)
+        args_list = [fixture["vpd"], "--style", fixture["style"], "--no-overlap"]
+        _status, meter = run_once(pipeline, fixture, args_list, verbose)
+        runs.append(meter.stages)
+        if i == 0:
+            base = os.path.join(run_dir, name)
+            result["audio"] = {kind: audio_hash(f"{base}-{kind}.wav") for kind in AUDIO_OUTPUTS}
+            result["vpd"] = normalize_vpd(fixture["vpd"], run_dir)
+            with open(os.path.join(work_dir, name, f"{name}.vpd.json"), "w", encoding="utf-8") as f:
+                f.write(dump_json(result["vpd"]) + "\n")
+            rerun, _ = run_once(pipeline, fixture, args_list, verbose)
+            result["rerun"] = sorted(stage for stage, st in rerun.items() if st != "skip")
+    result["stages"] = {
+        stage: {
+            "wall_s": round(statistics.median(run[stage]["wall_s"] for run in runs), 4),
+            "rss_kb": max(run[stage]["rss_kb"] for run in runs),
+        }
+        for stage in runs[0]
+    }
+    return result
+
+
+def check_fixture(name, result, golden, ffmpeg, budgets, tolerance):
+    """Compara com o golden e, se houver, com os orcamentos locais. -> ([falhas], [nao conferido])"""
+    failures = []
+    unchecked = []
+    audio = golden["audio"].get(ffmpeg)
+    if audio is None:
+        unchecked.append("audio")
+    else:
+        for kind in AUDIO_OUTPUTS:
+            if result["audio"][kind] != audio.get(kind):
+                failures.append(f"audio {kind}: amostras diferentes do golden")
+    if vpd_hash(result["vpd"]) != golden["vpd"]:
+        failure = "vpd: diferente do golden"
+        full_path = os.path.join(GOLDEN_DIR, f"{name}.vpd.json")
+        if os.path.exists(full_path):
+            with open(full_path, "r", encoding="utf-8") as f:
+                diffs = json_differences(json.load(f), result["vpd"])
+            if diffs:
+                failure += "\n" + "\n".join(f"      {d}" for d in diffs)
+        failures.append(failure)
+    if result["rerun"]:
+        failures.append(f"rerun: etapas executadas de novo: {', '.join(result['rerun'])}")
+    if budgets is None:
+        unchecked.append("tempo/RSS")
+        return failures, unchecked
+
+    limit = 1 + tolerance / 100.0
+    for stage, now in result["stages"].items():
+        budget = budgets.get(stage)
+        if budget is None:
+            failures.append(f"{stage}: sem orcamento gravado (rode --update-budgets)")
+            continue
+        if now["wall_s"] > budget["wall_s"] * limit and now["wall_s"] - budget["wall_s"] > MIN_WALL_S:
+            failures.append(f"{stage}: tempo {now['wall_s']:.3f}s > orcamento {budget['wall_s']:.3f}s "
+                            f"(+{(now['wall_s'] / budget['wall_s'] - 1) * 100:.0f}%)")
+        if now["rss_kb"] > budget["rss_kb"] * limit and now["rss_kb"] - budget["rss_kb"] > MIN_RSS_KB:
+            failures.append(f"{stage}: pico RSS {now['rss_kb'] / 1024:.1f}MB > orcamento "
+                            f"{budget['rss_kb'] / 1024:.1f}MB (+{(now['rss_kb'] / budget['rss_kb'] - 1) * 100:.0f}%)")
+    return failures, unchecked
+
+
+def print_stages(name, result, budgets):
+    print(f"  {'etapa':<12} {'tempo':>9} {'orcamento':>10} {'pico RSS':>10} {'orcamento':>10}")
+    for stage, now in result["stages"].items():
+        budget = (budgets or {}).get(stage)
+        wall_budget = f"{budget['wall_s']:.3f}s" if budget else "-"
+        rss_budget = f"{budget['rss_kb'] / 1024:.1f}MB" if budget else "-"
+        print(f"  {stage:<12} {now['wall_s']:>8.3f}s {wall_budget:>10} {now['rss_kb'] / 1024:>8.1f}MB {rss_budget:>10}")
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path, meta, fixtures):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {"meta": dict(meta, commit=git_commit(), date=time.strftime("%Y-%m-%dT%H:%M:%S")),
+               "fixtures": fixtures}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def write_golden(results, previous, ffmpeg):
+    """Saidas de referencia (versionadas): hash do VPD normalizado + hashes de audio por ffmpeg.
+
+    Hashes de audio de outros builds do ffmpeg sao mantidos se o VPD nao mudou.
+    """
+    fixtures = dict((previous or {}).get("fixtures", {}))
+    for name, result in results.items():
+        digest = vpd_hash(result["vpd"])
+        old = fixtures.get(name, {})
+        audio = dict(old.get("audio", {})) if old.get("vpd") == digest else {}
+        audio[ffmpeg] = result["audio"]
+        fixtures[name] = {"vpd": digest, "audio": audio}
+        if name in FULL_VPD_FIXTURES:
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            with open(os.path.join(GOLDEN_DIR, f"{name}.vpd.json"), "w", encoding="utf-8") as f:
+                f.write(dump_json(result["vpd"]) + "\n")
+    save_json(GOLDEN_FILE, {"python": platform.python_version()}, fixtures)
+
+
+def write_budgets(results, previous):
+    """Orcamentos de tempo/RSS desta maquina (locais, fora do git)."""
+    fixtures = dict((previous or {}).get("fixtures", {}))
+    for name, result in results.items():
+        fixtures[name] = result["stages"]
+    save_json(BUDGETS_FILE, {"platform": platform.platform(), "python": platform.python_version()}, fixtures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regressao do vpd-pipeline contra saidas e orcamentos gravados")
+    parser.add_argument("--only", nargs="+", choices=sorted(FIXTURES), help="Rodar so estas fixtures")
+    parser.add_argument("--update", action="store_true",
+                        help="Gravar as saidas atuais como golden (bench/golden/, versionado) "
+                             "e os tempos/RSS como orcamento local")
+    parser.add_argument("--update-budgets", action="store_true",
+                        help="Conferir as saidas e gravar os tempos/RSS atuais como orcamento "
+                             "desta maquina (bench/golden/budgets.json)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Folga sobre o orcamento de tempo e RSS, em %% (default: {DEFAULT_TOLERANCE:.0f})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Execucoes por fixture; o tempo e a mediana (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--keep", action="store_true",
+                        help="Manter os projetos gerados e o VPD normalizado de cada fixture (mostra a pasta)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar a saida do pipeline")
+    args = parser.parse_args()
+
+    missing = [b for b in ("ffmpeg", "ffprobe") if not (shutil.which(b) or shutil.which(b + ".exe"))]
+    if missing:
+        print(f"ERRO: {', '.join(missing)} nao encontrado no PATH.", file=sys.stderr)
+        sys.exit(2)
+
+    golden = load_json(GOLDEN_FILE)
+    if golden is None and not args.update:
+        print(f"ERRO: {GOLDEN_FILE} nao existe. Rode com --update para gravar o golden.", file=sys.stderr)
+        sys.exit(2)
+    budgets = load_json(BUDGETS_FILE)
+    if budgets is None and not (args.update or args.update_budgets):
+        print(f"AVISO: {BUDGETS_FILE} nao existe: tempo/RSS so medidos. "
+              f"Rode --update-budgets nesta maquina para grava-los.")
+
+    ffmpeg = ffmpeg_version()
+
+    pipeline = load_pipeline()
+    names = args.only or list(FIXTURES)
+    work_dir = tempfile.mkdtemp(prefix="vpd_regress_")
+    results = {}
+    failed = {}
+    unchecked = {}
+    print(f"=== vpd regress ({git_commit() or 'sem git'}, tolerancia {args.tolerance:.0f}%) ===")
+    try:
+        for name in names:
+            print(f"\n{name}: {FIXTURES[name]['clips']} clips")
+            try:
+                results[name] = run_fixture(pipeline, name, work_dir, max(1, args.repeat), args.verbose)
+            except (Exception, SystemExit) as e:
+                failed[name] = [f"pipeline falhou: {type(e).__name__}: {e}"]
+                print(f"  FALHOU: {failed[name][0]}")
+                continue
+            expected = (golden or {}).get("fixtures", {}).get(name)
+            budget = None if budgets is None else budgets["fixtures"].get(name, {})
+            print_stages(name, results[name], budget)
+            if args.update:
+                continue
+            if expected is None:
+                failed[name] = ["sem golden para esta fixture (rode --update)"]
+            else:
+                failed[name], unchecked[name] = check_fixture(name, results[name], expected, ffmpeg,
+                                                              None if args.update_budgets else budget,
+                                                              args.tolerance)
+            for failure in failed[name]:
+                print(f"  FALHA {failure}")
+            if "audio" in unchecked.get(name, ()):
+                print(f"  NAO CONFERIDO audio: sem golden para '{ffmpeg}' (rode --update com este ffmpeg)")
+            if not failed[name]:
+                print("  OK" + (f" (nao conferido: {', '.join(unchecked[name])})" if unchecked[name] else ""))
+    finally:
+        if args.keep:
+            print(f"\nProjetos gerados: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.update and results:
+        write_golden(results, golden, ffmpeg)
+        print(f"\nGolden gravado: {GOLDEN_FILE} ({', '.join(results)})")
+    if (args.update or args.update_budgets) and results:
+        write_budgets(results, budgets)
+        print(f"Orcamentos locais gravados: {BUDGETS_FILE} ({', '.join(results)})")
+    failures = {name: f for name, f in failed.items() if f}
+    skipped = sorted({check for name, checks in unchecked.items() if name not in failures for check in checks})
+    note = f", NAO conferido: {' e '.join(skipped)}" if skipped else ""
+    print(f"\n=== Resultado: {len(names) - len(failures)}/{len(names)} fixtures OK{note} ===")
+    if "tempo/RSS" in skipped and not args.update_budgets:
+        print(f"  Sem {BUDGETS_FILE}: grave os orcamentos desta maquina com --update-budgets")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
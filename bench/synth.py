@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+synth — Projetos .vpd sinteticos (com midia e transcricao) para benchmarks
+
+Gera na pasta de saida:
+    <nome>.vpd                 MainVideoTrack com N clips + AudioTrack com SFX
+    media/src_<i>.wav|.mp4     fontes (tom ou ruido, geradas localmente)
+    media/sfx.wav              fonte dos efeitos do AudioTrack
+    <nome>-clean-whisper.json  transcricao sintetica no formato do whisper CLI
+    appdata/.../sub_styles/bench.json  estilo de legenda (defaults); use APPDATA=<saida>/appdata
+
+Tudo e deterministico para a mesma seed. WAV usa so a stdlib; MP4 precisa do ffmpeg.
+
+Uso:
+    python3 bench/synth.py /tmp/bench --clips 100
+    python3 bench/synth.py /tmp/bench --clips 1000 --sources 8 --speed-ratio 0.2 --media mp4
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import uuid
+import wave
+
+
+SAMPLE_RATE = 22050
+SFX_SECONDS = 1.0
+STYLE_NAME = "bench"
+
+# Vocabulario da transcricao sintetica (palavras de tamanhos variados)
+WORDS = (
+    "a o de que e do da em um para com nao uma os no se na por mais as dos como mas foi ao ele "
+    "das tem seu sua ou ser quando muito nos ja esta eu tambem so pelo pela ate isso ela entre "
+    "depois sem mesmo aos ter seus quem nas me esse eles voce essa num nem suas meu minha "
+    "projeto video audio legenda corte edicao timeline exportar renderizar configuracao "
+    "importante exatamente basicamente simplesmente aplicativo ferramenta"
+).split()
+
+SPEEDS = (0.5, 1.5, 2.0)
+
+
+def _uuid(rng):
+    return "{" + str(uuid.UUID(int=rng.getrandbits(128))).upper() + "}"
+
+
+def _resid(rng):
+    return "%032X" % rng.getrandbits(128)
+
+
+# ----------------------------------------------------------------------
+# Midia
+# ----------------------------------------------------------------------
+
+def _second_of_audio(kind, index, rng):
+    """1 s de PCM 16-bit mono: tom (frequencia inteira, repete sem emenda) ou ruido."""
+    if kind == "noise":
+        samples = [int(rng.gauss(0, 0.2) * 32767) for _ in range(SAMPLE_RATE)]
+        samples = [max(-32768, min(32767, s)) for s in samples]
+    else:
+        freq = 220 * (index + 1)
+        samples = [int(0.3 * 32767 * math.sin(2 * math.pi * freq * n / SAMPLE_RATE)) for n in range(SAMPLE_RATE)]
+    return struct.pack(f"<{SAMPLE_RATE}h", *samples)
+
+
+def write_wav(path, seconds, kind="tone", index=0, seed=0):
+    rng = random.Random(f"{seed}:{os.path.basename(path)}")
+    chunk = _second_of_audio(kind, index, rng)
+    whole, rest = divmod(int(seconds * SAMPLE_RATE), SAMPLE_RATE)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(chunk * whole + chunk[:rest * 2])
+
+
+def wav_to_mp4(wav_path, mp4_path):
+    """MP4 (video preto 320x240 + AAC) a partir do WAV."""
+    ffmpeg = shutil.which("ffmpeg") or shutil.which("ffmpeg.exe")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg nao encontrado (necessario para --media mp4)")
+    subprocess.run([
+        ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", "color=black:s=320x240:r=30",
+        "-i", wav_path, "-shortest", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+        mp4_path,
+    ], check=True)
+
+
+# ----------------------------------------------------------------------
+# Projeto
+# ----------------------------------------------------------------------
+
+def _media_block(rng, title, resid, tstart_ms, handled_s, file_start_s, speed, source_s, mute, audio_only):
+    file_duration = handled_s * speed
+    return {
+        "title": title,
+        "type": "MediaFileBlock",
+        "background": 4232007423,
+        "foreground": 1216461823,
+        "status": 0,
+        "uuid": _uuid(rng),
+        "tstart": round(tstart_ms, 3),
+        "tduration": round(handled_s * 1000, 3),
+        "restype": "MediaFileResource",
+        "resid": resid,
+        "attribute": {
+            "version": 0,
+            "type": 2 if audio_only else 3,
+            "videoIndex": -1 if audio_only else 0,
+            "audioIndex": 0 if audio_only else 1,
+            "videoEnabled": not audio_only,
+            "audioEnabled": True,
+            "VideoAttribute": None if audio_only else {},
+            "AudioAttribute": {
+                "version": 0, "mute": mute, "fadeInDuration": 0.0, "fadeOutDuration": 0.0,
+                "multiple": 1.0, "pitch": 1.0, "pitchType": 1,
+            },
+            "SpeedAttribute": {
+                "version": 0,
+                "reversePlay": False,
+                "Speed": {
+                    "version": 0,
+                    "baseData": {
+                        "version": 0,
+                        "fileTotalDuration": source_s,
+                        "fileCuttedStart": round(file_start_s, 6),
+                        "fileCuttedDuration": round(file_duration, 6),
+                        "handledTotalDuration": source_s / speed,
+                        "handledCuttedStart": round(file_start_s / speed, 6),
+                        "handledCuttedDuration": round(handled_s, 6),
+                    },
+                    "curve": "",
+                },
+                "extraSpeed": 1.0,
+                "audioSpeedRate": False,
+            },
+        },
+    }
+
+
+def _track(title, ttype, blocks, context_ms):
+    return {
+        "title": title,
+        "type": ttype,
+        "status": 0,
+        "tstart": 0.0,
+        "tduration": 1.7976931348623157e308,
+        "context": context_ms,
+        "opacity": 100,
+        "mute": False,
+        "subitems": blocks,
+    }
+
+
+def _resource(rng, title, path, duration):
+    return {"title": title, "type": "MediaFileResource", "status": 0, "uuid": _resid(rng),
+            "path": path, "duration": duration}
+
+
+def generate_project(out_dir, name="bench", clips=100, sources=4, speed_ratio=0.1, mute_ratio=0.05,
+                     gap_ratio=0.05, sfx=5, length_s=None, source_seconds=120.0, media="wav",
+                     noise=False, words=None, seed=0):
+    """Gera projeto + midia + transcricao em out_dir. Retorna dict com os caminhos e contagens.
+
+    length_s: duracao da timeline (default: ~3 s por clip). words: palavras da
+    transcricao sintetica (default: ~2.5 por segundo de timeline).
+    """
+    rng = random.Random(seed)
+    media_dir = os.path.join(out_dir, "media")
+    os.makedirs(media_dir, exist_ok=True)
+
+    # Fontes
+    videolist = []
+    for i in range(sources):
+        wav_path = os.path.join(media_dir, f"src_{i}.wav")
+        write_wav(wav_path, source_seconds, "noise" if noise else "tone", i, seed)
+        path = wav_path
+        if media == "mp4":
+            path = os.path.join(media_dir, f"src_{i}.mp4")
+            wav_to_mp4(wav_path, path)
+            os.remove(wav_path)
+        videolist.append(_resource(rng, f"src_{i}", os.path.relpath(path, out_dir), source_seconds))
+
+    # Duracoes dos clips (1-5 s), escaladas para length_s
+    durations = [rng.uniform(1.0, 5.0) for _ in range(clips)]
+    gaps = [rng.uniform(0.2, 2.0) if rng.random() < gap_ratio else 0.0 for _ in range(clips)]
+    if length_s:
+        scale = length_s / (sum(durations) + sum(gaps))
+        durations = [d * scale for d in durations]
+        gaps = [g * scale for g in gaps]
+
+    video_blocks = []
+    pos_ms = 0.0
+    for i, handled_s in enumerate(durations):
+        pos_ms += gaps[i] * 1000
+        speed = rng.choice(SPEEDS) if rng.random() < speed_ratio else 1.0
+        source = rng.randrange(sources)
+        file_span = handled_s * speed
+        file_start = rng.uniform(0, max(0.0, source_seconds - file_span))
+        video_blocks.append(_media_block(
+            rng, f"src_{source}", videolist[source]["uuid"], pos_ms, handled_s, file_start, speed,
+            source_seconds, rng.random() < mute_ratio, audio_only=False))
+        pos_ms += handled_s * 1000
+    total_ms = round(pos_ms, 3)
+
+    # SFX no AudioTrack
+    audiolist = []
+    sfx_blocks = []
+    if sfx:
+        sfx_path = os.path.join(media_dir, "sfx.wav")
+        write_wav(sfx_path, SFX_SECONDS, "noise", 0, seed)
+        audiolist.append(_resource(rng, "sfx", os.path.relpath(sfx_path, out_dir), SFX_SECONDS))
+        for start_ms in sorted(rng.uniform(0, max(0.0, total_ms - SFX_SECONDS * 1000)) for _ in range(sfx)):
+            sfx_blocks.append(_media_block(rng, "sfx", audiolist[0]["uuid"], start_ms, SFX_SECONDS, 0.0, 1.0,
+                                           SFX_SECONDS, False, audio_only=True))
+
+    tracks = [_track("Video Track", "MainVideoTrack", video_blocks, total_ms)]
+    if sfx_blocks:
+        tracks.append(_track("Audio Track", "AudioTrack", sfx_blocks,
+                             max(b["tstart"] + b["tduration"] for b in sfx_blocks)))
+
+    project = {
+        "timeline": {
+            "title": "MainTimeline", "type": "MainTimeline", "status": 0, "subitems": tracks,
+            "tstart": 0.0, "tduration": 1.7976931348623157e308, "context": total_ms,
+            "connect": {}, "bookmarks": [],
+        },
+        "projinfo": {
+            "name": name,
+            "player": {"version": 0, "frameRateNum": 30, "frameRateDen": 1,
+                       "resolutionW": 1080, "resolutionH": 1920, "volume": 1.0},
+        },
+        "videolist": {"title": "Video", "type": "ResourceLists", "status": 0, "subitems": videolist},
+        "audiolist": {"title": "Music", "type": "ResourceLists", "status": 0, "subitems": audiolist},
+        "imagelist": {"title": "Image", "type": "ResourceLists", "status": 0, "subitems": []},
+        "subtitlelist": {"title": "Subtitle", "type": "ResourceLists", "status": 0, "subitems": []},
+    }
+    vpd_path = os.path.join(out_dir, f"{name}.vpd")
+    with open(vpd_path, "w", encoding="utf-8") as f:
+        json.dump(project, f, indent=4)
+
+    if words is None:
+        words = max(1, int(total_ms / 1000 * 2.5))
+    whisper_path = os.path.join(out_dir, f"{name}-clean-whisper.json")
+    generate_whisper_json(whisper_path, words, total_ms / 1000, seed)
+
+    appdata = os.path.join(out_dir, "appdata")
+    styles_dir = os.path.join(appdata, "Digiarty", "VideoProc Vlogger", "sub_styles")
+    os.makedirs(styles_dir, exist_ok=True)
+    with open(os.path.join(styles_dir, f"{STYLE_NAME}.json"), "w", encoding="utf-8") as f:
+        json.dump({}, f)
+
+    return {
+        "vpd": vpd_path,
+        "whisper_json": whisper_path,
+        "appdata": appdata,
+        "styles_dir": styles_dir,
+        "style": STYLE_NAME,
+        "clips": clips,
+        "sfx": len(sfx_blocks),
+        "duration_s": total_ms / 1000,
+        "words": words,
+    }
+
+
+def generate_whisper_json(path, words, duration_s, seed=0):
+    """Transcricao sintetica (formato do whisper CLI) com `words` palavras em duration_s."""
+    rng = random.Random(f"{seed}:whisper")
+    slot = duration_s / max(words, 1)
+    segments = []
+    current = []
+    for i in range(words):
+        start = i * slot
+        # Pausas ocasionais (maiores que o gap-threshold) quebram telas
+        if rng.random() < 0.05:
+            start += slot * 0.3
+        end = min(start + slot * rng.uniform(0.5, 0.9), duration_s)
+        text = rng.choice(WORDS)
+        if rng.random() < 0.08:
+            text += "."
+        current.append({"word": " " + text, "start": round(start, 3), "end": round(end, 3),
+                        "probability": round(rng.uniform(0.6, 1.0), 4)})
+        if text.endswith(".") or len(current) >= 30 or i == words - 1:
+            segments.append({
+                "id": len(segments),
+                "start": current[0]["start"],
+                "end": current[-1]["end"],
+                "text": "".join(w["word"] for w in current),
+                "words": current,
+            })
+            current = []
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"text": "".join(s["text"] for s in segments), "segments": segments, "language": "pt"},
+                  f, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera projeto .vpd sintetico (midia + transcricao) para benchmarks")
+    parser.add_argument("out_dir", help="Pasta de saida")
+    parser.add_argument("--name", default="bench", help="Nome do projeto (default: bench)")
+    parser.add_argument("--clips", type=int, default=100, help="Clips no MainVideoTrack (default: 100)")
+    parser.add_argument("--sources", type=int, default=4, help="Arquivos fonte (default: 4)")
+    parser.add_argument("--speed-ratio", type=float, default=0.1, help="Fracao de clips com speed != 1 (default: 0.1)")
+    parser.add_argument("--mute-ratio", type=float, default=0.05, help="Fracao de clips mutados (default: 0.05)")
+    parser.add_argument("--gap-ratio", type=float, default=0.05, help="Fracao de clips com gap antes (default: 0.05)")
+    parser.add_argument("--sfx", type=int, default=5, help="Clips de SFX no AudioTrack (default: 5)")
+    parser.add_argument("--length", type=float, help="Duracao da timeline em s (default: ~3 s por clip)")
+    parser.add_argument("--source-seconds", type=float, default=120.0, help="Duracao de cada fonte em s (default: 120)")
+    parser.add_argument("--media", choices=["wav", "mp4"], default="wav", help="Formato das fontes (mp4 requer ffmpeg)")
+    parser.add_argument("--noise", action="store_true", help="Fontes com ruido em vez de tom")
+    parser.add_argument("--words", type=int, help="Palavras na transcricao (default: ~2.5 por segundo)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed (default: 0)")
+    args = parser.parse_args()
+
+    try:
+        info = generate_project(
+            args.out_dir, args.name, args.clips, args.sources, args.speed_ratio, args.mute_ratio,
+            args.gap_ratio, args.sfx, args.length, args.source_seconds, args.media, args.noise,
+            args.words, args.seed)
+    except (RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"ERRO: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Projeto: {info['vpd']}")
+    print(f"  {info['clips']} clips, {info['sfx']} SFX, {info['duration_s']:.1f}s, {info['words']} palavras")
+    print(f"  Estilo de legenda: --style {info['style']} com APPDATA={info['appdata']}")
+
+
+if __name__ == "__main__":
+    main()
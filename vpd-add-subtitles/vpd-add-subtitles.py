@@ -13,14 +13,20 @@ Uso:
 """
 
 import argparse
+import functools
 import json
+import math
 import os
 import shutil
-import subprocess
+import struct
 import sys
 import tempfile
 import uuid
 
+# Biblioteca compartilhada (pacote vpd/ na raiz do repositorio)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vpd import Project, RenderedState, atomic_write, detect_audio, trace, usage  # noqa: E402
+
 
 # ---------------------------------------------------------------------------
 # Helpers: cores e formatacao
@@ -120,11 +126,101 @@ def parse_whisper_json(json_path):
     return words
 
 
-def transcribe(audio_path, model, language, vpd_dir):
+def transcription_confidence(json_path):
+    """Confianca media (0-1) de uma transcricao do whisper.
+
+    Media da probabilidade das palavras (word_timestamps); segmentos sem
+    probabilidade por palavra entram com exp(avg_logprob).
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    probs = []
+    for segment in data.get("segments", []):
+        words = [w for w in segment.get("words", []) if w.get("word", "").strip()]
+        if words and all("probability" in w for w in words):
+            probs.extend(w["probability"] for w in words)
+        elif "avg_logprob" in segment:
+            probs.append(math.exp(segment["avg_logprob"]))
+    if not probs:
+        return 0.0
+    return sum(probs) / len(probs)
+
+
+# Formato de entrada do Whisper: PCM float32 mono 16 kHz
+WHISPER_SAMPLE_RATE = 16000
+
+# Tracks cujos clips compoem o audio transcrito ("Audio Enhanced" e o proprio resultado)
+AUDIO_TRACK_TYPES = ("MainVideoTrack", "AudioTrack")
+
+
+def load_pcm(pcm_path):
+    """Mapeia em memoria um PCM float32 mono 16 kHz (f32le cru) gerado pelo enhance.
+
+    Copy-on-write: o Whisper recebe um array gravavel sem copiar o arquivo inteiro.
+    """
+    import numpy as np
+
+    return np.memmap(pcm_path, dtype=np.float32, mode="c")
+
+
+def pcm_from_bytes(data):
+    """Array float32 (gravavel) a partir do PCM f32le em memoria (vpd-pipeline)."""
+    import numpy as np
+
+    return np.frombuffer(bytearray(data), dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=None)
+def load_whisper_model(model):
+    """Modelo whisper carregado uma vez por processo (reaproveitado entre projetos no lote)."""
+    import whisper
+
+    return whisper.load_model(model)
+
+
+def transcribe_pcm(pcm, model, language, json_path):
+    """Transcreve in-process um buffer PCM 16 kHz mono, sem novo decode/resample.
+
+    Grava o resultado no mesmo formato JSON do whisper CLI.
+    """
+    print(f"  Whisper model: {model} (in-process, PCM {len(pcm) / WHISPER_SAMPLE_RATE:.1f}s)")
+    print(f"  Language: {language}")
+
+    whisper_model = load_whisper_model(model)
+    result = whisper_model.transcribe(pcm, language=language, word_timestamps=True)
+
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False)
+
+
+def warn_if_audio_changed(project, audio_path):
+    """Avisa se a transcricao salva pode estar desatualizada.
+
+    Compara (diff estrutural) os clips de que o audio foi renderizado (sidecar
+    <audio>.render.json do vpd-enhance-audio) com o projeto atual: se clips das tracks
+    de audio mudaram, o audio e o <audio>-whisper.json existentes sao de antes da edicao.
+    """
+    basename = os.path.splitext(os.path.basename(audio_path))[0]
+    json_path = os.path.join(project.dir, f"{basename}-whisper.json")
+    rendered = RenderedState.load(audio_path)
+    if rendered is None or not os.path.exists(json_path):
+        return
+    diff = rendered.changes(project)
+    if diff.clip_changes(AUDIO_TRACK_TYPES, exclude_titles=("Audio Enhanced",)):
+        print(f"  AVISO: clips de audio mudaram desde o render de {os.path.basename(audio_path)}; "
+              f"{os.path.basename(json_path)} pode estar desatualizado")
+        print(f"  Rode o vpd-enhance-audio de novo e apague o JSON para retranscrever")
+
+
+@trace.traced("transcribe (whisper)", "whisper")
+def transcribe(audio_path, model, language, vpd_dir, pcm=None):
     """Roda whisper CLI (se necessario) e retorna lista de {word, start, end}.
 
     O JSON e salvo na pasta do projeto como <audio>-whisper.json.
     Se ja existir, reutiliza sem rodar o whisper novamente.
+    Se `pcm` (float32 mono 16 kHz) for passado, transcreve in-process a partir
+    dele em vez de deixar o whisper decodificar `audio_path` de novo.
     """
     basename = os.path.splitext(os.path.basename(audio_path))[0]
     json_path = os.path.join(vpd_dir, f"{basename}-whisper.json")
@@ -136,6 +232,13 @@ def transcribe(audio_path, model, language, vpd_dir):
         print(f"  Palavras: {len(words)}")
         return words
 
+    if pcm is not None:
+        transcribe_pcm(pcm, model, language, json_path)
+        words = parse_whisper_json(json_path)
+        print(f"  Palavras transcritas: {len(words)}")
+        print(f"  Salvo: {json_path}")
+        return words
+
     # Rodar whisper via python -m (evita shebang hardcoded do .exe)
     whisper_cmd = find_whisper()
 
@@ -147,7 +250,7 @@ def transcribe(audio_path, model, language, vpd_dir):
     try:
         cmd = whisper_cmd + [audio_path, "--model", model, "--language", language, "--word_timestamps", "True", "--output_format", "json", "--output_dir", temp_dir]
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = usage.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             print(f"ERRO: whisper falhou (exit {result.returncode})", file=sys.stderr)
             if result.stderr:
@@ -171,6 +274,230 @@ def transcribe(audio_path, model, language, vpd_dir):
     return words
 
 
+# ---------------------------------------------------------------------------
+# Metricas de fonte (largura real dos glifos via tabelas TTF hmtx/cmap)
+# ---------------------------------------------------------------------------
+
+def _font_dirs():
+    """Pastas onde procurar fontes (Windows, WSL e Linux)."""
+    dirs = []
+    windir = os.environ.get("WINDIR")
+    if windir:
+        dirs.append(os.path.join(windir, "Fonts"))
+    localappdata = os.environ.get("LOCALAPPDATA")
+    if localappdata:
+        dirs.append(os.path.join(localappdata, "Microsoft", "Windows", "Fonts"))
+    dirs += [
+        "/mnt/c/Windows/Fonts",
+        "/usr/share/fonts",
+        "/usr/local/share/fonts",
+        os.path.expanduser("~/.fonts"),
+        os.path.expanduser("~/.local/share/fonts"),
+    ]
+    return [d for d in dirs if os.path.isdir(d)]
+
+
+def _read_ttf_tables(f):
+    """Le o diretorio de tabelas de um TTF/OTF (ou da 1a fonte de um TTC)."""
+    header = f.read(12)
+    if header[:4] == b"ttcf":
+        f.seek(12)
+        (first_offset,) = struct.unpack(">I", f.read(4))
+        f.seek(first_offset)
+        header = f.read(12)
+    (num_tables,) = struct.unpack(">H", header[4:6])
+    tables = {}
+    for _ in range(num_tables):
+        tag, _checksum, offset, length = struct.unpack(">4sIII", f.read(16))
+        tables[tag.decode("latin-1")] = (offset, length)
+    return tables
+
+
+def _read_table(f, tables, tag):
+    offset, length = tables[tag]
+    f.seek(offset)
+    return f.read(length)
+
+
+def _parse_ttf_names(path):
+    """Retorna os nomes (familia, subfamilia, nome completo, postscript) de uma fonte."""
+    with open(path, "rb") as f:
+        tables = _read_ttf_tables(f)
+        if "name" not in tables:
+            return {}
+        data = _read_table(f, tables, "name")
+
+    _fmt, count, string_offset = struct.unpack(">HHH", data[:6])
+    names = {}
+    for i in range(count):
+        platform, encoding, language, name_id, length, offset = struct.unpack(">HHHHHH", data[6 + i * 12:18 + i * 12])
+        if name_id not in (1, 2, 4, 6) or name_id in names:
+            continue
+        raw = data[string_offset + offset:string_offset + offset + length]
+        if platform in (0, 3):
+            names[name_id] = raw.decode("utf-16-be", errors="ignore")
+        elif platform == 1:
+            names[name_id] = raw.decode("latin-1")
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def _font_index():
+    """Indice nome-da-fonte (lowercase) -> arquivo, montado uma vez por execucao."""
+    index = {}
+    for font_dir in _font_dirs():
+        for root, _dirs, files in os.walk(font_dir):
+            for name in files:
+                if not name.lower().endswith((".ttf", ".otf", ".ttc")):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    names = _parse_ttf_names(path)
+                except (OSError, struct.error, KeyError):
+                    continue
+                family, subfamily = names.get(1, ""), names.get(2, "")
+                for key in (names.get(4), names.get(6), f"{family} {subfamily}"):
+                    if key:
+                        index.setdefault(key.strip().lower(), path)
+    return index
+
+
+def find_font_file(font_name, bold=False):
+    """Localiza o arquivo da fonte pelo nome do estilo do Vlogger (None se nao achar)."""
+    index = _font_index()
+    name = font_name.strip().lower()
+    if bold:
+        candidates = [f"{name} bold", f"{name}-bold", f"{name}bold", name]
+    else:
+        candidates = [f"{name} regular", name, f"{name}-regular"]
+    for candidate in candidates:
+        if candidate in index:
+            return index[candidate]
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _load_glyph_advances(font_path):
+    """Parseia cmap + hmtx uma vez por arquivo: (codepoint -> advance, unitsPerEm, advance padrao)."""
+    with open(font_path, "rb") as f:
+        tables = _read_ttf_tables(f)
+        head = _read_table(f, tables, "head")
+        hhea = _read_table(f, tables, "hhea")
+        hmtx = _read_table(f, tables, "hmtx")
+        cmap = _read_table(f, tables, "cmap")
+
+    (units_per_em,) = struct.unpack(">H", head[18:20])
+    (num_hmetrics,) = struct.unpack(">H", hhea[34:36])
+    advances = struct.unpack(f">{num_hmetrics * 2}H", hmtx[:num_hmetrics * 4])[0::2]
+
+    def advance_of(glyph):
+        return advances[glyph] if glyph < num_hmetrics else advances[-1]
+
+    # Escolher subtabela Unicode: (3,10)/(0,4) formato 12 ou (3,1)/(0,x) formato 4
+    _version, num_subtables = struct.unpack(">HH", cmap[:4])
+    subtables = {}
+    for i in range(num_subtables):
+        platform, encoding, offset = struct.unpack(">HHI", cmap[4 + i * 8:12 + i * 8])
+        (fmt,) = struct.unpack(">H", cmap[offset:offset + 2])
+        subtables.setdefault((fmt, platform, encoding), offset)
+
+    glyph_map = {}
+    fmt12 = [o for (fmt, p, e), o in subtables.items() if fmt == 12 and (p, e) in ((3, 10), (0, 4), (0, 6))]
+    fmt4 = [o for (fmt, p, e), o in subtables.items() if fmt == 4 and (p == 0 or (p, e) == (3, 1))]
+    if fmt12:
+        offset = fmt12[0]
+        (num_groups,) = struct.unpack(">I", cmap[offset + 12:offset + 16])
+        for g in range(num_groups):
+            start, end, start_glyph = struct.unpack(">III", cmap[offset + 16 + g * 12:offset + 28 + g * 12])
+            for cp in range(start, min(end, 0x10FFFF) + 1):
+                glyph_map[cp] = start_glyph + cp - start
+    elif fmt4:
+        offset = fmt4[0]
+        (seg_count_x2,) = struct.unpack(">H", cmap[offset + 6:offset + 8])
+        seg_count = seg_count_x2 // 2
+        ends_at = offset + 14
+        starts_at = ends_at + seg_count_x2 + 2
+        deltas_at = starts_at + seg_count_x2
+        range_offsets_at = deltas_at + seg_count_x2
+        ends = struct.unpack(f">{seg_count}H", cmap[ends_at:ends_at + seg_count_x2])
+        starts = struct.unpack(f">{seg_count}H", cmap[starts_at:starts_at + seg_count_x2])
+        deltas = struct.unpack(f">{seg_count}h", cmap[deltas_at:deltas_at + seg_count_x2])
+        range_offsets = struct.unpack(f">{seg_count}H", cmap[range_offsets_at:range_offsets_at + seg_count_x2])
+        for s in range(seg_count):
+            if starts[s] == 0xFFFF:
+                continue
+            for cp in range(starts[s], ends[s] + 1):
+                if range_offsets[s] == 0:
+                    glyph = (cp + deltas[s]) & 0xFFFF
+                else:
+                    at = range_offsets_at + s * 2 + range_offsets[s] + (cp - starts[s]) * 2
+                    (glyph,) = struct.unpack(">H", cmap[at:at + 2])
+                    if glyph:
+                        glyph = (glyph + deltas[s]) & 0xFFFF
+                glyph_map[cp] = glyph
+
+    cp_advances = {cp: advance_of(glyph) for cp, glyph in glyph_map.items() if glyph}
+    return cp_advances, units_per_em, advance_of(0)
+
+
+class FontMetrics:
+    """Larguras em pixels dos glifos de uma fonte num tamanho especifico.
+
+    `space` e o espacamento extra entre caracteres (tspace do estilo), em pixels.
+    """
+
+    def __init__(self, font_path, font_size, space=0.0):
+        cp_advances, units_per_em, default_advance = _load_glyph_advances(font_path)
+        scale = font_size / units_per_em
+        self._cp_advances = cp_advances
+        self._scale = scale
+        self._default = default_advance * scale
+        self._space = space
+        self._cache = {}
+        self.space_width = self.text_width(" ")
+        lowercase = "abcdefghijklmnopqrstuvwxyz"
+        self.avg_char_width = self.text_width(lowercase) / len(lowercase)
+
+    def text_width(self, text):
+        width = self._cache.get(text)
+        if width is None:
+            scale, default, advances = self._scale, self._default, self._cp_advances
+            width = sum(advances[ord(c)] * scale if ord(c) in advances else default for c in text)
+            width += self._space * len(text)
+            self._cache[text] = width
+        return width
+
+    def line_budget(self, chars_per_line):
+        """Largura maxima da linha equivalente a `chars_per_line` caracteres medios."""
+        return chars_per_line * self.avg_char_width
+
+
+class CharCountMetrics:
+    """Fallback sem arquivo de fonte: largura = numero de caracteres."""
+
+    space_width = 1
+
+    def text_width(self, text):
+        return len(text)
+
+    def line_budget(self, chars_per_line):
+        return chars_per_line
+
+
+@functools.lru_cache(maxsize=None)
+def get_font_metrics(font_name, font_size, bold=False, space=0.0):
+    """Metricas memoizadas por fonte e tamanho; cai para contagem de caracteres se a fonte nao existir."""
+    font_path = find_font_file(font_name, bold)
+    if not font_path:
+        print(f"  AVISO: fonte '{font_name}' nao encontrada, quebra de linha por contagem de caracteres")
+        return CharCountMetrics()
+    try:
+        return FontMetrics(font_path, font_size, space)
+    except (OSError, struct.error, KeyError, IndexError) as e:
+        print(f"  AVISO: falha ao ler {os.path.basename(font_path)} ({e}), quebra de linha por contagem de caracteres")
+        return CharCountMetrics()
+
+
 # ---------------------------------------------------------------------------
 # Agrupamento de palavras em telas
 # ---------------------------------------------------------------------------
@@ -180,75 +507,85 @@ def _is_sentence_end(word_text):
     return word_text.rstrip().endswith((".", "?", "!"))
 
 
-def group_words_into_screens(words, max_lines, max_chars, gap_threshold, highlight_scale=100):
-    """Agrupa palavras em telas respeitando limites de caracteres, linhas e pausas.
+@trace.traced("group_words_into_screens", "layout")
+def group_words_into_screens(words, max_lines, max_chars, gap_threshold, highlight_scale=100, metrics=None, max_width=None):
+    """Agrupa palavras em telas respeitando limites de largura, linhas e pausas.
 
     Quando uma palavra termina frase (., ?, !), a proxima frase inicia em nova linha.
     Se max_lines ja foi atingido, inicia nova tela.
 
+    metrics: FontMetrics (largura real dos glifos) ou None para contar caracteres.
+    max_width: largura maxima da linha em pixels; default equivale a max_chars
+    caracteres medios da fonte.
     highlight_scale: escala % do destaque (ex: 120). Calcula ponto de quebra considerando
     o pior caso (maior palavra da linha destacada), para que \\N fique fixo entre blocos.
     """
     if not words:
         return []
 
+    if metrics is None:
+        metrics = CharCountMetrics()
     chars_per_line = max_chars // max_lines if max_lines > 1 else max_chars
+    line_budget = max_width if max_width else metrics.line_budget(chars_per_line)
+    space_width = metrics.space_width
+    highlight_extra = highlight_scale / 100 - 1
 
     screens = []
     current_lines = [[]]  # lista de listas de palavras
-    current_line_len = 0
+    current_line_width = 0  # largura acumulada da linha atual
+    current_line_max_word = 0  # maior palavra da linha atual (pior caso do destaque)
     prev_end = words[0]["start"]
     prev_segment = words[0].get("segment")
     force_new_line = False  # flag: proxima palavra deve iniciar nova linha
 
     for w in words:
-        word_len = len(w["word"])
+        word_width = metrics.text_width(w["word"])
         cur_segment = w.get("segment")
 
         # Mudou de segment -> nova tela
         if current_lines[0] and cur_segment is not None and cur_segment != prev_segment:
             screens.append(_build_screen(current_lines))
             current_lines = [[]]
-            current_line_len = 0
+            current_line_width = current_line_max_word = 0
             force_new_line = False
 
         # Gap grande -> nova tela
         if current_lines[0] and w["start"] - prev_end > gap_threshold:
             screens.append(_build_screen(current_lines))
             current_lines = [[]]
-            current_line_len = 0
+            current_line_width = current_line_max_word = 0
             force_new_line = False
 
         # Fim de frase anterior -> forcar nova linha
-        if force_new_line and current_line_len > 0:
+        if force_new_line and current_lines[-1]:
             if len(current_lines) >= max_lines:
                 screens.append(_build_screen(current_lines))
                 current_lines = [[]]
-                current_line_len = 0
             else:
                 current_lines.append([])
-                current_line_len = 0
+            current_line_width = current_line_max_word = 0
             force_new_line = False
 
-        # Palavra excede max_chars na linha atual -> nova linha
+        # Palavra excede a largura da linha atual -> nova linha
         # Considerar pior caso: maior palavra da linha destacada a highlight_scale
-        candidate_words = [w2["word"] for w2 in current_lines[-1]] + [w["word"]]
-        max_word_len = max(len(cw) for cw in candidate_words)
-        extra = max_word_len * (highlight_scale / 100 - 1)
-        needed = word_len if current_line_len == 0 else current_line_len + 1 + word_len
-        if current_line_len > 0 and needed + extra > chars_per_line:
-            # Nova linha
-            if len(current_lines) >= max_lines:
-                # Max linhas atingido -> nova tela
-                screens.append(_build_screen(current_lines))
-                current_lines = [[]]
-                current_line_len = 0
-            else:
-                current_lines.append([])
-                current_line_len = 0
-
+        if current_lines[-1]:
+            extra = max(current_line_max_word, word_width) * highlight_extra
+            needed = current_line_width + space_width + word_width
+            if needed + extra > line_budget:
+                if len(current_lines) >= max_lines:
+                    # Max linhas atingido -> nova tela
+                    screens.append(_build_screen(current_lines))
+                    current_lines = [[]]
+                else:
+                    current_lines.append([])
+                current_line_width = current_line_max_word = 0
+
+        if current_lines[-1]:
+            current_line_width += space_width + word_width
+        else:
+            current_line_width = word_width
+        current_line_max_word = max(current_line_max_word, word_width)
         current_lines[-1].append(w)
-        current_line_len = current_line_len + 1 + word_len if current_line_len > 0 else word_len
         prev_end = w["end"]
         prev_segment = cur_segment
 
@@ -261,7 +598,7 @@ def group_words_into_screens(words, max_lines, max_chars, gap_threshold, highlig
             w["word"] = w["word"].rstrip(",")
             screens.append(_build_screen(current_lines))
             current_lines = [[]]
-            current_line_len = 0
+            current_line_width = current_line_max_word = 0
             force_new_line = False
 
     # Ultima tela
@@ -315,12 +652,110 @@ def build_highlight_text(screen, highlight_idx, ass_color, base_color, font_size
 # Geracao de TextEffectBlocks
 # ---------------------------------------------------------------------------
 
+# Style base (ASS) — valores fixos (dialogue sobrescreve tudo)
+BASE_STYLE = {
+    "idx": 0, "name": "style1", "fname": "Arial", "fsize": 20.0,
+    "c1": 4294967295, "c2": 3690987520, "c3": 4278190080, "c4": 3690987520,
+    "bold": False, "italic": False, "underline": False, "strikeOut": False,
+    "scalex": 100, "scaley": 100, "spacing": 0, "angle": 0,
+    "borderStyle": 1, "outline": 1.0, "shadow": 0.0, "alignment": 2,
+    "ml": 10, "mr": 10, "mv": 10, "encoding": 1,
+}
+
+
+# Namespace fixo para UUIDs derivados do conteudo (uuid5)
+SUBTITLE_UUID_NAMESPACE = uuid.UUID("5150df95-f4f7-4f49-90f7-177284920348")
+
+
+def content_uuid(*parts):
+    """UUID deterministico no formato do Vlogger ({XXXXXXXX-...}) a partir do conteudo."""
+    name = "\x1f".join(str(p) for p in parts)
+    return "{" + str(uuid.uuid5(SUBTITLE_UUID_NAMESPACE, name)).upper() + "}"
+
+
+def screen_key(screen, style_config):
+    """Identidade da tela: palavras + timings + parametros de estilo que afetam o bloco.
+
+    Mudar o estilo (cor, escala, fonte...) gera UUIDs novos e refaz os blocos.
+    """
+    words = "|".join(f"{w['word']}@{w['start']:.3f}-{w['end']:.3f}" for w in screen["words"])
+    lines = "/".join(str(len(line)) for line in screen["lines"])
+    style = json.dumps(style_config, sort_keys=True)
+    return f"{words}#{lines}#{style}"
+
+
+def _build_dialogue(sc, text, start_ms, end_ms, idx=0):
+    """Monta um dialogue com o estilo do Vlogger; start/end relativos ao bloco (ms)."""
+    return {
+        "idx": idx, "layer": 0, "start": int(start_ms), "end": int(end_ms),
+        "style": "style1", "name": "",
+        "ml": sc["margin"], "mr": sc["margin"], "mv": 0,
+        "effect": "", "text": text, "animation": 0, "has_default": False,
+        "animation_delay": 0, "animation_time": 0,
+        "fontname": sc["font"], "fontsize": float(sc["font_size"]),
+        "bold": 1 if sc["bold"] else 0,
+        "italic": sc["italic"], "underline": sc["underline"],
+        "textAlign": 1, "alignment": 5,
+        "space": sc["space"], "rotation": 0.0, "scale": 100.0,
+        "posX": 0.5, "posY": sc["position_y"],
+        "blendMode": sc["blend_mode"], "blendOpacity": sc["blend_opacity"],
+        "color_mode": sc["color_mode"],
+        "fColor": sc["f_color"], "fOpacity": sc["f_opacity"],
+        "gStart": sc["g_start"], "gStop": sc["g_stop"],
+        "gOpacity": sc["g_opacity"], "gAngle": sc["g_angle"],
+        "bdEnable": sc["bd_enable"], "bdColor": sc["bd_color"],
+        "bdSize": sc["bd_size"], "bdOpacity": sc["bd_opacity"],
+        "bdBlur": sc["bd_blur"],
+        "sdEnable": sc["sd_enable"], "sdType": sc["sd_type"],
+        "sdColor": sc["sd_color"], "sdOpacity": sc["sd_opacity"],
+        "sdDist": sc["sd_dist"],
+    }
+
+
+def _build_block(block_uuid, title, tstart_ms, duration_ms, dialogues, project_width, project_height):
+    """Monta um TextEffectBlock de legenda com os dialogues dados."""
+    return {
+        "title": title,
+        "type": "TextEffectBlock",
+        "background": 4229689855,
+        "foreground": 1216461823,
+        "status": 1,
+        "uuid": block_uuid,
+        "tstart": tstart_ms,
+        "tduration": duration_ms,
+        "restype": "TextEffectResource",
+        "resid": "subtitle_001",
+        "attribute": {
+            "dialogues": dialogues,
+            "styles": [BASE_STYLE],
+            "width": project_width,
+            "height": project_height,
+            "version": 1,
+            "leftTimestamp": -0.1,
+            "rightTimestamp": duration_ms / 1000.0 - 0.1,
+        },
+    }
+
+
+def _word_timings(words):
+    """(start_ms, end_ms) de cada palavra: vai ate o inicio da proxima (direto do Whisper, sem snap)."""
+    timings = []
+    for i, w in enumerate(words):
+        start_ms = w["start"] * 1000
+        if i + 1 < len(words):
+            end_ms = words[i + 1]["start"] * 1000
+        else:
+            end_ms = w["end"] * 1000
+        timings.append((start_ms, end_ms))
+    return timings
+
+
 def create_text_effect_blocks(screen, style_config, project_width, project_height, fps):
     """Cria um TextEffectBlock por palavra da tela.
 
     Cada bloco e independente na timeline, permitindo ajuste de timing na GUI.
     Todos mostram o texto completo da tela, com highlight na palavra correspondente.
-    Timings sao snapped para boundaries de frame (fps do projeto).
+    UUIDs derivados da tela + indice da palavra: re-rodar gera os mesmos blocos.
     """
     sc = style_config
     ass_highlight = hex_to_ass_color(sc["highlight_color"])
@@ -328,151 +763,217 @@ def create_text_effect_blocks(screen, style_config, project_width, project_heigh
     highlight_font_size = int(sc["font_size"] * sc["highlight_scale"] / 100)
     advance_ms = sc.get("advance_ms", 0)
 
-    # Style base (ASS) — valores fixos (dialogue sobrescreve tudo)
-    base_style = {
-        "idx": 0, "name": "style1", "fname": "Arial", "fsize": 20.0,
-        "c1": 4294967295, "c2": 3690987520, "c3": 4278190080, "c4": 3690987520,
-        "bold": False, "italic": False, "underline": False, "strikeOut": False,
-        "scalex": 100, "scaley": 100, "spacing": 0, "angle": 0,
-        "borderStyle": 1, "outline": 1.0, "shadow": 0.0, "alignment": 2,
-        "ml": 10, "mr": 10, "mv": 10, "encoding": 1,
-    }
-
     words = screen["words"]
+    key = screen_key(screen, sc)
     blocks = []
 
-    for i, w in enumerate(words):
-        # Timing absoluto na timeline (direto do Whisper, sem snap)
-        start_ms = w["start"] * 1000
-        if i + 1 < len(words):
-            end_ms = words[i + 1]["start"] * 1000
-        else:
-            end_ms = w["end"] * 1000
+    for i, (start_ms, end_ms) in enumerate(_word_timings(words)):
         duration_ms = max(1, end_ms - start_ms)
-
         text = build_highlight_text(screen, i, ass_highlight, ass_base, sc["font_size"], highlight_font_size)
+        dialogue = _build_dialogue(sc, text, 0, int(duration_ms) - 1)
+        blocks.append(_build_block(
+            content_uuid("word", key, i), words[i]["word"], max(0, start_ms - advance_ms), duration_ms,
+            [dialogue], project_width, project_height,
+        ))
 
-        dialogue = {
-            "idx": 0, "layer": 0, "start": 0, "end": int(duration_ms) - 1,
-            "style": "style1", "name": "",
-            "ml": sc["margin"], "mr": sc["margin"], "mv": 0,
-            "effect": "", "text": text, "animation": 0, "has_default": False,
-            "animation_delay": 0, "animation_time": 0,
-            "fontname": sc["font"], "fontsize": float(sc["font_size"]),
-            "bold": 1 if sc["bold"] else 0,
-            "italic": sc["italic"], "underline": sc["underline"],
-            "textAlign": 1, "alignment": 5,
-            "space": sc["space"], "rotation": 0.0, "scale": 100.0,
-            "posX": 0.5, "posY": sc["position_y"],
-            "blendMode": sc["blend_mode"], "blendOpacity": sc["blend_opacity"],
-            "color_mode": sc["color_mode"],
-            "fColor": sc["f_color"], "fOpacity": sc["f_opacity"],
-            "gStart": sc["g_start"], "gStop": sc["g_stop"],
-            "gOpacity": sc["g_opacity"], "gAngle": sc["g_angle"],
-            "bdEnable": sc["bd_enable"], "bdColor": sc["bd_color"],
-            "bdSize": sc["bd_size"], "bdOpacity": sc["bd_opacity"],
-            "bdBlur": sc["bd_blur"],
-            "sdEnable": sc["sd_enable"], "sdType": sc["sd_type"],
-            "sdColor": sc["sd_color"], "sdOpacity": sc["sd_opacity"],
-            "sdDist": sc["sd_dist"],
-        }
+    return blocks
 
-        block_uuid = "{" + str(uuid.uuid4()).upper() + "}"
-        blocks.append({
-            "title": w["word"],
-            "type": "TextEffectBlock",
-            "background": 4229689855,
-            "foreground": 1216461823,
-            "status": 1,
-            "uuid": block_uuid,
-            "tstart": max(0, start_ms - advance_ms),
-            "tduration": duration_ms,
-            "restype": "TextEffectResource",
-            "resid": "subtitle_001",
-            "attribute": {
-                "dialogues": [dialogue],
-                "styles": [base_style],
-                "width": project_width,
-                "height": project_height,
-                "version": 1,
-                "leftTimestamp": -0.1,
-                "rightTimestamp": duration_ms / 1000.0 - 0.1,
-            },
-        })
 
-    return blocks
+def create_screen_block(screen, style_config, project_width, project_height, fps):
+    """Cria um unico TextEffectBlock para a tela, com um dialogue temporizado por palavra.
+
+    Modo compacto: o Vlogger troca de dialogue conforme o tempo dentro do bloco,
+    entao o highlight avanca igual ao modo palavra-por-bloco, com ~N vezes menos blocos.
+    """
+    sc = style_config
+    ass_highlight = hex_to_ass_color(sc["highlight_color"])
+    ass_base = hex_to_ass_color(sc["base_color"])
+    highlight_font_size = int(sc["font_size"] * sc["highlight_scale"] / 100)
+    advance_ms = sc.get("advance_ms", 0)
+
+    timings = _word_timings(screen["words"])
+    block_start_ms = timings[0][0]
+    block_end_ms = max(block_start_ms + 1, timings[-1][1])
+
+    dialogues = []
+    for i, (start_ms, end_ms) in enumerate(timings):
+        text = build_highlight_text(screen, i, ass_highlight, ass_base, sc["font_size"], highlight_font_size)
+        rel_start = int(start_ms - block_start_ms)
+        rel_end = max(rel_start, int(end_ms - block_start_ms) - 1)
+        dialogues.append(_build_dialogue(sc, text, rel_start, rel_end, idx=i))
+
+    title = " ".join(w["word"] for w in screen["words"])
+    return _build_block(
+        content_uuid("screen", screen_key(screen, sc)), title,
+        max(0, block_start_ms - advance_ms), block_end_ms - block_start_ms,
+        dialogues, project_width, project_height,
+    )
 
 
 # ---------------------------------------------------------------------------
 # Modificacao do VPD
 # ---------------------------------------------------------------------------
 
-def get_project_info(vpd_data):
-    """Extrai dimensoes e fps do projeto do projinfo."""
-    player = vpd_data.get("projinfo", {}).get("player", {})
-    width = player.get("resolutionW", 1080)
-    height = player.get("resolutionH", 1920)
-    fps_num = player.get("frameRateNum", 30)
-    fps_den = player.get("frameRateDen", 1)
-    fps = fps_num / fps_den
-    return width, height, fps
-
-
 def snap_to_frame(ms, fps):
     """Arredonda tempo em ms para o frame mais proximo (multiplo de frame_ms)."""
     frame_ms = 1000.0 / fps
     return round(ms / frame_ms) * frame_ms
 
 
-def modify_vpd_subtitles(vpd_path, blocks_a, blocks_b):
-    """Insere TextEffectBlocks em 2 SubtitleTracks (A e B) no VPD."""
+# Blocos encostados (fim de um == inicio do seguinte, a menos de arredondamento)
+# tambem contam como sobrepostos: palavras consecutivas sempre alternam de track
+OVERLAP_EPS_MS = 0.5
+
+
+def _new_subtitle_track(title, blocks):
+    return {
+        "title": title,
+        "type": "SubtitleTrack",
+        "status": 1,
+        "subitems": blocks,
+        "tstart": 0.0,
+        "tduration": 1.7976931348623157e308,
+        "context": _track_context(blocks),
+        "opacity": 100,
+        "mute": False,
+    }
+
+
+def _track_context(blocks):
+    """Fim do ultimo bloco da track (ms)."""
+    return max((b["tstart"] + b["tduration"] for b in blocks), default=0)
+
+
+def _separate_overlaps(final_blocks, titles):
+    """Redistribui os blocos entre as tracks para que blocos sobrepostos fiquem em tracks diferentes.
+
+    No modo palavra os blocos se sobrepoem por advance_ms, e e por isso que alternam
+    entre A e B. Varre por tstart: cada bloco fica na track em que ja esta se ela estiver
+    livre (o anterior nela terminou antes do seu inicio), senao vai para a outra.
+    Retorna quantos blocos mudaram de track.
+    """
+    busy_until = dict.fromkeys(titles, float("-inf"))
+    placed = {title: [] for title in titles}
+    moved = 0
+    for title, b in sorted(((t, b) for t in titles for b in final_blocks[t]), key=lambda tb: tb[1]["tstart"]):
+        if b["tstart"] < busy_until[title] + OVERLAP_EPS_MS:
+            other = min(titles, key=lambda t: busy_until[t])
+            if other != title:
+                title = other
+                moved += 1
+        placed[title].append(b)
+        busy_until[title] = max(busy_until[title], b["tstart"] + b["tduration"])
+    final_blocks.update(placed)
+    return moved
+
+
+def modify_vpd_subtitles(project, blocks_a, blocks_b, save=True):
+    """Atualiza 2 SubtitleTracks (A e B) no VPD aplicando so a diferenca.
+
+    Blocos sao comparados por UUID (deterministico, derivado do conteudo):
+    - ja existe no VPD -> mantido como esta (preserva ajustes feitos na GUI)
+    - nao existe -> inserido na track desejada, em ordem de tstart
+    - existe no VPD mas nao foi gerado agora -> removido
+    Um bloco mantido so muda de track se a track atual nao recebe mais blocos ou se
+    ficaria sobreposto a outro bloco da mesma track (ex.: quantidade de blocos mudou
+    depois de corrigir a transcricao); inseridos idem (_separate_overlaps).
+    SubtitleTracks que nao sejam "Subtitle A"/"Subtitle B" sao removidas.
+
+    Com save=False so altera o projeto em memoria; quem chama (vpd-pipeline)
+    cuida de recarregar/gravar o VPD e de chamar reset_playhead().
+    """
+    vpd_path = project.path
+    # O VPD pode ter sido salvo no Vlogger durante a transcricao
+    if save and project.reload_if_changed():
+        print(f"  VPD alterado no disco desde a leitura, recarregado")
+
     # Backup
     backup_path = vpd_path + ".bak"
     if not os.path.exists(backup_path):
         shutil.copy2(vpd_path, backup_path)
         print(f"  Backup: {os.path.basename(backup_path)}")
 
-    with open(vpd_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = project.data
 
     timeline = data["timeline"]
     tracks = timeline["subitems"]
 
-    # Remover SubtitleTracks existentes
-    old_count = 0
-    tracks_to_keep = []
+    desired = {"Subtitle A": blocks_a, "Subtitle B": blocks_b}
+    desired_track_of = {}
+    for title, blocks in desired.items():
+        for b in blocks:
+            desired_track_of[b["uuid"]] = title
+
+    # Blocos existentes nas SubtitleTracks gerenciadas
+    existing_tracks = {}
+    removed_tracks = 0
     for track in tracks:
-        if track["type"] == "SubtitleTrack":
-            old_count += len(track.get("subitems", []))
+        if track["type"] != "SubtitleTrack":
+            continue
+        if track["title"] in desired and track["title"] not in existing_tracks:
+            existing_tracks[track["title"]] = track
         else:
-            tracks_to_keep.append(track)
-    if old_count > 0:
-        print(f"  SubtitleTracks limpos ({old_count} blocos removidos)")
-    timeline["subitems"] = tracks_to_keep
-
-    # Criar 2 SubtitleTracks
-    for title, blocks in [("Subtitle A", blocks_a), ("Subtitle B", blocks_b)]:
-        context_ms = 0
-        if blocks:
-            last = blocks[-1]
-            context_ms = last["tstart"] + last["tduration"]
-        timeline["subitems"].append({
-            "title": title,
-            "type": "SubtitleTrack",
-            "status": 1,
-            "subitems": blocks,
-            "tstart": 0.0,
-            "tduration": 1.7976931348623157e308,
-            "context": context_ms,
-            "opacity": 100,
-            "mute": False,
-        })
+            removed_tracks += 1
+    existing_blocks = {}
+    for title, track in existing_tracks.items():
+        for b in track.get("subitems", []):
+            existing_blocks.setdefault(b.get("uuid"), title)
+
+    kept = inserted = removed = 0
+    final_blocks = {title: [] for title in desired}
+    for title, track in existing_tracks.items():
+        for b in track.get("subitems", []):
+            target = desired_track_of.get(b.get("uuid"))
+            if target is None:
+                removed += 1
+                continue
+            # Manter na track atual (a menos que ela nao seja mais usada)
+            final_blocks[title if desired[title] else target].append(b)
+            kept += 1
+    for title, blocks in desired.items():
+        for b in blocks:
+            if b["uuid"] not in existing_blocks:
+                final_blocks[title].append(b)
+                inserted += 1
+    in_use = [title for title in desired if desired[title]]
+    moved = _separate_overlaps(final_blocks, in_use) if len(in_use) == 2 else 0
+
+    # Aplicar: so reatribui listas que mudaram (o resto e copiado do original)
+    new_tracks = [t for t in tracks if t["type"] != "SubtitleTrack" or existing_tracks.get(t["title"]) is t]
+    if len(new_tracks) != len(tracks):
+        timeline["subitems"] = new_tracks
+    for title, blocks in final_blocks.items():
+        blocks.sort(key=lambda b: b["tstart"])
+        track = existing_tracks.get(title)
+        if track is None:
+            timeline["subitems"].append(_new_subtitle_track(title, blocks))
+            continue
+        current = track.get("subitems", [])
+        if len(current) != len(blocks) or any(x is not y for x, y in zip(current, blocks)):
+            track["subitems"] = blocks
+        context_ms = _track_context(blocks)
+        if track.get("context") != context_ms:
+            track["context"] = context_ms
+
+    print(f"  Diff: {kept} mantidos, {inserted} inseridos, {removed} removidos")
+    if moved:
+        print(f"  Blocos trocados de track (sobreposicao): {moved}")
+    if removed_tracks:
+        print(f"  SubtitleTracks extras removidas: {removed_tracks}")
+
+    total = len(final_blocks["Subtitle A"]) + len(final_blocks["Subtitle B"])
+    print(f"  {total} TextEffectBlocks na timeline (A: {len(final_blocks['Subtitle A'])}, B: {len(final_blocks['Subtitle B'])})")
+    if not save:
+        return
+
+    # Salvar (atomico; tracks nao alteradas sao copiadas direto do original)
+    project.save()
+    reset_playhead(vpd_path)
+    print(f"  VPD salvo: {os.path.basename(vpd_path)}")
 
-    # Salvar
-    with open(vpd_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
 
-    # Reset playhead para o inicio (userdata)
+def reset_playhead(vpd_path):
+    """Reset do playhead para o inicio (arquivo .userdata do projeto)."""
     userdata_path = vpd_path.replace(".vpd", ".userdata")
     if os.path.exists(userdata_path):
         with open(userdata_path, "r", encoding="utf-8") as f:
@@ -483,14 +984,9 @@ def modify_vpd_subtitles(vpd_path, blocks_a, blocks_b):
         env["expFormat"] = "MP4"
         env["expVCodec"] = "hevc_nvenc"
         ud["environment"] = env
-        with open(userdata_path, "w", encoding="utf-8") as f:
-            json.dump(ud, f, indent=4, ensure_ascii=False)
+        atomic_write(userdata_path, json.dumps(ud, indent=4, ensure_ascii=False))
         print(f"  Playhead resetado para inicio")
 
-    total = len(blocks_a) + len(blocks_b)
-    print(f"  {total} TextEffectBlocks inseridos (A: {len(blocks_a)}, B: {len(blocks_b)})")
-    print(f"  VPD salvo: {os.path.basename(vpd_path)}")
-
 
 # ---------------------------------------------------------------------------
 # Teste de ASS tags
@@ -545,31 +1041,72 @@ def create_ass_test_blocks(project_width, project_height):
 
 
 # ---------------------------------------------------------------------------
-# Deteccao de audio
+# Main
 # ---------------------------------------------------------------------------
 
-def detect_audio(vpd_path):
-    """Detecta audio enhanced ou clean na pasta do projeto."""
-    vpd_dir = os.path.dirname(vpd_path)
-    project_name = os.path.splitext(os.path.basename(vpd_path))[0]
+@trace.traced("layout_subtitles", "layout")
+def layout_subtitles(words, args, project):
+    """Passos 3-4: agrupa as palavras em telas e gera os TextEffectBlocks.
 
-    candidates = [
-        os.path.join(vpd_dir, f"{project_name}-enhanced.wav"),
-        os.path.join(vpd_dir, f"{project_name}-clean.wav"),
-    ]
+    Retorna (screens, blocks_a, blocks_b); com --tracks 1 blocks_b fica vazio.
+    """
+    project_width, project_height, project_fps = project.player_info()
 
-    for path in candidates:
-        if os.path.exists(path):
-            return path
+    # 3. Agrupar palavras em telas (largura medida com a fonte do estilo)
+    print(f"\n--- Agrupamento ---")
+    style_config = load_vlogger_style(args.style)
+    metrics = get_font_metrics(style_config["font"], style_config["font_size"], style_config["bold"], style_config["space"])
+    screens = group_words_into_screens(words, args.max_lines, args.max_chars, args.gap_threshold, args.highlight_scale, metrics, args.max_width)
+    print(f"  Telas geradas: {len(screens)}")
 
-    return None
+    total_words = sum(len(s["words"]) for s in screens)
+    print(f"  Palavras totais: {total_words}")
 
+    # Mostrar preview das primeiras telas
+    for i, s in enumerate(screens[:3]):
+        line_strs = []
+        for line in s["lines"]:
+            line_strs.append(" ".join(w["word"] for w in line))
+        preview = " | ".join(line_strs)
+        print(f"  Tela {i}: [{s['start']:.1f}s-{s['end']:.1f}s] {preview}")
+    if len(screens) > 3:
+        print(f"  ... ({len(screens) - 3} telas restantes)")
 
-# ---------------------------------------------------------------------------
-# Main
-# ---------------------------------------------------------------------------
+    # 4. Gerar TextEffectBlocks
+    print(f"\n--- Gerando TextEffectBlocks ---")
+    style_config["highlight_color"] = args.highlight_color
+    style_config["highlight_scale"] = args.highlight_scale
+    style_config["position_y"] = args.position_y
+    style_config["margin"] = args.margin
+    style_config["advance_ms"] = args.advance_ms
+    # base_color: cor do texto normal (derivada de f_color ARGB)
+    fc = style_config["f_color"]
+    r, g, b = (fc >> 16) & 0xFF, (fc >> 8) & 0xFF, fc & 0xFF
+    style_config["base_color"] = "#{:02X}{:02X}{:02X}".format(r, g, b)
+    print(f"  Estilo: {args.style} ({style_config['font']} {style_config['font_size']}pt)")
 
-def main():
+    text_blocks = []
+    if args.block_mode == "screen":
+        for screen in screens:
+            text_blocks.append(create_screen_block(screen, style_config, project_width, project_height, project_fps))
+    else:
+        for screen in screens:
+            blocks = create_text_effect_blocks(screen, style_config, project_width, project_height, project_fps)
+            text_blocks.extend(blocks)
+    print(f"  Modo: {args.block_mode} ({len(text_blocks)} blocos)")
+
+    # Tracks A e B alternadas
+    if args.tracks == 2:
+        blocks_a = [b for i, b in enumerate(text_blocks) if i % 2 == 0]
+        blocks_b = [b for i, b in enumerate(text_blocks) if i % 2 == 1]
+        print(f"  Blocos: {len(text_blocks)} (A: {len(blocks_a)}, B: {len(blocks_b)})")
+    else:
+        blocks_a, blocks_b = text_blocks, []
+        print(f"  Blocos: {len(text_blocks)}")
+    return screens, blocks_a, blocks_b
+
+
+def build_parser():
     parser = argparse.ArgumentParser(
         description="Adiciona legendas palavra-por-palavra ao VPD a partir do audio"
     )
@@ -579,10 +1116,12 @@ def main():
     parser.add_argument("--audio", help="Audio para transcrever (default: detecta *-enhanced.wav)")
     parser.add_argument("--whisper-model", default="medium", help="Modelo whisper: tiny/base/small/medium/large (default: medium)")
     parser.add_argument("--language", default="pt", help="Codigo do idioma (default: pt)")
+    parser.add_argument("--pcm", help="PCM float32 mono 16 kHz ja decodificado (vpd-enhance-audio --pcm-out); transcreve in-process")
 
     # Layout
     parser.add_argument("--max-lines", type=int, default=2, help="Max linhas por tela: 1 ou 2 (default: 2)")
     parser.add_argument("--max-chars", type=int, default=28, help="Max caracteres por linha (default: 28)")
+    parser.add_argument("--max-width", type=float, help="Largura max da linha em pixels, medida com a fonte do estilo (default: equivalente a --max-chars)")
     parser.add_argument("--gap-threshold", type=float, default=1.5, help="Pausa minima (s) para quebrar tela (default: 1.5)")
     parser.add_argument("--advance-ms", type=int, default=33, help="Adiantar legendas em ms para sincronizar com a fala (default: 33)")
 
@@ -593,21 +1132,36 @@ def main():
     parser.add_argument("--position-y", type=float, default=0.70, help="Posicao vertical 0.0-1.0 (default: 0.70)")
     parser.add_argument("--margin", type=int, default=100, help="Margem lateral em pixels (default: 100)")
     parser.add_argument("--tracks", type=int, default=2, choices=[1, 2], help="Numero de SubtitleTracks: 1 ou 2 (default: 2)")
+    parser.add_argument("--block-mode", default="word", choices=["word", "screen"],
+                        help="word: um bloco por palavra; screen: um bloco por tela com um dialogue por palavra (VPD menor) (default: word)")
 
     # Modo teste
     parser.add_argument("--test-ass", action="store_true", help="Inserir bloco de teste ASS e sair")
 
-    args = parser.parse_args()
+    # Medicao
+    parser.add_argument("--trace", action="store_true", help="Medir whisper/layout/VPD e gravar Chrome trace + resumo de tempos")
+    parser.add_argument("--trace-out", help="Arquivo do trace (default: <projeto>.vpd.trace.json)")
 
-    vpd_path = os.path.abspath(args.vpd)
-    if not os.path.exists(vpd_path):
-        print(f"Arquivo nao encontrado: {vpd_path}", file=sys.stderr)
-        sys.exit(1)
+    return parser
+
+
+def run(args, project=None, pcm=None, save=True):
+    """Executa o fluxo de legendas para os argumentos de build_parser().
 
-    # Ler VPD para dimensoes
-    with open(vpd_path, "r", encoding="utf-8") as f:
-        vpd_data = json.load(f)
-    project_width, project_height, project_fps = get_project_info(vpd_data)
+    `project` permite reaproveitar um Project ja carregado e `pcm` um buffer
+    PCM float32 16 kHz em memoria (bytes ou array), como faz o vpd-pipeline.
+    Com save=False o VPD so e alterado em memoria.
+
+    Retorna dict com words, screens, blocks_a e blocks_b (None no modo --test-ass).
+    """
+    vpd_path = os.path.abspath(args.vpd)
+    if project is None:
+        if not os.path.exists(vpd_path):
+            print(f"Arquivo nao encontrado: {vpd_path}", file=sys.stderr)
+            sys.exit(1)
+        # Ler VPD (parse unico, reaproveitado na escrita)
+        project = Project.load(vpd_path)
+    project_width, project_height, project_fps = project.player_info()
 
     print(f"=== vpd-add-subtitles ===")
     print(f"Projeto: {os.path.basename(vpd_path)}")
@@ -617,11 +1171,11 @@ def main():
     if args.test_ass:
         print(f"\n--- Teste de ASS override tags (3 blocos) ---")
         test_blocks = create_ass_test_blocks(project_width, project_height)
-        modify_vpd_subtitles(vpd_path, test_blocks, [])
+        modify_vpd_subtitles(project, test_blocks, [], save=save)
         print(f"\n1 bloco de teste inserido (1s-4s):")
         print(f"  TESTE em amarelo fs78 + resto branco fs65")
         print(f"  Sem tachado esperado.")
-        return
+        return None
 
     # --- Fluxo normal ---
     # 1. Detectar audio
@@ -643,61 +1197,41 @@ def main():
     # 2. Transcrever com Whisper
     print(f"\n--- Transcricao (Whisper) ---")
     vpd_dir = os.path.dirname(vpd_path)
-    words = transcribe(audio_path, args.whisper_model, args.language, vpd_dir)
+    warn_if_audio_changed(project, audio_path)
+    if pcm is not None:
+        if isinstance(pcm, (bytes, bytearray)):
+            pcm = pcm_from_bytes(pcm)
+    elif args.pcm:
+        if os.path.exists(args.pcm):
+            pcm = load_pcm(args.pcm)
+        else:
+            print(f"  AVISO: PCM nao encontrado ({args.pcm}), whisper vai decodificar o audio")
+    words = transcribe(audio_path, args.whisper_model, args.language, vpd_dir, pcm=pcm)
 
     if not words:
         print("ERRO: nenhuma palavra transcrita.", file=sys.stderr)
         sys.exit(1)
 
-    # 3. Agrupar palavras em telas
-    print(f"\n--- Agrupamento ---")
-    screens = group_words_into_screens(words, args.max_lines, args.max_chars, args.gap_threshold, args.highlight_scale)
-    print(f"  Telas geradas: {len(screens)}")
-
-    total_words = sum(len(s["words"]) for s in screens)
-    print(f"  Palavras totais: {total_words}")
-
-    # Mostrar preview das primeiras telas
-    for i, s in enumerate(screens[:3]):
-        line_strs = []
-        for line in s["lines"]:
-            line_strs.append(" ".join(w["word"] for w in line))
-        preview = " | ".join(line_strs)
-        print(f"  Tela {i}: [{s['start']:.1f}s-{s['end']:.1f}s] {preview}")
-    if len(screens) > 3:
-        print(f"  ... ({len(screens) - 3} telas restantes)")
-
-    # 4. Gerar TextEffectBlocks
-    print(f"\n--- Gerando TextEffectBlocks ---")
-    style_config = load_vlogger_style(args.style)
-    style_config["highlight_color"] = args.highlight_color
-    style_config["highlight_scale"] = args.highlight_scale
-    style_config["position_y"] = args.position_y
-    style_config["margin"] = args.margin
-    style_config["advance_ms"] = args.advance_ms
-    # base_color: cor do texto normal (derivada de f_color ARGB)
-    fc = style_config["f_color"]
-    r, g, b = (fc >> 16) & 0xFF, (fc >> 8) & 0xFF, fc & 0xFF
-    style_config["base_color"] = "#{:02X}{:02X}{:02X}".format(r, g, b)
-    print(f"  Estilo: {args.style} ({style_config['font']} {style_config['font_size']}pt)")
-
-    text_blocks = []
-    for screen in screens:
-        blocks = create_text_effect_blocks(screen, style_config, project_width, project_height, project_fps)
-        text_blocks.extend(blocks)
+    screens, blocks_a, blocks_b = layout_subtitles(words, args, project)
 
     # 5. Inserir no VPD
     print(f"\n--- Modificando VPD ---")
-    if args.tracks == 2:
-        blocks_a = [b for i, b in enumerate(text_blocks) if i % 2 == 0]
-        blocks_b = [b for i, b in enumerate(text_blocks) if i % 2 == 1]
-        print(f"  Blocos: {len(text_blocks)} (A: {len(blocks_a)}, B: {len(blocks_b)})")
-        modify_vpd_subtitles(vpd_path, blocks_a, blocks_b)
-    else:
-        print(f"  Blocos: {len(text_blocks)}")
-        modify_vpd_subtitles(vpd_path, text_blocks, [])
+    modify_vpd_subtitles(project, blocks_a, blocks_b, save=save)
 
     print(f"\nConcluido!")
+    return {
+        "words": words,
+        "screens": screens,
+        "blocks_a": blocks_a,
+        "blocks_b": blocks_b,
+    }
+
+
+def main():
+    args = build_parser().parse_args()
+    trace_file = (args.trace_out or trace.trace_path(os.path.abspath(args.vpd))) if args.trace else None
+    with trace.session(trace_file):
+        run(args)
 
 
 if __name__ == "__main__":
@@ -10,22 +10,39 @@ Uso:
     python3 vpd-enhance-audio.py projeto.vpd
     python3 vpd-enhance-audio.py projeto.vpd -f m4a --fade 10
     python3 vpd-enhance-audio.py projeto.vpd -o saida.wav
+    python3 vpd-enhance-audio.py projeto.vpd --max-temp-bytes 20G
 """
 
 import argparse
 import hashlib
 import json
 import os
+import re
 import shutil
 import subprocess
 import sys
 import tempfile
+import threading
 import uuid
+from collections import deque
+
+# Biblioteca compartilhada (pacote vpd/ na raiz do repositorio)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vpd import IntervalIndex, Project, RenderedState, to_local_path, trace, usage  # noqa: E402
+from vpd.trace import format_bytes  # noqa: E402
 
 
 SAMPLE_RATE = 44100
 CHANNELS = 2
 DEFAULT_FADE_MS = 5
+# WAV 16 bits dos arquivos temporários do render
+WAV_BYTES_PER_S = SAMPLE_RATE * CHANNELS * 2
+# Formato que o Whisper consome internamente (float32 mono 16 kHz)
+WHISPER_SAMPLE_RATE = 16000
+# Track criada por este script (não entra na renderização nem no diff)
+ENHANCED_TRACK_TITLE = "Audio Enhanced"
+# Tracks cujos clips compõem o áudio renderizado
+RENDER_TRACK_TYPES = ("MainVideoTrack", "AudioTrack")
 
 
 def find_binary(name):
@@ -57,16 +74,65 @@ def wsl_to_win(path):
     return path
 
 
-def run_ffmpeg(args, description=""):
-    """Executa um comando ffmpeg e retorna o resultado."""
+def win_to_wsl(path):
+    """Inverso de wsl_to_win: X:/... → /mnt/x/... (só com ffmpeg .exe)."""
+    if USE_WIN_PATHS and re.match(r"^[A-Za-z]:/", path):
+        return f"/mnt/{path[0].lower()}{path[2:]}"
+    return path
+
+
+class WhisperPcm:
+    """PCM float32 mono 16 kHz para o Whisper, gerado como saída extra de um comando ffmpeg.
+
+    Com path, o PCM vai para o arquivo; sem path, sai pelo stdout e fica em .data (bytes).
+    .ok indica se algum comando já gerou o PCM.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.data = None
+        self.ok = False
+
+    def output_args(self, stream=None):
+        """Argumentos da saída extra; stream é o rótulo do filtro de origem (ex.: "[pcm]")."""
+        args = ["-map", stream] if stream else []
+        return args + ["-vn", "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE), "-f", "f32le",
+                       wsl_to_win(self.path) if self.path else "pipe:1"]
+
+
+def run_ffmpeg(args, description="", pcm=None, pcm_stream=None):
+    """Executa um comando ffmpeg e retorna o resultado.
+
+    Com pcm (WhisperPcm), o mesmo comando grava também o PCM do Whisper, sem
+    decodificar/reamostrar o áudio de novo depois; pcm_stream escolhe a saída do
+    filtro que vai para ele (quando o comando usa -filter_complex).
+    """
+    # Último argumento é o arquivo de saída (já convertido para o ffmpeg.exe; aqui o caminho local)
+    outputs = [win_to_wsl(args[-1])]
+    if pcm is not None:
+        args = args + pcm.output_args(pcm_stream)
+        if pcm.path:
+            outputs.append(pcm.path)
     cmd = [FFMPEG, "-hide_banner", "-loglevel", "error", "-y"] + args
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    with trace.span("ffmpeg", "subprocess", desc=description) as sp:
+        # PCM pelo stdout: saída binária
+        result = usage.run(cmd, capture_output=True)
+        if trace.enabled():
+            written = sum(os.path.getsize(p) for p in outputs if os.path.isfile(p))
+            sp.set(bytes_out=written + (len(result.stdout) if pcm is not None and not pcm.path else 0))
+    # Contabiliza as saídas na pasta temporária (levanta TempSpaceError acima de --max-temp-bytes)
+    usage.wrote(*outputs)
     if result.returncode != 0:
-        print(f"  ERRO ffmpeg ({description}): {result.stderr.strip()}", file=sys.stderr)
+        print(f"  ERRO ffmpeg ({description}): {result.stderr.decode(errors='replace').strip()}", file=sys.stderr)
         return False
+    if pcm is not None:
+        pcm.ok = True
+        if not pcm.path:
+            pcm.data = result.stdout
     return True
 
 
+@trace.traced("ffprobe", "subprocess")
 def get_audio_duration(path):
     """Retorna a duração de um arquivo de áudio em segundos."""
     cmd = [
@@ -75,7 +141,7 @@ def get_audio_duration(path):
         "-of", "default=noprint_wrappers=1:nokey=1",
         wsl_to_win(path)
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = usage.run(cmd, capture_output=True, text=True)
     if result.returncode != 0:
         return None
     try:
@@ -84,86 +150,30 @@ def get_audio_duration(path):
         return None
 
 
-def parse_vpd(vpd_path):
-    """Lê e parseia o arquivo .vpd, retornando as estruturas necessárias."""
-    with open(vpd_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def parse_vpd(project):
+    """Extrai do projeto (já parseado) as estruturas usadas na renderização."""
+    video_track = project.track("MainVideoTrack")
+    video_clips = [c.info for c in video_track.clips] if video_track else []
+    audio_clips = [
+        c.info for track in project.tracks_of("AudioTrack")
+        if track.title != ENHANCED_TRACK_TITLE for c in track.clips
+    ]
+    return project.projinfo, video_clips, audio_clips, project.resources, project.context_ms
 
-    projinfo = data.get("projinfo", {})
-    timeline = data["timeline"]
-    tracks = timeline["subitems"]
 
-    # Identificar tracks por tipo
-    video_track = None
-    audio_tracks = []
-    for track in tracks:
-        if track["type"] == "MainVideoTrack":
-            video_track = track
-        elif track["type"] == "AudioTrack":
-            audio_tracks.append(track)
-
-    # Extrair clips do videotrack
-    video_clips = []
-    if video_track and "subitems" in video_track:
-        for block in video_track["subitems"]:
-            if block["type"] == "MediaFileBlock":
-                video_clips.append(extract_clip_info(block))
-
-    # Extrair clips dos audiotracks
-    audio_clips = []
-    for atrack in audio_tracks:
-        if "subitems" in atrack:
-            for block in atrack["subitems"]:
-                if block["type"] == "MediaFileBlock":
-                    audio_clips.append(extract_clip_info(block))
-
-    # Construir mapa de recursos (resid → path)
-    resources = {}
-    for listkey in ["videolist", "audiolist", "imagelist"]:
-        reslist = data.get(listkey, {})
-        for item in reslist.get("subitems", []):
-            if "uuid" in item and "path" in item:
-                resources[item["uuid"]] = {
-                    "path": item["path"],
-                    "duration": item.get("duration", 0)
-                }
-
-    # Timeline context (duração total em ms)
-    context_ms = timeline.get("context", 0)
-
-    return projinfo, video_clips, audio_clips, resources, context_ms
-
-
-def extract_clip_info(block):
-    """Extrai informações de timing de um MediaFileBlock."""
-    attr = block.get("attribute", {})
-    speed_attr = attr.get("SpeedAttribute", {})
-    speed_data = speed_attr.get("Speed", {}).get("baseData", {})
-    audio_attr = attr.get("AudioAttribute", {})
-
-    file_cutted_start = speed_data.get("fileCuttedStart", 0)
-    file_cutted_duration = speed_data.get("fileCuttedDuration", 0)
-    handled_cutted_duration = speed_data.get("handledCuttedDuration", 0)
-
-    # Speed factor
-    if handled_cutted_duration > 0 and file_cutted_duration > 0:
-        speed_factor = file_cutted_duration / handled_cutted_duration
-    else:
-        speed_factor = 1.0
+def load_timeline(project):
+    """Clips do VideoTrack e AudioTracks ordenados por tstart, recursos e duração total (ms)."""
+    projinfo, video_clips, audio_clips, resources, context_ms = parse_vpd(project)
 
-    return {
-        "title": block.get("title", ""),
-        "uuid": block.get("uuid", ""),
-        "tstart_ms": block.get("tstart", 0),
-        "tduration_ms": block.get("tduration", 0),
-        "resid": block.get("resid", ""),
-        "file_cutted_start": file_cutted_start,
-        "file_cutted_duration": file_cutted_duration,
-        "handled_cutted_duration": handled_cutted_duration,
-        "speed_factor": speed_factor,
-        "mute": audio_attr.get("mute", False),
-        "audio_speed_rate": speed_attr.get("audioSpeedRate", False),
-    }
+    # Ordenar clips por tstart
+    video_clips.sort(key=lambda c: c["tstart_ms"])
+    audio_clips.sort(key=lambda c: c["tstart_ms"])
+
+    total_duration_ms = context_ms
+    if total_duration_ms <= 0 and video_clips:
+        last = video_clips[-1]
+        total_duration_ms = last["tstart_ms"] + last["tduration_ms"]
+    return video_clips, audio_clips, resources, total_duration_ms
 
 
 def resolve_resource_path(resid, resources, vpd_dir):
@@ -171,15 +181,7 @@ def resolve_resource_path(resid, resources, vpd_dir):
     res = resources.get(resid)
     if not res:
         return None
-    path = res["path"]
-    # Converter caminho Windows para WSL
-    if len(path) >= 2 and path[1] == ":":
-        drive = path[0].lower()
-        path = f"/mnt/{drive}" + path[2:].replace("\\", "/")
-    elif not os.path.isabs(path):
-        # Caminho relativo — relativo ao diretório do projeto
-        path = os.path.join(vpd_dir, path)
-    return path
+    return to_local_path(res.path, vpd_dir)
 
 
 def extract_source_audio(source_path, temp_dir, resid):
@@ -189,13 +191,52 @@ def extract_source_audio(source_path, temp_dir, resid):
         return out_path  # Já extraído (dedup)
 
     print(f"  Extraindo áudio de: {os.path.basename(source_path)}")
+    # Grava em .part e renomeia: um arquivo interrompido no meio não passa pelo dedup acima
+    part_path = out_path + ".part"
     ok = run_ffmpeg([
         "-i", wsl_to_win(source_path),
         "-vn", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS),
-        "-f", "wav", wsl_to_win(out_path)
+        "-f", "wav", wsl_to_win(part_path)
     ], f"extrair áudio de {os.path.basename(source_path)}")
+    if not ok:
+        return None
+    os.replace(part_path, out_path)
+    usage.wrote(part_path, out_path)
+    return out_path
 
-    return out_path if ok else None
+
+class SourceDecodeCache:
+    """Áudio extraído das fontes, compartilhado entre projetos (vpd-pipeline em lote).
+
+    A chave é o arquivo fonte (caminho, mtime, tamanho): projetos que usam a mesma
+    gravação extraem o áudio uma vez só. Cada fonte é extraída por uma única
+    thread; as outras que pedem a mesma fonte esperam o resultado.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._paths = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source_path):
+        st = os.stat(source_path)
+        key = (os.path.abspath(source_path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key in self._paths:
+                with self._lock:
+                    self.hits += 1
+                return self._paths[key]
+            name = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+            extracted = extract_source_audio(source_path, self.cache_dir, name)
+            self._paths[key] = extracted
+            with self._lock:
+                self.misses += 1
+            return extracted
 
 
 def generate_silence(duration_s, temp_dir, label):
@@ -286,12 +327,13 @@ def process_clip(clip, source_wav, temp_dir, clip_index, fade_ms):
             ], f"ajuste duração clip {clip_index}")
             if ok:
                 os.replace(adjusted_path, out_path)
+                usage.wrote(adjusted_path, out_path)
 
     return out_path
 
 
-def concat_segments(segment_paths, temp_dir, output_name):
-    """Concatena segmentos de áudio usando ffmpeg concat demuxer."""
+def concat_segments(segment_paths, temp_dir, output_name, pcm=None):
+    """Concatena segmentos de áudio usando ffmpeg concat demuxer (com pcm, gera também o PCM do Whisper)."""
     concat_list = os.path.join(temp_dir, f"{output_name}_list.txt")
     out_path = os.path.join(temp_dir, f"{output_name}.wav")
 
@@ -300,18 +342,20 @@ def concat_segments(segment_paths, temp_dir, output_name):
             win_seg = wsl_to_win(seg)
             escaped = win_seg.replace("'", "'\\''")
             f.write(f"file '{escaped}'\n")
+    usage.wrote(concat_list)
 
     ok = run_ffmpeg([
         "-f", "concat", "-safe", "0",
         "-i", wsl_to_win(concat_list),
         "-c", "copy",
         wsl_to_win(out_path)
-    ], f"concatenar {output_name}")
+    ], f"concatenar {output_name}", pcm=pcm)
 
     return out_path if ok else None
 
 
-def build_audio_track(audio_clips, resources, vpd_dir, temp_dir, total_duration_s, fade_ms):
+def build_audio_track(audio_clips, resources, vpd_dir, temp_dir, total_duration_s, fade_ms,
+                      decode_cache=None):
     """Constrói o áudio do AudioTrack posicionando clips nas posições corretas."""
     if not audio_clips:
         return None
@@ -325,7 +369,10 @@ def build_audio_track(audio_clips, resources, vpd_dir, temp_dir, total_duration_
         if resid not in source_cache:
             src_path = resolve_resource_path(resid, resources, vpd_dir)
             if src_path and os.path.exists(src_path):
-                extracted = extract_source_audio(src_path, temp_dir, resid)
+                if decode_cache is not None:
+                    extracted = decode_cache.get(src_path)
+                else:
+                    extracted = extract_source_audio(src_path, temp_dir, resid)
                 source_cache[resid] = extracted
 
     # Processar cada clip
@@ -375,18 +422,19 @@ def build_audio_track(audio_clips, resources, vpd_dir, temp_dir, total_duration_
     return current_base
 
 
-def mix_tracks(videotrack_path, audiotrack_path, temp_dir):
-    """Mixa o áudio do videotrack com o audiotrack."""
+def mix_tracks(videotrack_path, audiotrack_path, temp_dir, pcm=None):
+    """Mixa o áudio do videotrack com o audiotrack (com pcm, gera também o PCM do Whisper)."""
     out_path = os.path.join(temp_dir, "mixed_final.wav")
 
+    mix = "[0:a][1:a]amix=inputs=2:duration=first:normalize=0"
     ok = run_ffmpeg([
         "-i", wsl_to_win(videotrack_path),
         "-i", wsl_to_win(audiotrack_path),
-        "-filter_complex",
-        "[0:a][1:a]amix=inputs=2:duration=first:normalize=0",
+        "-filter_complex", mix + (",asplit=2[mix][pcm]" if pcm is not None else "[mix]"),
+        "-map", "[mix]",
         "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS),
         "-f", "wav", wsl_to_win(out_path)
-    ], "mixagem final")
+    ], "mixagem final", pcm=pcm, pcm_stream="[pcm]")
 
     return out_path if ok else None
 
@@ -413,6 +461,36 @@ def convert_format(wav_path, output_path, fmt):
         return False
 
 
+def render_whisper_pcm(audio_path, pcm_path=None):
+    """Gera PCM float32 mono 16 kHz (f32le cru) para o Whisper a partir de um áudio pronto.
+
+    Para quando o PCM não pode sair da mixagem (WhisperPcm no render_clean_audio):
+    áudio enhanced do Adobe ou áudio limpo reaproveitado.
+    O arquivo pode ser mapeado direto em memória pelo vpd-add-subtitles (--pcm).
+    Sem pcm_path, o PCM sai pelo stdout do ffmpeg e é retornado como bytes.
+    """
+    if pcm_path is None:
+        cmd = [FFMPEG, "-hide_banner", "-loglevel", "error",
+               "-i", wsl_to_win(audio_path),
+               "-vn", "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE), "-f", "f32le", "-"]
+        with trace.span("ffmpeg", "subprocess", desc="PCM 16 kHz para o Whisper (stdout)") as sp:
+            result = usage.run(cmd, capture_output=True)
+            sp.set(bytes_out=len(result.stdout))
+        if result.returncode != 0:
+            print(f"  ERRO ffmpeg (PCM 16 kHz para o Whisper): {result.stderr.decode(errors='replace').strip()}",
+                  file=sys.stderr)
+            return None
+        return result.stdout
+
+    ok = run_ffmpeg([
+        "-i", wsl_to_win(audio_path),
+        "-vn", "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE),
+        "-f", "f32le", wsl_to_win(pcm_path)
+    ], "PCM 16 kHz para o Whisper")
+    return pcm_path if ok else None
+
+
+@trace.traced("adobe-enhance (node)", "subprocess")
 def enhance_audio(input_path, output_path):
     """Envia áudio ao Adobe Podcast Enhance via Playwright e baixa o resultado."""
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -436,7 +514,7 @@ def enhance_audio(input_path, output_path):
         node_modules_dir = os.path.join(script_dir, "..", "playwright", "node_modules")
         env = os.environ.copy()
         env["NODE_PATH"] = os.path.abspath(node_modules_dir)
-        proc = subprocess.run(
+        proc = usage.run(
             [node_bin, enhance_script, "--input", input_path, "--output", output_path],
             stdout=subprocess.PIPE, stderr=None,  # stderr herda do pai (exibe no terminal)
             text=True,
@@ -475,10 +553,134 @@ def enhance_audio(input_path, output_path):
     return False
 
 
-def modify_vpd(vpd_path, clean_audio_path, total_duration_ms):
-    """Modifica o VPD: adiciona áudio limpo em novo AudioTrack e muta os demais."""
-    with open(vpd_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def estimate_temp_bytes(video_clips, audio_clips, resources, total_duration_s, decode_cache=None):
+    """Estimativa do pico de temp_dir no render (nada é apagado antes do fim).
+
+    Fontes extraídas (fora do decode_cache) + um segmento por clip + VideoTrack
+    concatenado + base de silêncio e uma mixagem completa por clip do AudioTrack
+    + mixagem final, tudo em WAV 16 bits.
+    """
+    seconds = sum(c["tduration_ms"] for c in video_clips + audio_clips) / 1000.0
+    full_length = 1 + (len(audio_clips) + 2 if audio_clips else 0)
+    seconds += total_duration_s * full_length
+    if decode_cache is None:
+        resids = {c["resid"] for c in video_clips + audio_clips}
+        seconds += sum(resources[r].duration or 0 for r in resids if r in resources)
+    return int(seconds * WAV_BYTES_PER_S)
+
+
+def render_clean_audio(video_clips, audio_clips, resources, vpd_dir, temp_dir,
+                       total_duration_s, fade_ms, output_path, fmt, decode_cache=None, pcm=None):
+    """Passos 2-6: renderiza o áudio limpo da timeline em output_path.
+
+    Retorna o WAV da mixagem final (dentro de temp_dir), antes da conversão.
+    Com decode_cache (SourceDecodeCache), o áudio das fontes vem do cache compartilhado.
+    Com pcm (WhisperPcm), o PCM do Whisper sai como segunda saída do comando que gera
+    a mixagem final (pcm.ok fica False se esse comando falhar ou não rodar).
+    Com temp_dir registrado em usage.temp_dir(max_bytes=...), falha antes de
+    começar se a estimativa de disco passar do limite (usage.TempSpaceError).
+    """
+    estimate = estimate_temp_bytes(video_clips, audio_clips, resources, total_duration_s, decode_cache)
+    print(f"\nDisco temporário estimado: {format_bytes(estimate)}")
+    usage.check_estimate(temp_dir, estimate)
+
+    # Passo 2: Extrair áudio das fontes
+    print(f"\n--- Extraindo áudio das fontes ---")
+    source_cache = {}
+    for clip in video_clips:
+        resid = clip["resid"]
+        if resid not in source_cache:
+            src_path = resolve_resource_path(resid, resources, vpd_dir)
+            if src_path and os.path.exists(src_path):
+                if decode_cache is not None:
+                    extracted = decode_cache.get(src_path)
+                else:
+                    extracted = extract_source_audio(src_path, temp_dir, resid)
+                source_cache[resid] = extracted
+            else:
+                print(f"  AVISO: fonte não encontrada para resid={resid}: {src_path}")
+                source_cache[resid] = None
+
+    # Passo 3: Processar cada clip do VideoTrack
+    print(f"\n--- Processando {len(video_clips)} clips do VideoTrack ---")
+    segments = []
+    # Trechos da timeline sem nenhum clip (gap > 0.5ms), em ordem
+    video_index = IntervalIndex.from_clips(video_clips)
+    pending_gaps = deque(video_index.gaps(0.0, video_index.end, min_gap=0.5))
+
+    for i, clip in enumerate(video_clips):
+        # Gaps antes deste clip
+        while pending_gaps and pending_gaps[0][0] < clip["tstart_ms"]:
+            gap_start_ms, gap_end_ms = pending_gaps.popleft()
+            gap_s = (gap_end_ms - gap_start_ms) / 1000.0
+            print(f"  Gap: {gap_s:.3f}s de silêncio")
+            silence = generate_silence(gap_s, temp_dir, f"gap_{i:04d}")
+            if silence:
+                segments.append(silence)
+
+        # Processar o clip
+        source_wav = source_cache.get(clip["resid"])
+        if not source_wav:
+            dur_s = clip["tduration_ms"] / 1000.0
+            print(f"  Clip {i:3d}: fonte indisponível, inserindo silêncio ({dur_s:.3f}s)")
+            silence = generate_silence(dur_s, temp_dir, f"nosrc_{i:04d}")
+            if silence:
+                segments.append(silence)
+        else:
+            seg = process_clip(clip, source_wav, temp_dir, i, fade_ms)
+            if seg:
+                segments.append(seg)
+            else:
+                dur_s = clip["tduration_ms"] / 1000.0
+                silence = generate_silence(dur_s, temp_dir, f"fail_{i:04d}")
+                if silence:
+                    segments.append(silence)
+
+    if not segments:
+        print("ERRO: nenhum segmento processado!", file=sys.stderr)
+        sys.exit(1)
+
+    # Passo 4: Concatenar segmentos do VideoTrack
+    print(f"\n--- Concatenando {len(segments)} segmentos ---")
+    videotrack_wav = concat_segments(segments, temp_dir, "videotrack", pcm=None if audio_clips else pcm)
+    if not videotrack_wav:
+        print("ERRO: falha na concatenação!", file=sys.stderr)
+        sys.exit(1)
+
+    # Passo 5: Processar AudioTrack e mixar
+    final_wav = videotrack_wav
+    if audio_clips:
+        audiotrack_wav = build_audio_track(
+            audio_clips, resources, vpd_dir, temp_dir,
+            total_duration_s, fade_ms, decode_cache
+        )
+        if audiotrack_wav:
+            print(f"\n--- Mixando VideoTrack + AudioTrack ---")
+            mixed = mix_tracks(videotrack_wav, audiotrack_wav, temp_dir, pcm=pcm)
+            if mixed:
+                final_wav = mixed
+            else:
+                print("  AVISO: falha na mixagem, usando só VideoTrack")
+
+    # Passo 6: Converter formato e salvar
+    print(f"\n--- Salvando resultado ---")
+    ok = convert_format(final_wav, output_path, fmt)
+    if not ok:
+        print("ERRO: falha ao salvar arquivo final!", file=sys.stderr)
+        sys.exit(1)
+
+    return final_wav
+
+
+def modify_vpd(project, clean_audio_path, total_duration_ms, save=True):
+    """Modifica o VPD: adiciona áudio limpo em novo AudioTrack e muta os demais.
+
+    Idempotente: se a track "Audio Enhanced" já existe, ela é reaproveitada
+    (e não muda se já aponta para o mesmo arquivo com a mesma duração).
+    Com save=False só altera o projeto em memória (o vpd-pipeline grava uma vez no fim).
+    """
+    vpd_path = project.path
+    data = project.data
 
     timeline = data["timeline"]
     tracks = timeline["subitems"]
@@ -490,32 +692,46 @@ def modify_vpd(vpd_path, clean_audio_path, total_duration_ms):
     res_uuid = hashlib.md5(clean_filename.encode()).hexdigest().upper()
     block_uuid = "{" + str(uuid.uuid4()).upper() + "}"
 
+    # Track criada em execução anterior (reaproveitada; duplicadas são removidas)
+    enhanced_tracks = [t for t in tracks if t["type"] == "AudioTrack" and t.get("title") == ENHANCED_TRACK_TITLE]
+    enhanced_track = enhanced_tracks[0] if enhanced_tracks else None
+    if len(enhanced_tracks) > 1:
+        timeline["subitems"] = tracks = [t for t in tracks if not any(t is d for d in enhanced_tracks[1:])]
+        print(f"  AudioTracks '{ENHANCED_TRACK_TITLE}' duplicadas removidas: {len(enhanced_tracks) - 1}")
+
     # --- 1. Mutar MainVideoTrack (track-level) ---
     for track in tracks:
         if track["type"] == "MainVideoTrack":
-            track["mute"] = True
+            if not track.get("mute"):
+                track["mute"] = True
             print(f"  MainVideoTrack: mutada")
 
     # --- 2. Mutar AudioTracks existentes (track-level) ---
     for track in tracks:
-        if track["type"] == "AudioTrack":
-            track["mute"] = True
+        if track["type"] == "AudioTrack" and track is not enhanced_track:
+            if not track.get("mute"):
+                track["mute"] = True
             count = len(track.get("subitems", []))
             print(f"  AudioTrack existente: mutada ({count} clips)")
 
-    # --- 3. Adicionar recurso à audiolist ---
+    # --- 3. Adicionar recurso à audiolist (uma vez por arquivo) ---
     audiolist = data.get("audiolist", {"title": "Music", "type": "ResourceLists", "status": 0})
     if "subitems" not in audiolist:
         audiolist["subitems"] = []
-    audiolist["subitems"].append({
-        "title": clean_filename.rsplit(".", 1)[0],
-        "type": "MediaFileResource",
-        "status": 0,
-        "uuid": res_uuid,
-        "path": clean_filename,
-        "duration": duration_s
-    })
-    data["audiolist"] = audiolist
+    resource = next((r for r in audiolist["subitems"] if r.get("uuid") == res_uuid), None)
+    if resource is None:
+        audiolist["subitems"].append({
+            "title": clean_filename.rsplit(".", 1)[0],
+            "type": "MediaFileResource",
+            "status": 0,
+            "uuid": res_uuid,
+            "path": clean_filename,
+            "duration": duration_s
+        })
+    elif resource.get("duration") != duration_s:
+        resource["duration"] = duration_s
+    if "audiolist" not in data:
+        data["audiolist"] = audiolist
 
     # --- 4. Criar novo AudioTrack com o áudio limpo ---
     new_audio_block = {
@@ -569,7 +785,7 @@ def modify_vpd(vpd_path, clean_audio_path, total_duration_ms):
     }
 
     new_audio_track = {
-        "title": "Audio Enhanced",
+        "title": ENHANCED_TRACK_TITLE,
         "type": "AudioTrack",
         "status": 0,
         "subitems": [new_audio_block],
@@ -580,13 +796,29 @@ def modify_vpd(vpd_path, clean_audio_path, total_duration_ms):
         "mute": False
     }
 
-    # Inserir logo após o último AudioTrack existente
-    insert_idx = len(tracks)
-    for i, track in enumerate(tracks):
-        if track["type"] == "AudioTrack":
-            insert_idx = i + 1
-    tracks.insert(insert_idx, new_audio_track)
-    print(f"  Novo AudioTrack inserido com: {clean_filename}")
+    if enhanced_track is not None:
+        current = enhanced_track.get("subitems", [])
+        up_to_date = (
+            len(current) == 1
+            and current[0].get("resid") == res_uuid
+            and abs(current[0].get("tduration", 0) - total_duration_ms) < 0.5
+        )
+        if up_to_date:
+            print(f"  AudioTrack '{ENHANCED_TRACK_TITLE}' já aponta para: {clean_filename}")
+        else:
+            enhanced_track["subitems"] = [new_audio_block]
+            enhanced_track["context"] = total_duration_ms
+            print(f"  AudioTrack '{ENHANCED_TRACK_TITLE}' atualizado com: {clean_filename}")
+        if enhanced_track.get("mute"):
+            enhanced_track["mute"] = False
+    else:
+        # Inserir logo após o último AudioTrack existente
+        insert_idx = len(tracks)
+        for i, track in enumerate(tracks):
+            if track["type"] == "AudioTrack":
+                insert_idx = i + 1
+        tracks.insert(insert_idx, new_audio_track)
+        print(f"  Novo AudioTrack inserido com: {clean_filename}")
 
     # --- 5. Salvar (backup do original) ---
     backup_path = vpd_path + ".bak"
@@ -594,13 +826,16 @@ def modify_vpd(vpd_path, clean_audio_path, total_duration_ms):
         shutil.copy2(vpd_path, backup_path)
         print(f"  Backup: {os.path.basename(backup_path)}")
 
-    with open(vpd_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    if not save:
+        return
+
+    # Só as tracks alteradas são reserializadas; o resto é copiado do original
+    project.save()
 
     print(f"  VPD salvo: {os.path.basename(vpd_path)}")
 
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(
         description="Gera áudio limpo (sem cliques nos cortes) a partir de projetos VideoProc Vlogger (.vpd)"
     )
@@ -612,10 +847,29 @@ def main():
     parser.add_argument("-o", "--output", help="Caminho do arquivo de saída (padrão: mesmo diretório do .vpd)")
     parser.add_argument("--skip-enhance", action="store_true",
                         help="Skip Adobe Enhance, use clean audio directly in VPD")
-    args = parser.parse_args()
-
+    parser.add_argument("--if-changed", action="store_true",
+                        help="Reaproveita o áudio limpo existente se os clips de áudio não mudaram desde que ele foi renderizado")
+    parser.add_argument("--pcm-out",
+                        help="Grava também o áudio final como PCM float32 mono 16 kHz (entrada direta do Whisper)")
+    parser.add_argument("--trace", action="store_true",
+                        help="Mede ffmpeg/ffprobe/Adobe/VPD e grava um Chrome trace + resumo de tempos")
+    parser.add_argument("--trace-out", help="Arquivo do trace (padrão: <projeto>.vpd.trace.json)")
+    parser.add_argument("--max-temp-bytes", type=usage.parse_size,
+                        help="Limite da pasta temporária do render (ex.: 500M, 20G); falha antes de encher o disco")
+    return parser
+
+
+def run(args, project=None, save=True, pcm_in_memory=False):
+    """Executa o enhance para os argumentos de build_parser().
+
+    `project` permite reaproveitar um Project já carregado (vpd-pipeline); com
+    save=False o VPD só é alterado em memória. Com pcm_in_memory=True o PCM do
+    Whisper é devolvido como bytes em vez de gravado em --pcm-out.
+
+    Retorna dict com audio_path, total_duration_ms, video_clips, audio_clips e pcm.
+    """
     vpd_path = os.path.abspath(args.vpd)
-    if not os.path.exists(vpd_path):
+    if project is None and not os.path.exists(vpd_path):
         print(f"Arquivo não encontrado: {vpd_path}", file=sys.stderr)
         sys.exit(1)
 
@@ -641,16 +895,9 @@ def main():
 
     # Passo 1: Parse do VPD
     print(f"\n--- Parsing do VPD ---")
-    projinfo, video_clips, audio_clips, resources, context_ms = parse_vpd(vpd_path)
-
-    # Ordenar clips por tstart
-    video_clips.sort(key=lambda c: c["tstart_ms"])
-    audio_clips.sort(key=lambda c: c["tstart_ms"])
-
-    total_duration_ms = context_ms
-    if total_duration_ms <= 0 and video_clips:
-        last = video_clips[-1]
-        total_duration_ms = last["tstart_ms"] + last["tduration_ms"]
+    if project is None:
+        project = Project.load(vpd_path)
+    video_clips, audio_clips, resources, total_duration_ms = load_timeline(project)
     total_duration_s = total_duration_ms / 1000.0
 
     # Estatísticas
@@ -661,88 +908,44 @@ def main():
     print(f"Duração total: {total_duration_s:.3f}s ({total_duration_ms:.2f}ms)")
     print(f"Recursos: {len(resources)} arquivos")
 
-    try:
-        # Passo 2: Extrair áudio das fontes
-        print(f"\n--- Extraindo áudio das fontes ---")
-        source_cache = {}
-        for clip in video_clips:
-            resid = clip["resid"]
-            if resid not in source_cache:
-                src_path = resolve_resource_path(resid, resources, vpd_dir)
-                if src_path and os.path.exists(src_path):
-                    extracted = extract_source_audio(src_path, temp_dir, resid)
-                    source_cache[resid] = extracted
-                else:
-                    print(f"  AVISO: fonte não encontrada para resid={resid}: {src_path}")
-                    source_cache[resid] = None
-
-        # Passo 3: Processar cada clip do VideoTrack
-        print(f"\n--- Processando {len(video_clips)} clips do VideoTrack ---")
-        segments = []
-        current_pos_ms = 0.0
-
-        for i, clip in enumerate(video_clips):
-            # Verificar gap antes deste clip
-            gap_ms = clip["tstart_ms"] - current_pos_ms
-            if gap_ms > 0.5:  # Gap > 0.5ms
-                gap_s = gap_ms / 1000.0
-                print(f"  Gap: {gap_s:.3f}s de silêncio")
-                silence = generate_silence(gap_s, temp_dir, f"gap_{i:04d}")
-                if silence:
-                    segments.append(silence)
-
-            # Processar o clip
-            source_wav = source_cache.get(clip["resid"])
-            if not source_wav:
-                dur_s = clip["tduration_ms"] / 1000.0
-                print(f"  Clip {i:3d}: fonte indisponível, inserindo silêncio ({dur_s:.3f}s)")
-                silence = generate_silence(dur_s, temp_dir, f"nosrc_{i:04d}")
-                if silence:
-                    segments.append(silence)
-            else:
-                seg = process_clip(clip, source_wav, temp_dir, i, args.fade)
-                if seg:
-                    segments.append(seg)
-                else:
-                    dur_s = clip["tduration_ms"] / 1000.0
-                    silence = generate_silence(dur_s, temp_dir, f"fail_{i:04d}")
-                    if silence:
-                        segments.append(silence)
-
-            current_pos_ms = clip["tstart_ms"] + clip["tduration_ms"]
-
-        if not segments:
-            print("ERRO: nenhum segmento processado!", file=sys.stderr)
-            sys.exit(1)
-
-        # Passo 4: Concatenar segmentos do VideoTrack
-        print(f"\n--- Concatenando {len(segments)} segmentos ---")
-        videotrack_wav = concat_segments(segments, temp_dir, "videotrack")
-        if not videotrack_wav:
-            print("ERRO: falha na concatenação!", file=sys.stderr)
-            sys.exit(1)
-
-        # Passo 5: Processar AudioTrack e mixar
-        final_wav = videotrack_wav
-        if audio_clips:
-            audiotrack_wav = build_audio_track(
-                audio_clips, resources, vpd_dir, temp_dir,
-                total_duration_s, args.fade
-            )
-            if audiotrack_wav:
-                print(f"\n--- Mixando VideoTrack + AudioTrack ---")
-                mixed = mix_tracks(videotrack_wav, audiotrack_wav, temp_dir)
-                if mixed:
-                    final_wav = mixed
-                else:
-                    print("  AVISO: falha na mixagem, usando só VideoTrack")
+    # Diff estrutural contra o estado que gerou o áudio existente (<saída>.render.json)
+    render_params = {"fade_ms": args.fade, "duration_ms": total_duration_ms}
+    render_state = RenderedState.from_project(project, RENDER_TRACK_TYPES, (ENHANCED_TRACK_TITLE,), render_params)
+    audio_changed = True
+    rendered = RenderedState.load(output_path)
+    if rendered is not None:
+        diff = rendered.changes(project, render_params)
+        print(f"\n--- Alterações desde o último render ---")
+        if diff is None:
+            print(f"  Parâmetros do render mudaram (fade ou duração)")
+        else:
+            audio_changed = diff.clip_changes(RENDER_TRACK_TYPES, exclude_titles=(ENHANCED_TRACK_TITLE,))
+            for track in diff.select(RENDER_TRACK_TYPES, exclude_titles=(ENHANCED_TRACK_TITLE,)):
+                if track.added or track.removed or track.changed:
+                    print(f"  {track.type} {track.title!r}: {len(track.added)} adicionados, "
+                          f"{len(track.removed)} removidos, {len(track.changed)} alterados")
+            if not audio_changed:
+                print(f"  Clips de áudio inalterados")
+    reuse_output = args.if_changed and not audio_changed
+    # PCM do Whisper: sem Adobe Enhance, sai do mesmo comando ffmpeg que gera a mixagem final
+    whisper_pcm = None
+    if args.pcm_out or pcm_in_memory:
+        whisper_pcm = WhisperPcm(os.path.abspath(args.pcm_out) if args.pcm_out else None)
+    # Recursos por etapa (pico de RSS, disco temporário, subprocessos), no resumo final
+    usages = {}
 
-        # Passo 6: Converter formato e salvar
-        print(f"\n--- Salvando resultado ---")
-        ok = convert_format(final_wav, output_path, args.format)
-        if not ok:
-            print("ERRO: falha ao salvar arquivo final!", file=sys.stderr)
-            sys.exit(1)
+    try:
+        # Passos 2-6: renderizar o áudio limpo (ou reaproveitar, com --if-changed)
+        if reuse_output:
+            print(f"\n--- Clips de áudio inalterados desde o último render: reutilizando {os.path.basename(output_path)} ---")
+        else:
+            with usage.measure("render") as usages["render"], usage.temp_dir(temp_dir, args.max_temp_bytes):
+                render_clean_audio(
+                    video_clips, audio_clips, resources, vpd_dir, temp_dir,
+                    total_duration_s, args.fade, output_path, args.format,
+                    pcm=whisper_pcm if args.skip_enhance else None
+                )
+            render_state.save(output_path)
 
         # Passo 6.5: Adobe Podcast Enhance (padrão)
         if args.skip_enhance:
@@ -753,9 +956,21 @@ def main():
             if os.path.exists(enhanced_path):
                 print(f"  Arquivo enhanced já existe: {os.path.basename(enhanced_path)}")
                 print(f"  Pulando enhance.")
+                # Sem sidecar (enhance manual, versão antiga): só dá para saber se o limpo foi refeito agora
+                enhanced_from = RenderedState.load(enhanced_path)
+                if enhanced_from is None:
+                    stale = not reuse_output
+                else:
+                    diff = enhanced_from.changes(project, render_params)
+                    stale = diff is None or diff.clip_changes(RENDER_TRACK_TYPES, exclude_titles=(ENHANCED_TRACK_TITLE,))
+                if stale:
+                    print(f"  AVISO: o arquivo enhanced é de um render anterior da timeline; apague-o para refazer")
                 ok = True
             else:
-                ok = enhance_audio(output_path, enhanced_path)
+                with usage.measure("enhance") as usages["enhance"]:
+                    ok = enhance_audio(output_path, enhanced_path)
+                if ok and os.path.exists(enhanced_path):
+                    render_state.save(enhanced_path)
             if ok and os.path.exists(enhanced_path):
                 vpd_audio_path = enhanced_path
             else:
@@ -766,9 +981,32 @@ def main():
                 print(f"  2. Rode novamente com --skip-enhance para usar o áudio clean", file=sys.stderr)
                 sys.exit(1)
 
+        # Passo 6.6: PCM 16 kHz mono para o Whisper (subproduto da mixagem final)
+        pcm = None
+        if whisper_pcm is not None:
+            print(f"\n--- PCM para o Whisper ---")
+            if whisper_pcm.ok:
+                print(f"  Gerado junto com a mixagem final")
+            else:
+                # Áudio enhanced ou reaproveitado (--if-changed): decodifica o arquivo pronto
+                with usage.measure("pcm") as usages["pcm"]:
+                    if whisper_pcm.path:
+                        whisper_pcm.ok = render_whisper_pcm(vpd_audio_path, whisper_pcm.path) is not None
+                    else:
+                        whisper_pcm.data = render_whisper_pcm(vpd_audio_path)
+                        whisper_pcm.ok = whisper_pcm.data is not None
+            if not whisper_pcm.ok:
+                print("  AVISO: falha ao gerar PCM, o Whisper vai decodificar o áudio", file=sys.stderr)
+            elif whisper_pcm.path:
+                print(f"  PCM: {args.pcm_out}")
+            else:
+                pcm = whisper_pcm.data
+                print(f"  PCM em memória: {len(pcm) / 4 / WHISPER_SAMPLE_RATE:.1f}s")
+
         # Passo 7: Modificar o VPD (inserir áudio limpo + mutar demais)
         print(f"\n--- Modificando VPD ---")
-        modify_vpd(vpd_path, vpd_audio_path, total_duration_ms)
+        with usage.measure("vpd") as usages["vpd"]:
+            modify_vpd(project, vpd_audio_path, total_duration_ms, save=save)
 
         # Passo 8: Verificação
         final_duration = get_audio_duration(vpd_audio_path)
@@ -785,12 +1023,33 @@ def main():
             print(f"Clips com speed:   {speed_count}")
         else:
             print(f"\nArquivo salvo: {vpd_audio_path}")
+        print(f"\nRecursos por etapa:")
+        print(usage.format_table(usages))
 
     finally:
         # Cleanup
         shutil.rmtree(temp_dir, ignore_errors=True)
 
     print("Concluído!")
+    return {
+        "audio_path": vpd_audio_path,
+        "total_duration_ms": total_duration_ms,
+        "video_clips": video_clips,
+        "audio_clips": audio_clips,
+        "pcm": pcm,
+    }
+
+
+def main():
+    args = build_parser().parse_args()
+    trace_file = (args.trace_out or trace.trace_path(os.path.abspath(args.vpd))) if args.trace else None
+    with trace.session(trace_file):
+        try:
+            run(args)
+        except usage.TempSpaceError as e:
+            print(f"ERRO: {e}", file=sys.stderr)
+            print(f"  Libere espaço ou aumente --max-temp-bytes", file=sys.stderr)
+            sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -2,60 +2,113 @@
 """
 vpd-pipeline — Pipeline completo: enhance audio + legendas
 
-Encadeia vpd-enhance-audio e vpd-add-subtitles em um unico comando.
+Encadeia vpd-enhance-audio e vpd-add-subtitles em um unico comando, no mesmo
+processo: os scripts sao importados como modulos, o VPD e lido uma vez, o PCM
+do Whisper e as palavras passam de uma etapa para a outra em memoria e o VPD e
+gravado uma unica vez no fim.
 Requer conda env pt-gpu ativado para o whisper (vpd-add-subtitles).
 
+Etapas (grafo estilo make, ver vpd/stages.py):
+    render -> enhance ---------------> verify -> layout -> write
+           -> transcribe (clean) ----^
+O Whisper transcreve o audio clean enquanto o Adobe Enhance roda; verify so
+retranscreve o audio enhanced se a confianca da transcricao ficar baixa.
+Cada etapa grava no manifest <projeto>.vpd.stages.json os hashes das entradas,
+parametros e saidas; numa nova execucao so rodam as etapas cujas entradas
+mudaram (ex.: editar so o estilo refaz layout e write, sem render/Adobe/Whisper).
+
 Uso:
     conda activate pt-gpu
     python3 vpd-pipeline.py projeto.vpd
+    python3 vpd-pipeline.py projeto.vpd --explain
+    python3 vpd-pipeline.py projeto.vpd --force transcribe
     python3 vpd-pipeline.py projeto.vpd --skip-enhance
     python3 vpd-pipeline.py projeto.vpd --skip-subtitles
+    python3 vpd-pipeline.py projeto.vpd --max-temp-bytes 20G
+
+Modo em lote (pasta, glob ou varios .vpd): os projetos rodam em paralelo e as
+etapas disputam lanes de recursos compartilhadas (vpd/stages.py Lanes):
+    cpu        render (ffmpeg)             --cpu-slots (default: numero de nucleos)
+    enhance    Adobe Enhance (navegador)   --enhance-slots (default: 2)
+    transcribe Whisper                     uma vaga por modelo (modelo carregado uma vez)
+O audio extraido das fontes e compartilhado entre projetos da mesma pasta. A
+saida de cada projeto vai para <projeto>-pipeline.log; no fim, um resumo com
+throughput e falhas.
+    python3 vpd-pipeline.py pasta/
+    python3 vpd-pipeline.py "pasta/*.vpd" --enhance-slots 3
+
+Fila de jobs (SQLite, vpd/jobs.py): --enqueue guarda projetos + opcoes na fila;
+workers de longa duracao (--worker, pode haver varios) executam os jobs e
+registram cada etapa. Um job interrompido (Ctrl+C, worker morto) volta para a
+fila e continua da ultima etapa concluida; o render mantem o audio ja extraido
+das fontes em vpd_clean_<projeto>/ ate terminar.
+    python3 vpd-pipeline.py pasta/ --enqueue --style my-style-1
+    python3 vpd-pipeline.py --worker
+    python3 vpd-pipeline.py --status
+    python3 vpd-pipeline.py --retry
 """
 
 import argparse
+import contextlib
+import contextvars
+import functools
+import glob
+import importlib.util
 import os
-import subprocess
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ENHANCE_SCRIPT = os.path.join(SCRIPT_DIR, "vpd-enhance-audio", "vpd-enhance-audio.py")
 SUBTITLES_SCRIPT = os.path.join(SCRIPT_DIR, "vpd-add-subtitles", "vpd-add-subtitles.py")
 
+# Biblioteca compartilhada (pacote vpd/ na raiz do repositorio)
+sys.path.insert(0, SCRIPT_DIR)
+from vpd import Project, detect_audio, trace, usage  # noqa: E402
+from vpd.jobs import JobQueue  # noqa: E402
+from vpd.stages import Lanes, Stage, StageGraph, hash_value, manifest_path  # noqa: E402
 
-def run_step(description, cmd):
-    """Executa um passo do pipeline, herdando stdin/stdout/stderr."""
-    print(f"\n{'=' * 60}")
-    print(f"  {description}")
-    print(f"{'=' * 60}\n")
+STAGE_NAMES = ("render", "enhance", "transcribe", "verify", "layout", "write")
+DEFAULT_MIN_CONFIDENCE = 0.6
+DEFAULT_ENHANCE_SLOTS = 2
 
-    result = subprocess.run(cmd)
-    if result.returncode != 0:
-        print(f"\nERRO: {description} falhou (exit {result.returncode})", file=sys.stderr)
-        sys.exit(result.returncode)
+# Modo em lote: arquivo de log do projeto em execucao na thread atual
+PROJECT_LOG = contextvars.ContextVar("vpd_pipeline_project_log", default=None)
 
 
-def detect_audio(vpd_path, prefer_enhanced=True):
-    """Detecta audio na pasta do projeto."""
-    vpd_dir = os.path.dirname(vpd_path)
-    project_name = os.path.splitext(os.path.basename(vpd_path))[0]
+@functools.lru_cache(maxsize=None)
+def load_stage(name, path):
+    """Importa um script de etapa (pasta/arquivo com hifen) como modulo (uma vez por processo)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
 
-    if prefer_enhanced:
-        candidates = [f"{project_name}-enhanced.wav", f"{project_name}-clean.wav"]
-    else:
-        candidates = [f"{project_name}-clean.wav", f"{project_name}-enhanced.wav"]
 
-    for name in candidates:
-        path = os.path.join(vpd_dir, name)
-        if os.path.exists(path):
-            return path
+def run_step(description, func, *args, **kwargs):
+    """Executa um passo do pipeline; sys.exit() da etapa encerra o pipeline."""
+    print(f"\n{'=' * 60}")
+    print(f"  {description}")
+    print(f"{'=' * 60}\n")
 
-    return None
+    try:
+        return func(*args, **kwargs)
+    except SystemExit as e:
+        if e.code:
+            print(f"\nERRO: {description} falhou (exit {e.code})", file=sys.stderr)
+        raise
 
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(description="Pipeline completo: enhance audio + legendas para projetos VPD")
-    parser.add_argument("vpd", help="Caminho para o arquivo .vpd do projeto")
+    parser.add_argument("vpd", nargs="*",
+                        help="Arquivo .vpd do projeto; varios arquivos, pastas ou globs rodam em lote")
     parser.add_argument("--skip-enhance", action="store_true", help="Pular etapa de enhance audio")
     parser.add_argument("--skip-subtitles", action="store_true", help="Pular etapa de legendas")
 
@@ -75,9 +128,77 @@ def main():
     parser.add_argument("--highlight-scale", type=int, help="Escala da palavra em destaque %%")
     parser.add_argument("--position-y", type=float, help="Posicao vertical 0.0-1.0")
 
+    parser.add_argument("--no-overlap", action="store_true",
+                        help="Transcrever so depois do Adobe Enhance (audio enhanced) em vez do clean em paralelo")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help=f"Confianca minima da transcricao do clean; abaixo disso retranscreve o enhanced (default: {DEFAULT_MIN_CONFIDENCE})")
+
+    # Grafo de etapas
+    parser.add_argument("--explain", action="store_true", help="Mostrar por que cada etapa rodou ou foi pulada")
+    parser.add_argument("--force", action="append", default=[], choices=STAGE_NAMES,
+                        help="Executar a etapa mesmo se atualizada (pode repetir)")
+
+    # Medicao
+    parser.add_argument("--trace", action="store_true",
+                        help="Medir etapas, ffmpeg/ffprobe/Whisper/Adobe e VPD; grava Chrome trace + resumo de tempos")
+    parser.add_argument("--trace-out",
+                        help="Arquivo do trace (default: <projeto>.vpd.trace.json; lote/worker: vpd-pipeline.trace.json)")
+    parser.add_argument("--max-temp-bytes", type=usage.parse_size,
+                        help="Limite da pasta temporaria do render vpd_clean_<projeto>/ (ex.: 500M, 20G)")
+
+    # Modo em lote / worker
+    parser.add_argument("--jobs", type=int,
+                        help="Projetos em andamento ao mesmo tempo (default: cpu-slots + enhance-slots no lote, 1 no worker)")
+    parser.add_argument("--cpu-slots", type=int, help="Etapas de ffmpeg simultaneas (default: numero de nucleos)")
+    parser.add_argument("--enhance-slots", type=int, default=DEFAULT_ENHANCE_SLOTS,
+                        help=f"Sessoes simultaneas do Adobe Enhance (default: {DEFAULT_ENHANCE_SLOTS})")
+
+    # Fila de jobs (vpd/jobs.py)
+    parser.add_argument("--db", help="Banco da fila de jobs (default: $VPD_JOBS_DB ou ~/.vpd/jobs.db)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--enqueue", action="store_true", help="Enfileirar os projetos (com as opcoes dadas) em vez de rodar")
+    mode.add_argument("--worker", action="store_true", help="Rodar como worker: executar jobs da fila ate Ctrl+C")
+    mode.add_argument("--status", action="store_true", help="Listar jobs da fila (na fila, rodando, falhos, concluidos)")
+    mode.add_argument("--retry", type=int, nargs="*", metavar="ID",
+                      help="Recolocar na fila jobs que falharam (todos, ou so os IDs dados)")
+    parser.add_argument("--drain", action="store_true", help="Com --worker, sair quando a fila esvaziar")
+    return parser
+
+
+def main():
+    parser = build_parser()
     args = parser.parse_args()
 
-    vpd_path = os.path.abspath(args.vpd)
+    if args.status:
+        print_queue_status(JobQueue(args.db))
+        return
+    if args.retry is not None:
+        count = JobQueue(args.db).retry(args.retry)
+        print(f"{count} job(s) recolocado(s) na fila")
+        return
+    # Lote e worker: um trace so para todos os projetos (uma thread por projeto)
+    session_trace = (args.trace_out or "vpd-pipeline" + trace.TRACE_SUFFIX) if args.trace else None
+    if args.worker:
+        with trace.session(session_trace):
+            run_worker(args)
+        return
+    if not args.vpd:
+        parser.error("informe o(s) projeto(s) .vpd")
+
+    if args.enqueue:
+        enqueue(args, expand_projects(args.vpd))
+        return
+
+    if len(args.vpd) > 1 or any(os.path.isdir(p) or is_glob(p) for p in args.vpd):
+        projects = expand_projects(args.vpd)
+        if not projects:
+            print("Nenhum projeto .vpd encontrado.", file=sys.stderr)
+            sys.exit(1)
+        with trace.session(session_trace):
+            ok = run_batch(args, projects)
+        sys.exit(0 if ok else 1)
+
+    vpd_path = os.path.abspath(args.vpd[0])
     if not os.path.exists(vpd_path):
         print(f"Arquivo nao encontrado: {vpd_path}", file=sys.stderr)
         sys.exit(1)
@@ -87,51 +208,573 @@ def main():
     print(f"Enhance: {'SKIP' if args.skip_enhance else 'sim'}")
     print(f"Subtitles: {'SKIP' if args.skip_subtitles else 'sim'}")
 
-    # --- Passo 1: Enhance Audio ---
+    with trace.session((args.trace_out or trace.trace_path(vpd_path)) if args.trace else None):
+        run_stages(args, vpd_path)
+
+    print(f"\n{'=' * 60}")
+    print(f"  Pipeline concluido!")
+    print(f"{'=' * 60}")
+
+
+def subtitles_argv(args, vpd_path, audio_path):
+    """Argumentos do vpd-add-subtitles equivalentes as opcoes do pipeline."""
+    argv = [vpd_path, "--audio", audio_path, "--whisper-model", args.whisper_model, "--language", args.language]
+
+    # Passar opcoes opcionais
+    if args.max_lines is not None:
+        argv.extend(["--max-lines", str(args.max_lines)])
+    if args.max_chars is not None:
+        argv.extend(["--max-chars", str(args.max_chars)])
+    if args.gap_threshold is not None:
+        argv.extend(["--gap-threshold", str(args.gap_threshold)])
+    if args.style is not None:
+        argv.extend(["--style", args.style])
+    if args.highlight_color is not None:
+        argv.extend(["--highlight-color", args.highlight_color])
+    if args.highlight_scale is not None:
+        argv.extend(["--highlight-scale", str(args.highlight_scale)])
+    if args.position_y is not None:
+        argv.extend(["--position-y", str(args.position_y)])
+    return argv
+
+
+def run_stages(args, vpd_path, lanes=None, decode_cache=None, on_event=None):
+    """Monta o grafo render -> enhance -> transcribe -> layout -> write e executa.
+
+    Retorna {etapa: "run"|"skip"}. lanes e decode_cache sao compartilhados no modo
+    em lote; on_event recebe os eventos das etapas (checkpoints da fila de jobs).
+    """
+    project = Project.load(vpd_path)
+    vpd_dir = project.dir
+    graph = StageGraph(manifest_path(vpd_path), explain=args.explain, force=args.force,
+                       lanes=lanes, on_event=on_event)
+    enhance = load_stage("vpd_enhance_audio", ENHANCE_SCRIPT)
+    subtitles = None
+    audio_stage = None
+    total_duration_ms = None
+    # PCM do Whisper gerado pelo render (segunda saida da mixagem), entregue em memoria
+    # ao transcribe: {caminho do audio: bytes}
+    pcm_handoff = {}
+    transcribe_clean = (not args.skip_subtitles and not args.audio
+                        and (args.enhance_skip_adobe or not args.no_overlap))
+
+    # --- render: audio limpo da timeline ---
     if not args.skip_enhance:
-        enhance_cmd = [sys.executable, ENHANCE_SCRIPT, vpd_path]
-        if args.enhance_skip_adobe:
-            enhance_cmd.append("--skip-enhance")
-        if args.fade is not None:
-            enhance_cmd.extend(["--fade", str(args.fade)])
-
-        run_step("vpd-enhance-audio", enhance_cmd)
-
-    # --- Passo 2: Detectar audio ---
-    audio_path = args.audio
-    if not audio_path and not args.skip_subtitles:
-        audio_path = detect_audio(vpd_path, prefer_enhanced=not args.skip_enhance)
-        if not audio_path:
-            print("ERRO: audio nao encontrado para legendas.", file=sys.stderr)
-            print("  Use --audio para especificar ou rode enhance primeiro.", file=sys.stderr)
-            sys.exit(1)
-        print(f"\nAudio detectado: {os.path.basename(audio_path)}")
+        video_clips, audio_clips, resources, total_duration_ms = enhance.load_timeline(project)
+        clean_path = os.path.join(vpd_dir, f"{project.name}-clean.wav")
+        fade_ms = args.fade if args.fade is not None else enhance.DEFAULT_FADE_MS
+
+        def render_inputs():
+            # Fontes entram por (caminho, mtime, tamanho): hashear videos de GBs a cada execucao nao compensa
+            sources = {}
+            for clip in video_clips + audio_clips:
+                path = enhance.resolve_resource_path(clip["resid"], resources, vpd_dir)
+                if path and os.path.exists(path):
+                    st = os.stat(path)
+                    sources[clip["resid"]] = [path, st.st_mtime_ns, st.st_size]
+                else:
+                    sources[clip["resid"]] = [path, None, None]
+            return {
+                "timeline": hash_value([video_clips, audio_clips, total_duration_ms]),
+                "sources": hash_value(sources),
+            }
+
+        def render(values):
+            # Nome fixo e removido so no sucesso: se o render falhar, o audio ja extraido
+            # das fontes fica para a proxima tentativa
+            temp_dir = os.path.join(vpd_dir, f"vpd_clean_{project.name}")
+            os.makedirs(temp_dir, exist_ok=True)
+            pcm = enhance.WhisperPcm() if transcribe_clean else None
+            try:
+                with usage.temp_dir(temp_dir, args.max_temp_bytes):
+                    run_step("render (vpd-enhance-audio)", enhance.render_clean_audio,
+                             video_clips, audio_clips, resources, vpd_dir, temp_dir,
+                             total_duration_ms / 1000.0, fade_ms, clean_path, "wav", decode_cache, pcm)
+            except usage.TempSpaceError as e:
+                print(f"ERRO: {e}", file=sys.stderr)
+                print(f"  Libere espaco ou aumente --max-temp-bytes", file=sys.stderr)
+                sys.exit(1)
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if pcm is not None and pcm.ok:
+                pcm_handoff[clean_path] = pcm.data
+            return clean_path
 
-    # --- Passo 3: Subtitles ---
+        graph.add(Stage("render", render, params={"fade_ms": fade_ms, "format": "wav"},
+                        inputs=render_inputs, outputs=[clean_path], load=lambda: clean_path, lane="cpu"))
+        audio_stage = "render"
+
+        # --- enhance: Adobe Podcast Enhance ---
+        if not args.enhance_skip_adobe:
+            enhanced_path = os.path.join(vpd_dir, f"{project.name}-enhanced.wav")
+
+            def adobe(values):
+                if not run_step("enhance (Adobe Podcast)", enhance.enhance_audio, values["render"], enhanced_path):
+                    print("ERRO: Enhancement falhou.", file=sys.stderr)
+                    print(f"  Rode novamente com --enhance-skip-adobe para usar o audio clean", file=sys.stderr)
+                    sys.exit(1)
+                return enhanced_path
+
+            graph.add(Stage("enhance", adobe, deps=["render"], outputs=[enhanced_path],
+                            load=lambda: enhanced_path, lane="enhance"))
+            audio_stage = "enhance"
+
+    # --- transcribe + layout: legendas ---
+    overlap = audio_stage == "enhance" and not args.audio and not args.no_overlap
     if not args.skip_subtitles:
-        sub_cmd = [sys.executable, SUBTITLES_SCRIPT, vpd_path, "--audio", audio_path, "--whisper-model", args.whisper_model, "--language", args.language]
-
-        # Passar opcoes opcionais
-        if args.max_lines is not None:
-            sub_cmd.extend(["--max-lines", str(args.max_lines)])
-        if args.max_chars is not None:
-            sub_cmd.extend(["--max-chars", str(args.max_chars)])
-        if args.gap_threshold is not None:
-            sub_cmd.extend(["--gap-threshold", str(args.gap_threshold)])
-        if args.style is not None:
-            sub_cmd.extend(["--style", args.style])
-        if args.highlight_color is not None:
-            sub_cmd.extend(["--highlight-color", args.highlight_color])
-        if args.highlight_scale is not None:
-            sub_cmd.extend(["--highlight-scale", str(args.highlight_scale)])
-        if args.position_y is not None:
-            sub_cmd.extend(["--position-y", str(args.position_y)])
-
-        run_step("vpd-add-subtitles", sub_cmd)
+        subtitles = load_stage("vpd_add_subtitles", SUBTITLES_SCRIPT)
+        transcribe_deps = []
+        transcribe_inputs = None
+        audio_path = args.audio and os.path.abspath(args.audio)
+        if audio_path:
+            transcribe_inputs = lambda: {"audio": graph.file_hash(audio_path)}  # noqa: E731
+        elif overlap:
+            # Clean e enhanced tem a mesma timeline: transcreve o clean enquanto o Adobe processa
+            audio_path = graph.stages["render"].load()
+            transcribe_deps = ["render"]
+        elif audio_stage:
+            audio_path = graph.stages[audio_stage].load()
+            transcribe_deps = [audio_stage]
+        else:
+            audio_path = detect_audio(vpd_path, prefer_enhanced=False)
+            if not audio_path:
+                print("ERRO: audio nao encontrado para legendas.", file=sys.stderr)
+                print("  Use --audio para especificar ou rode enhance primeiro.", file=sys.stderr)
+                sys.exit(1)
+            transcribe_inputs = lambda: {"audio": graph.file_hash(audio_path)}  # noqa: E731
+        print(f"Audio para legendas: {os.path.basename(audio_path)}")
+
+        sub_args = subtitles.build_parser().parse_args(subtitles_argv(args, vpd_path, audio_path))
+        basename = os.path.splitext(os.path.basename(audio_path))[0]
+        json_path = os.path.join(vpd_dir, f"{basename}-whisper.json")
+        # Uma vaga por modelo: o modelo carregado e compartilhado entre os projetos do lote
+        whisper_lane = f"transcribe:{sub_args.whisper_model}"
+
+        def whisper_words(path, out_json, description):
+            # A etapa decide se a transcricao esta valida; JSON existente aqui esta desatualizado
+            if os.path.exists(out_json):
+                os.remove(out_json)
+            # PCM do render (em memoria) se ele rodou agora; senao decodifica o arquivo
+            pcm = pcm_handoff.pop(path, None)
+            if pcm is None:
+                pcm = enhance.render_whisper_pcm(path)
+            else:
+                print(f"  PCM do render em memoria: {len(pcm) / 4 / enhance.WHISPER_SAMPLE_RATE:.1f}s")
+            words = run_step(description, subtitles.transcribe, path,
+                             sub_args.whisper_model, sub_args.language, vpd_dir,
+                             pcm=subtitles.pcm_from_bytes(pcm) if pcm else None)
+            if not words:
+                print("ERRO: nenhuma palavra transcrita.", file=sys.stderr)
+                sys.exit(1)
+            return words
+
+        graph.add(Stage("transcribe", lambda values: whisper_words(audio_path, json_path, "transcribe (Whisper)"),
+                        deps=transcribe_deps, inputs=transcribe_inputs,
+                        params={"model": sub_args.whisper_model, "language": sub_args.language},
+                        outputs=[json_path], load=lambda: subtitles.parse_whisper_json(json_path),
+                        lane=whisper_lane))
+        words_stage = "transcribe"
+
+        # --- verify: confere a transcricao do clean; se a confianca for baixa, refaz com o enhanced ---
+        if overlap:
+            enhanced_json = os.path.join(vpd_dir, f"{project.name}-enhanced-whisper.json")
+
+            def confident():
+                confidence = subtitles.transcription_confidence(json_path)
+                ok = confidence >= args.min_confidence
+                print(f"  Confianca da transcricao (clean): {confidence:.3f} "
+                      f"({'OK' if ok else 'abaixo de ' + str(args.min_confidence)})")
+                return ok
+
+            def verify(values):
+                if confident():
+                    return values["transcribe"]
+                return whisper_words(values["enhance"], enhanced_json, "transcribe (Whisper, audio enhanced)")
+
+            def verified_words():
+                if confident() or not os.path.exists(enhanced_json):
+                    return subtitles.parse_whisper_json(json_path)
+                return subtitles.parse_whisper_json(enhanced_json)
+
+            graph.add(Stage("verify", verify, deps=["transcribe", "enhance"],
+                            params={"min_confidence": args.min_confidence}, load=verified_words,
+                            lane=whisper_lane))
+            words_stage = "verify"
+
+        layout_params = {
+            key: value for key, value in vars(sub_args).items()
+            if key not in ("vpd", "audio", "pcm", "whisper_model", "language", "test_ass", "trace", "trace_out")
+        }
+        layout_params["player"] = list(project.player_info())
+        style_path = os.path.join(subtitles.VLOGGER_STYLES_DIR, f"{sub_args.style}.json")
+
+        def layout(values):
+            screens, blocks_a, blocks_b = run_step("layout (vpd-add-subtitles)", subtitles.layout_subtitles,
+                                                   values[words_stage], sub_args, project)
+            return {"blocks_a": blocks_a, "blocks_b": blocks_b}
+
+        graph.add(Stage("layout", layout, deps=[words_stage], params=layout_params,
+                        inputs=lambda: {"style": graph.file_hash(style_path)}))
+
+    # --- write: aplica as etapas no VPD e grava uma vez ---
+    write_deps = ([audio_stage] if audio_stage else []) + (["layout"] if subtitles else [])
+    if not write_deps:
+        print("Nada a fazer.")
+        return {}
+
+    def write(values):
+        print(f"\n--- Gravando VPD ---")
+        if project.reload_if_changed():
+            print(f"  VPD alterado no disco durante o pipeline, recarregado")
+        if audio_stage:
+            enhance.modify_vpd(project, values[audio_stage], total_duration_ms, save=False)
+        if subtitles:
+            subtitles.modify_vpd_subtitles(project, values["layout"]["blocks_a"], values["layout"]["blocks_b"], save=False)
+        project.save()
+        if subtitles:
+            subtitles.reset_playhead(project.path)
+        print(f"  VPD salvo: {os.path.basename(project.path)}")
+        return project.path
+
+    graph.add(Stage("write", write, deps=write_deps, outputs=[vpd_path]))
+
+    # Com overlap, enhance (navegador) e transcribe (Whisper) rodam ao mesmo tempo
+    status = graph.run(workers=2 if overlap else 1)
+    ran = [name for name, st in status.items() if st == "run"]
+    skipped = [name for name, st in status.items() if st == "skip"]
+    print(f"\n=== Resultado ===")
+    print(f"Etapas executadas: {', '.join(ran) or 'nenhuma'}")
+    if skipped:
+        print(f"Etapas puladas (atualizadas): {', '.join(skipped)}")
+    if graph.usage:
+        print(f"\nRecursos por etapa:")
+        print(usage.format_table({name: graph.usage[name] for name in graph.order if name in graph.usage}))
+    return status
+
+
+# ----------------------------------------------------------------------
+# Modo em lote
+# ----------------------------------------------------------------------
 
+def is_glob(pattern):
+    return any(c in pattern for c in "*?[")
+
+
+def expand_projects(patterns):
+    """Projetos .vpd de arquivos, pastas (os .vpd de dentro) e globs, sem repetir."""
+    projects = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.vpd")))
+        elif is_glob(pattern):
+            matches = [p for p in sorted(glob.glob(pattern)) if p.endswith(".vpd")]
+        else:
+            matches = [pattern]
+        for path in matches:
+            path = os.path.abspath(path)
+            if path not in projects:
+                projects.append(path)
+    return projects
+
+
+class ProjectOutput:
+    """sys.stdout/sys.stderr do modo em lote: cada projeto escreve no proprio log."""
+
+    def __init__(self, console):
+        self.console = console
+
+    def write(self, text):
+        return (PROJECT_LOG.get() or self.console).write(text)
+
+    def flush(self):
+        (PROJECT_LOG.get() or self.console).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.console, name)
+
+
+@contextlib.contextmanager
+def project_output():
+    """Redireciona a saida das threads de projeto para os logs; devolve o console."""
+    console, errors = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = ProjectOutput(console), ProjectOutput(errors)
+    try:
+        yield console
+    finally:
+        sys.stdout, sys.stderr = console, errors
+
+
+class DecodeCaches:
+    """SourceDecodeCache por pasta de projeto (o ffmpeg.exe precisa de temporarios na mesma particao)."""
+
+    def __init__(self, enhance):
+        self.enhance = enhance
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def get(self, vpd_dir):
+        with self._lock:
+            if vpd_dir not in self.caches:
+                self.caches[vpd_dir] = self.enhance.SourceDecodeCache(
+                    tempfile.mkdtemp(prefix="vpd_batch_", dir=vpd_dir))
+            return self.caches[vpd_dir]
+
+    def cleanup(self):
+        for cache in self.caches.values():
+            shutil.rmtree(cache.cache_dir, ignore_errors=True)
+
+
+def make_lanes(args):
+    cpu_slots = args.cpu_slots or os.cpu_count() or 1
+    return Lanes({"cpu": cpu_slots, "enhance": args.enhance_slots, "transcribe": 1})
+
+
+def load_scripts(args):
+    """Carrega os scripts antes das threads: caches (fontes, modelo whisper) ficam compartilhados."""
+    enhance = load_stage("vpd_enhance_audio", ENHANCE_SCRIPT)
+    if not args.skip_subtitles:
+        load_stage("vpd_add_subtitles", SUBTITLES_SCRIPT)
+    return enhance
+
+
+def run_project(args, vpd_path, lanes, decode_caches, on_event=None):
+    """Executa o pipeline de um projeto do lote, com a saida em <projeto>-pipeline.log."""
+    log_path = os.path.splitext(vpd_path)[0] + "-pipeline.log"
+    result = {"vpd": vpd_path, "log": log_path, "status": {}, "error": None, "elapsed": 0.0}
+    if not os.path.exists(vpd_path):
+        result["error"] = "arquivo nao encontrado"
+        return result
+    start = time.monotonic()
+    with open(log_path, "a", encoding="utf-8") as log:
+        PROJECT_LOG.set(log)
+        try:
+            decode_cache = decode_caches.get(os.path.dirname(vpd_path))
+            with trace.span(os.path.basename(vpd_path), "project"):
+                result["status"] = run_stages(args, vpd_path, lanes, decode_cache, on_event)
+        except SystemExit as e:
+            result["error"] = f"exit {e.code}"
+        except Exception as e:
+            traceback.print_exc()
+            result["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            PROJECT_LOG.set(None)
+    result["elapsed"] = time.monotonic() - start
+    return result
+
+
+def run_batch(args, projects):
+    """Roda o pipeline em varios projetos, com lanes compartilhadas. Retorna True se nenhum falhou."""
+    lanes = make_lanes(args)
+    jobs = args.jobs or lanes.limits["cpu"] + args.enhance_slots
+
+    print(f"=== vpd-pipeline (lote) ===")
+    print(f"Projetos: {len(projects)}")
+    print(f"Em paralelo: {jobs} projetos; lanes: cpu {lanes.limits['cpu']}, enhance {args.enhance_slots}, "
+          f"transcribe 1 por modelo")
+
+    decode_caches = DecodeCaches(load_scripts(args))
+    for vpd_path in projects:
+        # Log novo a cada lote (o worker da fila acumula as tentativas)
+        if os.path.exists(vpd_path):
+            open(os.path.splitext(vpd_path)[0] + "-pipeline.log", "w").close()
+    results = []
+    start = time.monotonic()
+    try:
+        with project_output() as console, ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="project") as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, run_project, args, vpd_path, lanes, decode_caches)
+                for vpd_path in projects
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                ran = [name for name, st in result["status"].items() if st == "run"]
+                outcome = f"FALHOU ({result['error']})" if result["error"] else "ok"
+                console.write(f"[{len(results)}/{len(projects)}] {os.path.basename(result['vpd'])}: "
+                              f"{outcome} em {result['elapsed']:.1f}s; executadas: {', '.join(ran) or 'nenhuma'}\n")
+                console.flush()
+    finally:
+        decode_caches.cleanup()
+    elapsed = time.monotonic() - start
+
+    print_batch_summary(results, elapsed, lanes, decode_caches)
+    return not any(r["error"] for r in results)
+
+
+def print_batch_summary(results, elapsed, lanes, decode_caches):
+    failed = [r for r in results if r["error"]]
     print(f"\n{'=' * 60}")
-    print(f"  Pipeline concluido!")
+    print(f"  Lote concluido: {len(results) - len(failed)} ok, {len(failed)} falhas")
     print(f"{'=' * 60}")
+    print(f"Tempo total: {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput: {len(results) / elapsed * 3600:.1f} projetos/hora")
+
+    ran, skipped = {}, {}
+    for r in results:
+        for name, st in r["status"].items():
+            counter = ran if st == "run" else skipped
+            counter[name] = counter.get(name, 0) + 1
+    if ran:
+        print(f"Etapas executadas: {', '.join(f'{name} {n}' for name, n in ran.items())}")
+    if skipped:
+        print(f"Etapas puladas: {', '.join(f'{name} {n}' for name, n in skipped.items())}")
+
+    for lane, (count, waited, busy) in sorted(lanes.stats.items()):
+        print(f"Lane {lane}: {count} etapas, ocupada {busy:.1f}s, espera {waited:.1f}s")
+    hits = sum(c.hits for c in decode_caches.caches.values())
+    misses = sum(c.misses for c in decode_caches.caches.values())
+    if hits or misses:
+        print(f"Fontes extraidas: {misses} (reaproveitadas entre projetos: {hits})")
+
+    if failed:
+        print(f"\nFalhas:")
+        for r in failed:
+            print(f"  {os.path.basename(r['vpd'])}: {r['error']} (log: {r['log']})")
+
+
+# ----------------------------------------------------------------------
+# Fila de jobs (SQLite, vpd/jobs.py)
+# ----------------------------------------------------------------------
+
+# Opcoes que sao do modo de execucao, nao do job
+QUEUE_ONLY_OPTIONS = ("vpd", "jobs", "cpu_slots", "enhance_slots", "db", "enqueue", "worker", "status",
+                      "retry", "drain", "trace", "trace_out")
+WORKER_POLL_S = 5.0
+
+
+def job_options(args):
+    """Opcoes do pipeline guardadas no job (as que diferem do default)."""
+    defaults = vars(build_parser().parse_args([]))
+    return {
+        key: value for key, value in vars(args).items()
+        if key not in QUEUE_ONLY_OPTIONS and value != defaults.get(key)
+    }
+
+
+def job_args(job):
+    """Namespace do pipeline para rodar o job (defaults + opcoes do job)."""
+    args = build_parser().parse_args([])
+    for key, value in job.options.items():
+        setattr(args, key, value)
+    return args
+
+
+def enqueue(args, projects):
+    queue = JobQueue(args.db)
+    options = job_options(args)
+    for vpd_path in projects:
+        if not os.path.exists(vpd_path):
+            print(f"  Arquivo nao encontrado, ignorado: {vpd_path}", file=sys.stderr)
+            continue
+        job_id, created = queue.submit(vpd_path, options)
+        state = "enfileirado" if created else "ja estava na fila"
+        print(f"  #{job_id} {os.path.basename(vpd_path)}: {state}")
+    print(f"Fila: {queue.path}")
+
+
+def worker_loop(args, queue, lanes, decode_caches, stop, console):
+    """Pega jobs da fila ate stop (ou ate a fila esvaziar, com --drain)."""
+    while not stop.is_set():
+        job = queue.claim()
+        if job is None:
+            if args.drain:
+                return
+            queue.recover()
+            stop.wait(WORKER_POLL_S)
+            continue
+
+        console.write(f"[#{job.id}] {os.path.basename(job.vpd)}: iniciando (tentativa {job.attempts})\n")
+        console.flush()
+        result = run_project(job_args(job), job.vpd, lanes, decode_caches,
+                             on_event=lambda name, event, elapsed, job=job: queue.stage_event(job, name, event, elapsed))
+        if result["error"] and stop.is_set():
+            # Ctrl+C derruba os subprocessos da etapa: o job volta para a fila e continua depois
+            queue.release(job)
+            outcome = "interrompido, de volta na fila"
+        else:
+            queue.finish(job, result["error"])
+            outcome = f"FALHOU ({result['error']})" if result["error"] else "ok"
+        console.write(f"[#{job.id}] {os.path.basename(job.vpd)}: {outcome} em {result['elapsed']:.1f}s\n")
+        console.flush()
+
+
+def run_worker(args):
+    """Worker de longa duracao: executa jobs da fila (--jobs em paralelo) ate Ctrl+C."""
+    queue = JobQueue(args.db)
+    lanes = make_lanes(args)
+    jobs = args.jobs or 1
+    recovered = queue.recover()
+
+    print(f"=== vpd-pipeline (worker) ===")
+    print(f"Fila: {queue.path}")
+    print(f"Em paralelo: {jobs} jobs; lanes: cpu {lanes.limits['cpu']}, enhance {args.enhance_slots}, "
+          f"transcribe 1 por modelo")
+    if recovered:
+        print(f"Jobs interrompidos de volta na fila: {', '.join(f'#{i}' for i in recovered)}")
+
+    decode_caches = DecodeCaches(load_scripts(args))
+    stop = threading.Event()
+    try:
+        with project_output() as console:
+            threads = [
+                threading.Thread(target=contextvars.copy_context().run, name=f"worker-{i}",
+                                 args=(worker_loop, args, queue, lanes, decode_caches, stop, console))
+                for i in range(jobs)
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                while any(thread.is_alive() for thread in threads):
+                    for thread in threads:
+                        thread.join(0.5)
+            except KeyboardInterrupt:
+                console.write("\nInterrompido: esperando os jobs em andamento voltarem para a fila...\n")
+                stop.set()
+                for thread in threads:
+                    thread.join()
+    finally:
+        decode_caches.cleanup()
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    return f"{int(seconds // 60)}m{int(seconds % 60):02d}s"
+
+
+def print_queue_status(queue, done_limit=10):
+    """Jobs na fila, rodando e falhos (e os ultimos concluidos), com tempos por etapa."""
+    counts = queue.counts()
+    print(f"Fila: {queue.path}")
+    print(f"  {counts['queued']} na fila, {counts['running']} rodando, "
+          f"{counts['failed']} falharam, {counts['done']} concluidos")
+
+    jobs = queue.jobs()
+    done = [job for job in jobs if job.status == "done"]
+    shown = [job for job in jobs if job.status != "done"] + done[-done_limit:]
+    shown.sort(key=lambda job: job.id)
+    for job in shown:
+        line = f"  #{job.id:<4} {job.status:<8} {os.path.basename(job.vpd)}"
+        if job.attempts:
+            line += f"  tentativa {job.attempts}, {format_seconds(job.elapsed)}"
+        if job.status == "running" and job.stage:
+            line += f", etapa {job.stage}"
+        print(line)
+        if job.stages:
+            parts = []
+            for name, status, started, finished in job.stages:
+                if status == "skip":
+                    parts.append(f"{name} pulada")
+                elif status == "running":
+                    parts.append(f"{name} rodando ({format_seconds(time.time() - started)})")
+                else:
+                    suffix = " FALHOU" if status == "failed" else ""
+                    parts.append(f"{name} {format_seconds(finished - started)}{suffix}")
+            print(f"         {', '.join(parts)}")
+        if job.error:
+            print(f"         erro: {job.error}")
 
 
 if __name__ == "__main__":
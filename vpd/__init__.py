@@ -0,0 +1,31 @@
+"""
+vpd — Biblioteca compartilhada para projetos VideoProc Vlogger (.vpd)
+
+Usada pelos scripts vpd-enhance-audio, vpd-add-subtitles e vpd-pipeline.
+Os scripts ficam em pastas com hifen (nao importaveis), entao adicionam a raiz
+do repositorio ao sys.path antes de importar este pacote.
+"""
+
+from .cache import ProjectModel, load_model
+from .diff import ProjectDiff, RenderedState, diff_projects
+from .document import VpdDocument, atomic_write
+from .intervals import IntervalIndex
+from .project import Clip, Project, Resource, Track, detect_audio, extract_clip_info, to_local_path
+
+__all__ = [
+    "Clip",
+    "IntervalIndex",
+    "Project",
+    "ProjectDiff",
+    "ProjectModel",
+    "RenderedState",
+    "Resource",
+    "Track",
+    "VpdDocument",
+    "atomic_write",
+    "detect_audio",
+    "diff_projects",
+    "extract_clip_info",
+    "load_model",
+    "to_local_path",
+]
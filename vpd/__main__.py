@@ -0,0 +1,107 @@
+"""
+CLI do pacote vpd — ferramentas somente-leitura sobre projetos .vpd
+
+Uso:
+    python3 -m vpd stats projeto.vpd
+    python3 -m vpd stats projeto.vpd --no-cache
+    python3 -m vpd at projeto.vpd 30          # blocos que cobrem t = 30 s
+    python3 -m vpd at projeto.vpd 30 45       # blocos que tocam [30 s, 45 s)
+    python3 -m vpd diff projeto.vpd.bak projeto.vpd [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from .cache import load_model
+from .diff import diff_projects
+from .intervals import IntervalIndex
+
+
+def cmd_stats(args):
+    t0 = time.perf_counter()
+    model = load_model(args.vpd, use_cache=not args.no_cache)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    width, height, fps = model.player_info()
+    print(f"Projeto: {os.path.basename(model.path)}")
+    print(f"Carregado em {load_ms:.1f}ms ({'cache' if model.from_cache else 'parse do JSON'})")
+    print(f"Resolucao: {width}x{height} @ {fps:g}fps")
+    print(f"Duracao: {model.context_ms / 1000:.3f}s")
+    print(f"Recursos: {len(model.resources)}")
+    print(f"Tracks: {len(model.tracks)}")
+    for track in model.tracks:
+        clips = track["clips"]
+        muted = sum(1 for c in clips if c["mute"])
+        speed = sum(1 for c in clips if abs(c["speed_factor"] - 1.0) > 0.001)
+        mute_flag = " [mute]" if track["mute"] else ""
+        detail = f", {len(clips)} clips ({muted} mutados, {speed} com speed)" if clips else ""
+        print(f"  {track['type']:<16} {track['title']!r}: {len(track['blocks'])} blocos{detail}{mute_flag}")
+    return 0
+
+
+def cmd_at(args):
+    model = load_model(args.vpd, use_cache=not args.no_cache)
+    start_ms = args.start * 1000
+    for track in model.tracks:
+        index = IntervalIndex.from_blocks(track["blocks"])
+        if args.end is None:
+            blocks = index.at(start_ms)
+        else:
+            blocks = index.overlapping(start_ms, args.end * 1000)
+        if not blocks:
+            continue
+        print(f"{track['type']} {track['title']!r}:")
+        for b in blocks:
+            tstart = b["tstart"] / 1000
+            tend = (b["tstart"] + b["tduration"]) / 1000
+            print(f"  {tstart:9.3f}s - {tend:9.3f}s  {b['type']:<18} {b['title']!r}")
+    return 0
+
+
+def cmd_diff(args):
+    old = load_model(args.old, use_cache=not args.no_cache)
+    new = load_model(args.vpd, use_cache=not args.no_cache)
+    diff = diff_projects(old, new)
+    if args.json:
+        print(json.dumps(diff.to_dict(), indent=2, ensure_ascii=False))
+    else:
+        print(diff.format())
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python3 -m vpd", description="Ferramentas para projetos VideoProc Vlogger (.vpd)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_stats = sub.add_parser("stats", help="Resumo do projeto (usa o cache .vpd.cache)")
+    p_stats.add_argument("vpd", help="Caminho para o arquivo .vpd")
+    p_stats.add_argument("--no-cache", action="store_true", help="Ignorar o sidecar e re-parsear o JSON")
+    p_stats.set_defaults(func=cmd_stats)
+
+    p_at = sub.add_parser("at", help="Blocos que cobrem um instante ou se sobrepoem a uma faixa (segundos)")
+    p_at.add_argument("vpd", help="Caminho para o arquivo .vpd")
+    p_at.add_argument("start", type=float, help="Instante (s) ou inicio da faixa")
+    p_at.add_argument("end", type=float, nargs="?", help="Fim da faixa (s)")
+    p_at.add_argument("--no-cache", action="store_true", help="Ignorar o sidecar e re-parsear o JSON")
+    p_at.set_defaults(func=cmd_at)
+
+    p_diff = sub.add_parser("diff", help="Diff estrutural de clips entre duas versoes do projeto")
+    p_diff.add_argument("old", help="Versao antiga (ex.: projeto.vpd.bak)")
+    p_diff.add_argument("vpd", help="Versao nova")
+    p_diff.add_argument("--json", action="store_true", help="Saida em JSON")
+    p_diff.add_argument("--no-cache", action="store_true", help="Ignorar o sidecar e re-parsear o JSON")
+    p_diff.set_defaults(func=cmd_diff)
+
+    args = parser.parse_args()
+    for path in (getattr(args, "old", None), args.vpd):
+        if path and not os.path.exists(path):
+            print(f"Arquivo nao encontrado: {path}", file=sys.stderr)
+            return 1
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
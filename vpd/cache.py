@@ -0,0 +1,178 @@
+"""
+vpd.cache — Modelo compacto do projeto com cache em sidecar (.vpd.cache)
+
+Ferramentas somente-leitura (estatisticas, planejamento, QC) nao precisam do
+JSON inteiro: so das tracks, do timing dos blocos, dos clips (extract_clip_info)
+e dos recursos. ProjectModel guarda so isso; load_model() le o sidecar
+<projeto>.vpd.cache quando ele ainda corresponde ao .vpd e so re-parseia o JSON
+quando o projeto mudou.
+
+Validacao do sidecar: mtime_ns + tamanho + sha1 dos primeiros 64 KB do .vpd.
+Formato: marshal (so tipos nativos), muito mais rapido de carregar que o JSON.
+"""
+
+import hashlib
+import marshal
+import os
+
+from .intervals import IntervalIndex
+from .project import Project
+
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".cache"
+HEAD_BYTES = 64 * 1024
+
+
+def cache_path(vpd_path):
+    return vpd_path + CACHE_SUFFIX
+
+
+def fingerprint(vpd_path):
+    """(mtime_ns, tamanho, sha1 do inicio do arquivo) do .vpd."""
+    with open(vpd_path, "rb") as f:
+        st = os.fstat(f.fileno())
+        head = f.read(HEAD_BYTES)
+    return st.st_mtime_ns, st.st_size, hashlib.sha1(head).hexdigest()
+
+
+class ProjectModel:
+    """Visao somente-leitura do projeto: tracks, blocos, clips e recursos."""
+
+    def __init__(self, path, state):
+        self.path = os.path.abspath(path)
+        self.dir = os.path.dirname(self.path)
+        self.name = os.path.splitext(os.path.basename(self.path))[0]
+        self.projinfo = state["projinfo"]
+        self.context_ms = state["context_ms"]
+        # [{type, title, mute, status, context, blocks: [...], clips: [...]}]
+        self.tracks = state["tracks"]
+        # resid -> {path, duration, kind}
+        self.resources = state["resources"]
+        self.from_cache = False
+        self._intervals = {}
+
+    @classmethod
+    def from_project(cls, project):
+        tracks = []
+        for track in project.tracks:
+            tracks.append({
+                "type": track.type,
+                "title": track.title,
+                "mute": track.mute,
+                "status": track.raw.get("status", 0),
+                "context": track.raw.get("context", 0),
+                "blocks": [{
+                    "uuid": b.get("uuid", ""),
+                    "type": b.get("type", ""),
+                    "title": b.get("title", ""),
+                    "tstart": b.get("tstart", 0),
+                    "tduration": b.get("tduration", 0),
+                    "resid": b.get("resid", ""),
+                } for b in track.blocks],
+                "clips": [c.info for c in track.clips],
+            })
+        resources = {
+            resid: {"path": r.path, "duration": r.duration, "kind": r.kind}
+            for resid, r in project.resources.items()
+        }
+        state = {
+            "projinfo": project.projinfo,
+            "context_ms": project.context_ms,
+            "tracks": tracks,
+            "resources": resources,
+        }
+        return cls(project.path, state)
+
+    def to_state(self):
+        return {
+            "projinfo": self.projinfo,
+            "context_ms": self.context_ms,
+            "tracks": self.tracks,
+            "resources": self.resources,
+        }
+
+    def tracks_of(self, track_type):
+        return [t for t in self.tracks if t["type"] == track_type]
+
+    def clips(self, track_type):
+        """Clips (dicts de extract_clip_info) de todas as tracks do tipo, por tstart."""
+        clips = [c for t in self.tracks_of(track_type) for c in t["clips"]]
+        clips.sort(key=lambda c: c["tstart_ms"])
+        return clips
+
+    def block_index(self, track_type=None):
+        """IntervalIndex dos blocos (dicts compactos) das tracks do tipo, ou de todas."""
+        key = ("blocks", track_type)
+        if key not in self._intervals:
+            tracks = self.tracks if track_type is None else self.tracks_of(track_type)
+            self._intervals[key] = IntervalIndex.from_blocks(b for t in tracks for b in t["blocks"])
+        return self._intervals[key]
+
+    def clip_index(self, track_type):
+        """IntervalIndex dos clips (dicts de extract_clip_info) das tracks do tipo."""
+        key = ("clips", track_type)
+        if key not in self._intervals:
+            self._intervals[key] = IntervalIndex.from_clips(self.clips(track_type))
+        return self._intervals[key]
+
+    def player_info(self):
+        """(largura, altura, fps) do projeto."""
+        player = self.projinfo.get("player", {})
+        width = player.get("resolutionW", 1080)
+        height = player.get("resolutionH", 1920)
+        return width, height, player.get("frameRateNum", 30) / player.get("frameRateDen", 1)
+
+
+def read_cache(vpd_path):
+    """ProjectModel do sidecar, ou None se ausente/desatualizado/corrompido."""
+    path = cache_path(vpd_path)
+    try:
+        # marshal.load(f) le o arquivo em pedacos pequenos; ler tudo de uma vez e ~10x mais rapido
+        with open(path, "rb") as f:
+            payload = marshal.loads(f.read())
+        # Outro formato (ou arquivo de outra ferramenta com o mesmo nome): reparse
+        if not isinstance(payload, dict) or payload.get("version") != CACHE_VERSION:
+            return None
+        if tuple(payload["fingerprint"]) != fingerprint(vpd_path):
+            return None
+        model = ProjectModel(vpd_path, payload["state"])
+    except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+    model.from_cache = True
+    return model
+
+
+def write_cache(model, vpd_fingerprint=None):
+    """Grava o sidecar do modelo (atomico). Falhas de escrita sao ignoradas.
+
+    vpd_fingerprint deve ser calculado ANTES do parse, para que uma edicao
+    concorrente do .vpd invalide o cache em vez de ser mascarada.
+    """
+    payload = {
+        "version": CACHE_VERSION,
+        "fingerprint": vpd_fingerprint or fingerprint(model.path),
+        "state": model.to_state(),
+    }
+    tmp_path = cache_path(model.path) + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(marshal.dumps(payload))
+        os.replace(tmp_path, cache_path(model.path))
+    except (OSError, ValueError):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_model(vpd_path, use_cache=True):
+    """Carrega o ProjectModel, do sidecar quando valido ou parseando o .vpd (e regravando o cache)."""
+    vpd_path = os.path.abspath(vpd_path)
+    if use_cache:
+        model = read_cache(vpd_path)
+        if model is not None:
+            return model
+    vpd_fingerprint = fingerprint(vpd_path)
+    model = ProjectModel.from_project(Project.load(vpd_path))
+    if use_cache:
+        write_cache(model, vpd_fingerprint)
+    return model
@@ -0,0 +1,367 @@
+"""
+vpd.diff — Diff estrutural entre duas versoes de um projeto .vpd
+
+Compara os clips (MediaFileBlock) track a track e classifica as mudancas:
+- added / removed: clip so existe na versao nova / antiga
+- moved: mudou de posicao na timeline (tstart) ou de track
+- trimmed: mudou o trecho usado da fonte (fileCuttedStart/Duration)
+- speed: mudou o fator de velocidade
+- mute: mudou o mute do clip
+
+Clips sao pareados pelo uuid; os que sobram em cada track sao pareados por
+resid (mesma fonte), escolhendo o mais proximo em tempo. Tracks sao pareadas
+por (tipo, titulo, n-esima ocorrencia).
+
+Aceita Project ou ProjectModel (vpd.cache), entao o diff de dois projetos com
+sidecar valido nao precisa re-parsear nenhum JSON:
+    diff = diff_projects(load_model("projeto.vpd.bak"), load_model("projeto.vpd"))
+    diff.clip_changes(("MainVideoTrack", "AudioTrack"))
+
+RenderedState guarda, ao lado de um arquivo gerado (ex.: projeto-clean.wav), os
+clips de que ele foi gerado (<arquivo>.render.json). E a base certa para saber se
+o arquivo esta atualizado: o .bak so tem o estado da primeira execucao.
+    RenderedState.from_project(project, ("MainVideoTrack", "AudioTrack"), params={"fade_ms": 5}).save(wav)
+    state = RenderedState.load(wav)            # None se nao ha sidecar ou o arquivo foi trocado
+    diff = state.changes(project, {"fade_ms": 5})   # None se os params mudaram
+"""
+
+import json
+import os
+
+from .document import atomic_write
+
+# Tolerancias (ms e fator de speed)
+TIME_EPS_MS = 0.5
+SPEED_EPS = 1e-3
+
+CHANGE_KINDS = ("moved", "trimmed", "speed", "mute")
+
+
+def _track_views(project):
+    """[(chave, tipo, titulo, mute, [clip info])] de Project ou ProjectModel."""
+    views = []
+    seen = {}
+    for track in project.tracks:
+        if isinstance(track, dict):
+            ttype, title, mute = track["type"], track["title"], track["mute"]
+            clips = track["clips"]
+        else:
+            ttype, title, mute = track.type, track.title, track.mute
+            clips = [c.info for c in track.clips]
+        n = seen.get((ttype, title), 0)
+        seen[(ttype, title)] = n + 1
+        views.append(((ttype, title, n), ttype, title, mute, clips))
+    return views
+
+
+def _clip_summary(info):
+    return {
+        "uuid": info["uuid"],
+        "title": info["title"],
+        "resid": info["resid"],
+        "tstart_ms": info["tstart_ms"],
+        "tduration_ms": info["tduration_ms"],
+        "file_cutted_start": info["file_cutted_start"],
+        "file_cutted_duration": info["file_cutted_duration"],
+        "speed_factor": info["speed_factor"],
+        "mute": info["mute"],
+    }
+
+
+def clip_changes_between(old, new):
+    """Tipos de mudanca (subconjunto de CHANGE_KINDS) entre dois clip infos."""
+    changes = []
+    if abs(old["tstart_ms"] - new["tstart_ms"]) > TIME_EPS_MS:
+        changes.append("moved")
+    speed_changed = abs(old["speed_factor"] - new["speed_factor"]) > SPEED_EPS
+    if (abs(old["file_cutted_start"] - new["file_cutted_start"]) > TIME_EPS_MS / 1000
+            or abs(old["file_cutted_duration"] - new["file_cutted_duration"]) > TIME_EPS_MS / 1000
+            or (not speed_changed and abs(old["tduration_ms"] - new["tduration_ms"]) > TIME_EPS_MS)):
+        changes.append("trimmed")
+    if speed_changed:
+        changes.append("speed")
+    if bool(old["mute"]) != bool(new["mute"]):
+        changes.append("mute")
+    return changes
+
+
+class TrackDiff:
+    """Mudancas de uma track: clips adicionados, removidos e alterados."""
+
+    __slots__ = ("type", "title", "status", "mute", "added", "removed", "changed")
+
+    def __init__(self, ttype, title, status, mute):
+        self.type = ttype
+        self.title = title
+        # "added", "removed", "changed" ou "unchanged"
+        self.status = status
+        # (mute antigo, mute novo) se o mute da track mudou
+        self.mute = mute
+        self.added = []
+        self.removed = []
+        # [{"old": info, "new": info, "changes": [...], "match": "uuid"|"resid", "from_track": titulo}]
+        self.changed = []
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "title": self.title,
+            "status": self.status,
+            "mute": list(self.mute) if self.mute else None,
+            "added": [_clip_summary(c) for c in self.added],
+            "removed": [_clip_summary(c) for c in self.removed],
+            "changed": [{
+                "uuid": ch["new"]["uuid"],
+                "title": ch["new"]["title"],
+                "changes": ch["changes"],
+                "match": ch["match"],
+                "from_track": ch["from_track"],
+                "old": _clip_summary(ch["old"]),
+                "new": _clip_summary(ch["new"]),
+            } for ch in self.changed],
+        }
+
+
+class ProjectDiff:
+    """Resultado de diff_projects(): lista de TrackDiff na ordem da versao nova."""
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+
+    def __bool__(self):
+        return any(t.status != "unchanged" for t in self.tracks)
+
+    def summary(self):
+        """Contagem por tipo de mudanca: added, removed, moved, trimmed, speed, mute."""
+        counts = dict.fromkeys(("added", "removed") + CHANGE_KINDS, 0)
+        for t in self.tracks:
+            counts["added"] += len(t.added)
+            counts["removed"] += len(t.removed)
+            for ch in t.changed:
+                for kind in ch["changes"]:
+                    counts[kind] += 1
+        return counts
+
+    def select(self, track_types=None, exclude_titles=()):
+        """TrackDiffs dos tipos pedidos, sem as tracks com titulo em exclude_titles."""
+        return [
+            t for t in self.tracks
+            if (track_types is None or t.type in track_types) and t.title not in exclude_titles
+        ]
+
+    def clip_changes(self, track_types=None, exclude_titles=()):
+        """True se algum clip das tracks selecionadas foi adicionado, removido ou alterado."""
+        return any(t.added or t.removed or t.changed for t in self.select(track_types, exclude_titles))
+
+    def changed_ranges(self, track_types=None, exclude_titles=()):
+        """Trechos (start_ms, end_ms) da timeline afetados pelas mudancas (antes e depois)."""
+        ranges = []
+        for t in self.select(track_types, exclude_titles):
+            clips = t.added + t.removed + [c for ch in t.changed for c in (ch["old"], ch["new"])]
+            ranges.extend((c["tstart_ms"], c["tstart_ms"] + c["tduration_ms"]) for c in clips)
+        ranges.sort()
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def to_dict(self):
+        return {
+            "summary": self.summary(),
+            "tracks": [t.to_dict() for t in self.tracks if t.status != "unchanged"],
+        }
+
+    def format(self):
+        """Resumo legivel (uma linha por track alterada)."""
+        lines = []
+        for t in self.tracks:
+            if t.status == "unchanged":
+                continue
+            parts = []
+            if t.added:
+                parts.append(f"{len(t.added)} adicionados")
+            if t.removed:
+                parts.append(f"{len(t.removed)} removidos")
+            for kind in CHANGE_KINDS:
+                n = sum(1 for ch in t.changed if kind in ch["changes"])
+                if n:
+                    parts.append(f"{n} {kind}")
+            if t.mute:
+                parts.append(f"mute {t.mute[0]} -> {t.mute[1]}")
+            detail = ", ".join(parts) if parts else "sem mudancas em clips"
+            lines.append(f"{t.type} {t.title!r} [{t.status}]: {detail}")
+        return "\n".join(lines) if lines else "Sem mudancas"
+
+
+def _match_by_resid(old_clips, new_clips):
+    """Pareia clips restantes da mesma fonte, pelo mais proximo em tempo. -> [(old, new)]"""
+    pairs = []
+    pool = {}
+    for info in old_clips:
+        pool.setdefault(info["resid"], []).append(info)
+    for info in new_clips:
+        candidates = pool.get(info["resid"])
+        if not candidates:
+            continue
+        best = min(candidates, key=lambda o: abs(o["tstart_ms"] - info["tstart_ms"])
+                   + abs(o["file_cutted_start"] - info["file_cutted_start"]) * 1000)
+        candidates.remove(best)
+        pairs.append((best, info))
+    return pairs
+
+
+def diff_projects(old, new):
+    """Diff estrutural entre duas versoes do projeto (Project ou ProjectModel)."""
+    old_views = _track_views(old)
+    new_views = _track_views(new)
+    old_by_key = {v[0]: v for v in old_views}
+    new_keys = {v[0] for v in new_views}
+
+    matched_old = set()
+    pairs = {v[0]: [] for v in new_views}
+    unmatched_new = {v[0]: [] for v in new_views}
+
+    # 1) uuid dentro da mesma track
+    for key, _t, _title, _m, clips in new_views:
+        old_view = old_by_key.get(key)
+        in_track = {}
+        if old_view is not None:
+            for info in old_view[4]:
+                if info["uuid"]:
+                    in_track.setdefault(info["uuid"], info)
+        for info in clips:
+            hit = in_track.pop(info["uuid"], None) if info["uuid"] else None
+            if hit is not None:
+                matched_old.add(id(hit))
+                pairs[key].append((key, hit, info, "uuid"))
+            else:
+                unmatched_new[key].append(info)
+
+    # 2) uuid em outra track (clip movido entre tracks)
+    old_by_uuid = {}
+    for key, _t, _title, _m, clips in old_views:
+        for info in clips:
+            if info["uuid"] and id(info) not in matched_old:
+                old_by_uuid.setdefault(info["uuid"], (key, info))
+    for key in pairs:
+        remaining = []
+        for info in unmatched_new[key]:
+            hit = old_by_uuid.pop(info["uuid"], None) if info["uuid"] else None
+            if hit is not None:
+                matched_old.add(id(hit[1]))
+                pairs[key].append((hit[0], hit[1], info, "uuid"))
+            else:
+                remaining.append(info)
+        unmatched_new[key] = remaining
+
+    # 3) resid + tempo, dentro da mesma track
+    unmatched_old = {
+        v[0]: [info for info in v[4] if id(info) not in matched_old] for v in old_views
+    }
+    for key in pairs:
+        if key in unmatched_old:
+            for old_info, new_info in _match_by_resid(unmatched_old[key], unmatched_new[key]):
+                unmatched_old[key].remove(old_info)
+                unmatched_new[key].remove(new_info)
+                pairs[key].append((key, old_info, new_info, "resid"))
+
+    tracks = []
+    for key, ttype, title, mute, _clips in new_views:
+        old_view = old_by_key.get(key)
+        status = "added" if old_view is None else "unchanged"
+        mute_change = None
+        if old_view is not None and bool(old_view[3]) != bool(mute):
+            mute_change = (bool(old_view[3]), bool(mute))
+        td = TrackDiff(ttype, title, status, mute_change)
+        td.added = unmatched_new[key]
+        td.removed = unmatched_old.get(key, [])
+        for old_key, old_info, new_info, how in pairs[key]:
+            changes = clip_changes_between(old_info, new_info)
+            if old_key != key and "moved" not in changes:
+                changes.insert(0, "moved")
+            if changes:
+                td.changed.append({
+                    "old": old_info,
+                    "new": new_info,
+                    "changes": changes,
+                    "match": how,
+                    "from_track": old_key[1] if old_key != key else None,
+                })
+        td.changed.sort(key=lambda ch: ch["new"]["tstart_ms"])
+        if td.status == "unchanged" and (td.added or td.removed or td.changed or td.mute):
+            td.status = "changed"
+        tracks.append(td)
+
+    for key, ttype, title, mute, _clips in old_views:
+        if key not in new_keys:
+            td = TrackDiff(ttype, title, "removed", None)
+            td.removed = unmatched_old[key]
+            tracks.append(td)
+
+    return ProjectDiff(tracks)
+
+
+RENDER_SUFFIX = ".render.json"
+RENDER_VERSION = 1
+
+
+class RenderedState:
+    """Clips das tracks de que um arquivo foi gerado (sidecar <arquivo>.render.json).
+
+    Serve de versao "antiga" para diff_projects(); params guarda parametros do
+    render (ex.: fade) que tambem invalidam o arquivo. O sidecar registra tamanho
+    e mtime do arquivo: se ele foi trocado por outro, load() devolve None.
+    """
+
+    def __init__(self, tracks, params=None):
+        # [{type, title, mute, clips: [clip info]}], como ProjectModel.tracks
+        self.tracks = tracks
+        self.params = params or {}
+
+    @classmethod
+    def from_project(cls, project, track_types, exclude_titles=(), params=None):
+        tracks = [{
+            "type": ttype,
+            "title": title,
+            "mute": bool(mute),
+            "clips": [dict(info) for info in clips],
+        } for _key, ttype, title, mute, clips in _track_views(project)
+            if ttype in track_types and title not in exclude_titles]
+        return cls(tracks, params)
+
+    @staticmethod
+    def path(output_path):
+        return output_path + RENDER_SUFFIX
+
+    def save(self, output_path):
+        """Grava o sidecar de output_path (chamar depois que o arquivo foi escrito)."""
+        st = os.stat(output_path)
+        payload = {
+            "version": RENDER_VERSION,
+            "output": [st.st_size, st.st_mtime_ns],
+            "params": self.params,
+            "tracks": self.tracks,
+        }
+        atomic_write(self.path(output_path), json.dumps(payload, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, output_path):
+        """Estado gravado para output_path, ou None (sem sidecar, corrompido, ou arquivo trocado)."""
+        try:
+            with open(cls.path(output_path), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            st = os.stat(output_path)
+            if payload.get("version") != RENDER_VERSION or payload["output"] != [st.st_size, st.st_mtime_ns]:
+                return None
+            return cls(payload["tracks"], payload.get("params"))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def changes(self, project, params=None):
+        """ProjectDiff do estado gravado para o projeto atual, ou None se os params mudaram."""
+        if params is not None and params != self.params:
+            return None
+        return diff_projects(self, project)
@@ -0,0 +1,264 @@
+"""
+vpd.document — Leitura indexada e escrita incremental de arquivos .vpd
+
+O .vpd e parseado uma unica vez guardando, para cada container ate INDEX_DEPTH
+(raiz -> timeline -> subitems -> track -> subitems -> bloco), o offset de inicio
+e fim no texto original. Na escrita, tudo que nao mudou e copiado byte-a-byte do
+arquivo original; so os trechos alterados sao serializados de novo.
+
+Deteccao de mudancas por identidade: trocar/inserir/remover valores em dicts e
+listas ate o nivel dos blocos e detectado automaticamente. Alteracoes in-place
+dentro de um bloco (ex.: block["attribute"]["AudioAttribute"]["mute"] = True)
+precisam de doc.touch(block).
+
+Uso:
+    doc = VpdDocument.load("projeto.vpd")
+    doc.data["timeline"]["subitems"][0]["mute"] = True
+    doc.save()  # atomico: arquivo temporario + rename
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from . import trace
+
+# Profundidade ate onde os containers sao indexados (blocos ficam no nivel 5)
+INDEX_DEPTH = 5
+
+_decoder = json.JSONDecoder()
+_scanstring = json.decoder.scanstring
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+def atomic_write(path, text):
+    """Grava texto em `path` via arquivo temporario + rename (nunca trunca o original)."""
+    path = os.path.abspath(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class VpdDocument:
+    """Projeto .vpd parseado com os offsets originais de cada container indexado."""
+
+    def __init__(self, path, text, stat=None):
+        self.path = path
+        self.text = text
+        # (mtime_ns, tamanho) do arquivo lido, para detectar edicoes externas
+        self.stat = stat
+        # id(container indexado) -> (container, start, end, snapshot dos filhos)
+        self._containers = {}
+        # id(dict/list abaixo do indice) -> (valor, start, end)
+        self._leaves = {}
+        self._touched = set()
+        self.indent = self._detect_indent(text)
+        start = _WS.match(text, 0).end()
+        self.data, end = self._scan_value(start, 0)
+        if _WS.match(text, end).end() != len(text):
+            raise json.JSONDecodeError("Extra data", text, end)
+
+    @classmethod
+    def load(cls, path):
+        with trace.span("vpd.read", "vpd", file=os.path.basename(path)):
+            with open(path, "r", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                text = f.read()
+            return cls(path, text, (st.st_mtime_ns, st.st_size))
+
+    def changed_on_disk(self):
+        """True se o arquivo foi alterado (ex.: salvo no Vlogger) depois do load."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return self.stat != (st.st_mtime_ns, st.st_size)
+
+    # ------------------------------------------------------------------
+    # Parse com offsets
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _detect_indent(text):
+        """Indentacao do arquivo (espacos do primeiro nivel) ou None se compacto."""
+        m = re.match(r"\s*[{\[]\r?\n( +)\S", text)
+        return len(m.group(1)) if m else None
+
+    def _scan_value(self, idx, depth):
+        text = self.text
+        ch = text[idx:idx + 1]
+        if depth < INDEX_DEPTH and ch == "{":
+            return self._scan_object(idx, depth)
+        if depth < INDEX_DEPTH and ch == "[":
+            return self._scan_array(idx, depth)
+        value, end = _decoder.raw_decode(text, idx)
+        if isinstance(value, (dict, list)):
+            self._leaves[id(value)] = (value, idx, end)
+        return value, end
+
+    def _scan_object(self, start, depth):
+        text = self.text
+        obj = {}
+        snapshot = []
+        idx = _WS.match(text, start + 1).end()
+        if text[idx] == "}":
+            end = idx + 1
+        else:
+            while True:
+                if text[idx] != '"':
+                    raise json.JSONDecodeError("Expecting property name", text, idx)
+                key, idx = _scanstring(text, idx + 1)
+                idx = _WS.match(text, idx).end()
+                if text[idx] != ":":
+                    raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+                idx = _WS.match(text, idx + 1).end()
+                value_start = idx
+                value, idx = self._scan_value(idx, depth + 1)
+                obj[key] = value
+                snapshot.append((key, value, value_start, idx))
+                idx = _WS.match(text, idx).end()
+                if text[idx] == ",":
+                    idx = _WS.match(text, idx + 1).end()
+                elif text[idx] == "}":
+                    end = idx + 1
+                    break
+                else:
+                    raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+        self._containers[id(obj)] = (obj, start, end, snapshot)
+        return obj, end
+
+    def _scan_array(self, start, depth):
+        text = self.text
+        arr = []
+        snapshot = []
+        idx = _WS.match(text, start + 1).end()
+        if text[idx] == "]":
+            end = idx + 1
+        else:
+            while True:
+                value_start = idx
+                value, idx = self._scan_value(idx, depth + 1)
+                arr.append(value)
+                snapshot.append((None, value, value_start, idx))
+                idx = _WS.match(text, idx).end()
+                if text[idx] == ",":
+                    idx = _WS.match(text, idx + 1).end()
+                elif text[idx] == "]":
+                    end = idx + 1
+                    break
+                else:
+                    raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+        self._containers[id(arr)] = (arr, start, end, snapshot)
+        return arr, end
+
+    # ------------------------------------------------------------------
+    # Escrita incremental
+    # ------------------------------------------------------------------
+
+    def touch(self, obj):
+        """Marca um dict/list como alterado in-place (forca nova serializacao)."""
+        self._touched.add(id(obj))
+
+    def _indexed(self, value):
+        entry = self._containers.get(id(value))
+        return entry if entry is not None and entry[0] is value else None
+
+    def _leaf(self, value):
+        entry = self._leaves.get(id(value))
+        if entry is None or entry[0] is not value or id(value) in self._touched:
+            return None
+        return entry
+
+    def _unchanged(self, entry):
+        """True se o container indexado (e seus filhos indexados) nao mudou."""
+        container, _start, _end, snapshot = entry
+        if id(container) in self._touched or len(container) != len(snapshot):
+            return False
+        if isinstance(container, dict):
+            current = container.items()
+        else:
+            current = zip([None] * len(container), container)
+        for (key, value), (snap_key, snap_value, _s, _e) in zip(current, snapshot):
+            if key != snap_key or value is not snap_value:
+                return False
+            if isinstance(value, (dict, list)):
+                child = self._indexed(value)
+                if child is not None:
+                    if not self._unchanged(child):
+                        return False
+                elif id(value) in self._touched:
+                    return False
+        return True
+
+    def _pad(self, level):
+        return "\n" + " " * (self.indent * level) if self.indent is not None else ""
+
+    def _dumps_fresh(self, value, level):
+        text = json.dumps(value, indent=self.indent, ensure_ascii=False)
+        if self.indent and level:
+            text = text.replace("\n", self._pad(level))
+        return text
+
+    def _emit(self, value, level):
+        entry = self._indexed(value)
+        if entry is not None:
+            if self._unchanged(entry):
+                return self.text[entry[1]:entry[2]]
+            return self._emit_container(value, level, entry[3])
+        leaf = self._leaf(value)
+        if leaf is not None:
+            return self.text[leaf[1]:leaf[2]]
+        if isinstance(value, (dict, list)) and value and level <= INDEX_DEPTH:
+            # Container novo: pode conter containers originais (ex.: lista de tracks refeita)
+            return self._emit_container(value, level, None)
+        return self._dumps_fresh(value, level)
+
+    def _emit_container(self, value, level, snapshot):
+        raw_children = {}
+        if snapshot is not None:
+            for key, snap_value, s, e in snapshot:
+                raw_children[id(snap_value)] = (snap_value, s, e)
+
+        def child_text(child):
+            if not isinstance(child, (dict, list)):
+                raw = raw_children.get(id(child))
+                if raw is not None and raw[0] is child:
+                    return self.text[raw[1]:raw[2]]
+            return self._emit(child, level + 1)
+
+        inner_pad = self._pad(level + 1)
+        sep = "," + inner_pad if self.indent is not None else ", "
+        if isinstance(value, dict):
+            parts = [json.dumps(k, ensure_ascii=False) + ": " + child_text(v) for k, v in value.items()]
+            opening, closing = "{", "}"
+        else:
+            parts = [child_text(v) for v in value]
+            opening, closing = "[", "]"
+        if not parts:
+            return opening + closing
+        return opening + inner_pad + sep.join(parts) + self._pad(level) + closing
+
+    def dumps(self):
+        """Texto completo do projeto, reaproveitando os trechos originais nao alterados."""
+        return self._emit(self.data, 0)
+
+    def save(self, path=None):
+        """Salva atomicamente (temporario + rename) em `path` ou no arquivo original."""
+        target = path or self.path
+        with trace.span("vpd.write", "vpd", file=os.path.basename(target)):
+            atomic_write(target, self.dumps())
+        if os.path.abspath(target) == os.path.abspath(self.path):
+            st = os.stat(target)
+            self.stat = (st.st_mtime_ns, st.st_size)
@@ -0,0 +1,124 @@
+"""
+vpd.intervals — Indice de intervalos para consultas por tempo na timeline
+
+IntervalIndex guarda intervalos [start, end) ordenados por start e uma arvore de
+intervalos implicita sobre esse array: o no de cada faixa [lo, hi) e o elemento
+do meio, e max_end[no] e o maior end da subarvore. Consultas descem so pelos
+ramos que podem conter resultados (O(log n + k)).
+
+Uso:
+    index = IntervalIndex((b["tstart"], b["tstart"] + b["tduration"], b) for b in blocos)
+    index.at(30000)                # blocos que cobrem t = 30 s
+    index.overlapping(30000, 45000)  # blocos que tocam [30 s, 45 s)
+    index.gaps(0, 60000, 0.5)      # trechos sem nenhum bloco
+"""
+
+from bisect import bisect_left
+
+
+class IntervalIndex:
+    """Intervalos [start, end) com payload, consultaveis por ponto e por faixa."""
+
+    __slots__ = ("_starts", "_ends", "_items", "_max_end")
+
+    def __init__(self, entries=()):
+        # Ordenacao estavel: empates em start mantem a ordem de entrada
+        entries = sorted(entries, key=lambda e: e[0])
+        self._starts = [e[0] for e in entries]
+        self._ends = [e[1] for e in entries]
+        self._items = [e[2] for e in entries]
+        self._max_end = list(self._ends)
+        self._build(0, len(entries))
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """Indice de blocos da timeline (dicts com tstart/tduration em ms)."""
+        return cls(
+            (b.get("tstart", 0), b.get("tstart", 0) + b.get("tduration", 0), b)
+            for b in blocks
+        )
+
+    @classmethod
+    def from_clips(cls, clips):
+        """Indice de clips (Clip ou dicts de extract_clip_info)."""
+        entries = []
+        for clip in clips:
+            info = clip if isinstance(clip, dict) else clip.info
+            entries.append((info["tstart_ms"], info["tstart_ms"] + info["tduration_ms"], clip))
+        return cls(entries)
+
+    def _build(self, lo, hi):
+        """Preenche max_end da subarvore [lo, hi) e devolve o maximo."""
+        if lo >= hi:
+            return float("-inf")
+        mid = (lo + hi) // 2
+        best = max(self._max_end[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        self._max_end[mid] = best
+        return best
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    @property
+    def start(self):
+        return self._starts[0] if self._starts else 0
+
+    @property
+    def end(self):
+        return max(self._ends) if self._ends else 0
+
+    def _search(self, lo_bound, hi_bound, point):
+        """Indices (em ordem de start) dos intervalos com end > lo_bound e start < hi_bound
+        (start <= hi_bound quando point=True)."""
+        starts, ends, max_end = self._starts, self._ends, self._max_end
+        found = []
+        # Percurso em ordem, iterativo: (lo, hi, expandido?)
+        stack = [(0, len(starts), False)]
+        while stack:
+            lo, hi, expanded = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if expanded:
+                if ends[mid] > lo_bound:
+                    found.append(mid)
+                continue
+            if max_end[mid] <= lo_bound:
+                continue
+            before_hi = starts[mid] <= hi_bound if point else starts[mid] < hi_bound
+            if before_hi:
+                stack.append((mid + 1, hi, False))
+                stack.append((mid, mid + 1, True))
+            stack.append((lo, mid, False))
+        return found
+
+    def at(self, t):
+        """Payloads dos intervalos que contem o instante t (start <= t < end)."""
+        return [self._items[i] for i in self._search(t, t, point=True)]
+
+    def overlapping(self, start, end):
+        """Payloads dos intervalos que se sobrepoem a [start, end)."""
+        if end <= start:
+            return self.at(start)
+        return [self._items[i] for i in self._search(start, end, point=False)]
+
+    def within(self, start, end):
+        """Payloads dos intervalos inteiramente dentro de [start, end]."""
+        lo = bisect_left(self._starts, start)
+        hi = bisect_left(self._starts, end)
+        return [self._items[i] for i in range(lo, hi) if self._ends[i] <= end]
+
+    def gaps(self, start, end, min_gap=0.0):
+        """Trechos (start, end) de [start, end) sem nenhum intervalo, maiores que min_gap."""
+        result = []
+        pos = start
+        for i in self._search(start, end, point=False):
+            if self._starts[i] - pos > min_gap:
+                result.append((pos, self._starts[i]))
+            pos = max(pos, self._ends[i])
+        if end - pos > min_gap:
+            result.append((pos, end))
+        return result
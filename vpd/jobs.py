@@ -0,0 +1,277 @@
+"""
+vpd.jobs — Fila local de execucoes do pipeline (SQLite)
+
+Cada job e um projeto .vpd mais as opcoes do pipeline (dict JSON). Workers de longa
+duracao pegam (claim) o job mais antigo da fila, rodam o pipeline e registram
+cada etapa (inicio, fim, pulada, falha) como checkpoint. O pipeline ja grava o
+manifest de etapas (vpd/stages.py) depois de cada etapa, entao um job que
+morreu no meio volta para a fila e, ao rodar de novo, continua da ultima etapa
+concluida.
+
+Estados: queued -> running -> done | failed. Jobs "running" cujo processo nao
+existe mais (mesma maquina) voltam para queued no proximo claim. O worker e
+identificado por pid + inicio do processo (/proc/<pid>/stat): um pid reciclado
+por outro processo nao mantem o job preso em running.
+
+Banco: $VPD_JOBS_DB ou ~/.vpd/jobs.db (modo WAL, varios workers ao mesmo tempo).
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import time
+
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    vpd TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    host TEXT,
+    pid INTEGER,
+    pid_start TEXT,
+    stage TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS stages (
+    job_id INTEGER NOT NULL,
+    attempt INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started REAL,
+    finished REAL,
+    PRIMARY KEY (job_id, attempt, name)
+);
+"""
+
+
+def default_db_path():
+    return os.environ.get("VPD_JOBS_DB") or os.path.join(os.path.expanduser("~"), ".vpd", "jobs.db")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _process_start(pid):
+    """Inicio do processo como "boot_id:ticks" (Linux/WSL), ou None se nao der para ler."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            # O nome (campo 2) pode ter espacos e parenteses: os campos seguem o ultimo ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/sys/kernel/random/boot_id", "r") as f:
+            boot_id = f.read().strip()
+    except (OSError, IndexError):
+        return None
+    return f"{boot_id}:{fields[19]}"  # starttime, campo 22
+
+
+def _worker_alive(pid, start):
+    """O processo que pegou o job ainda existe (mesmo pid e, se gravado, mesmo inicio)."""
+    if not _pid_alive(pid):
+        return False
+    if start is None:
+        return True
+    current = _process_start(pid)
+    return current is None or current == start
+
+
+class Job:
+    """Linha da tabela jobs (mais as etapas da tentativa atual, em status())."""
+
+    __slots__ = ("id", "vpd", "options", "status", "attempts", "host", "pid", "pid_start", "stage", "error",
+                 "created", "started", "finished", "updated", "stages")
+
+    def __init__(self, row, stages=None):
+        for key in row.keys():
+            setattr(self, key, row[key])
+        self.options = json.loads(row["options"])
+        # [(nome, status, inicio, fim)]
+        self.stages = stages or []
+
+    @property
+    def elapsed(self):
+        """Duracao da tentativa atual (ate agora, se ainda rodando)."""
+        if not self.started:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.status}, {os.path.basename(self.vpd)!r})"
+
+
+class JobQueue:
+    """Fila de jobs do pipeline em um arquivo SQLite."""
+
+    def __init__(self, path=None):
+        self.path = os.path.abspath(path or default_db_path())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "pid_start" not in columns:  # banco criado antes da coluna
+                conn.execute("ALTER TABLE jobs ADD COLUMN pid_start TEXT")
+
+    def _connect(self):
+        # Uma conexao por operacao: pode ser usada por varias threads do worker
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Connection(conn)
+
+    # ------------------------------------------------------------------
+    # Fila
+    # ------------------------------------------------------------------
+
+    def submit(self, vpd_path, options=None):
+        """Enfileira o projeto. Retorna (id, criado); se ele ja esta na fila ou rodando, (id existente, False)."""
+        vpd_path = os.path.abspath(vpd_path)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE vpd = ? AND status IN ('queued', 'running') ORDER BY id LIMIT 1",
+                (vpd_path,)).fetchone()
+            if row:
+                conn.execute("COMMIT")
+                return row["id"], False
+            cur = conn.execute("INSERT INTO jobs (vpd, options, created) VALUES (?, ?, ?)",
+                               (vpd_path, json.dumps(options or {}, sort_keys=True), time.time()))
+            conn.execute("COMMIT")
+            return cur.lastrowid, True
+
+    def recover(self):
+        """Devolve para a fila jobs "running" desta maquina cujo processo morreu. Retorna os ids."""
+        host = socket.gethostname()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT id, pid, pid_start FROM jobs WHERE status = 'running' AND host = ?",
+                                (host,)).fetchall()
+            dead = [row["id"] for row in rows if not _worker_alive(row["pid"], row["pid_start"])]
+            for job_id in dead:
+                conn.execute("UPDATE jobs SET status = 'queued', error = 'worker interrompido', updated = ? "
+                             "WHERE id = ?", (time.time(), job_id))
+            conn.execute("COMMIT")
+        return dead
+
+    def claim(self):
+        """Pega o job mais antigo da fila (atomico entre workers). Retorna Job ou None."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, host = ?, pid = ?, pid_start = ?, "
+                "stage = NULL, error = NULL, started = ?, finished = NULL, updated = ? WHERE id = ?",
+                (socket.gethostname(), os.getpid(), _process_start(os.getpid()), now, now, row["id"]))
+            job = Job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+            conn.execute("COMMIT")
+        return job
+
+    def stage_event(self, job, name, event, elapsed=None):
+        """Checkpoint de etapa: event = "start" | "done" | "skip" | "failed"."""
+        now = time.time()
+        started = now - elapsed if elapsed is not None else now
+        with self._connect() as conn:
+            if event == "start":
+                conn.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, 'running', ?, NULL)",
+                             (job.id, job.attempts, name, now))
+            else:
+                conn.execute(
+                    "INSERT INTO stages VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (job_id, attempt, name) DO UPDATE SET status = excluded.status, "
+                    "finished = excluded.finished",
+                    (job.id, job.attempts, name, event, started, now))
+            conn.execute("UPDATE jobs SET stage = ?, updated = ? WHERE id = ?", (name, now, job.id))
+
+    def finish(self, job, error=None):
+        """Marca o job como done (ou failed, com a mensagem de erro)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished = ?, updated = ? WHERE id = ?",
+                         ("failed" if error else "done", error, now, now, job.id))
+
+    def release(self, job, reason="interrompido"):
+        """Devolve um job em andamento para a fila (ex.: Ctrl+C no worker)."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'queued', error = ?, updated = ? WHERE id = ?",
+                         (reason, time.time(), job.id))
+
+    def retry(self, job_ids=None):
+        """Recoloca na fila os jobs failed (todos, ou so os ids dados), sem o erro anterior. Retorna quantos."""
+        requeue = "UPDATE jobs SET status = 'queued', error = NULL, updated = ? WHERE status = 'failed'"
+        with self._connect() as conn:
+            if job_ids:
+                marks = ",".join("?" * len(job_ids))
+                cur = conn.execute(f"{requeue} AND id IN ({marks})", [time.time()] + list(job_ids))
+            else:
+                cur = conn.execute(requeue, (time.time(),))
+            return cur.rowcount
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def jobs(self, statuses=None):
+        """Jobs (com as etapas da tentativa atual), mais antigos primeiro."""
+        with self._connect() as conn:
+            if statuses:
+                marks = ",".join("?" * len(statuses))
+                rows = conn.execute(f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY id", list(statuses))
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id")
+            rows = rows.fetchall()
+            stages = {}
+            for st in conn.execute("SELECT s.* FROM stages s JOIN jobs j ON j.id = s.job_id "
+                                   "AND j.attempts = s.attempt ORDER BY s.started"):
+                stages.setdefault(st["job_id"], []).append((st["name"], st["status"], st["started"], st["finished"]))
+        return [Job(row, stages.get(row["id"])) for row in rows]
+
+    def counts(self):
+        """{status: quantidade}."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+class _Connection:
+    """Conexao sqlite3 que fecha no fim do with (o with do sqlite3 so faz commit)."""
+
+    __slots__ = ("conn",)
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql, params)
+
+    def executescript(self, sql):
+        return self.conn.executescript(sql)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self.conn.close()
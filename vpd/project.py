@@ -0,0 +1,320 @@
+"""
+vpd.project — Modelo do projeto .vpd com indices e views sob demanda
+
+Project parseia o .vpd uma unica vez (via VpdDocument) e monta indices:
+- blocos por uuid
+- recursos por resid (videolist/audiolist/imagelist)
+- tracks por tipo (MainVideoTrack, AudioTrack, SubtitleTrack...)
+- intervalos de tempo dos blocos/clips (IntervalIndex), por tipo de track
+
+As views (Track, Clip, Resource) sao criadas no primeiro acesso e leem direto
+dos dicts do documento; alteracoes no documento devem ser seguidas de
+project.invalidate() (ou project.save(), que ja invalida).
+"""
+
+import os
+
+from .document import VpdDocument
+from .intervals import IntervalIndex
+
+
+RESOURCE_LISTS = ("videolist", "audiolist", "imagelist")
+
+
+def extract_clip_info(block):
+    """Extrai informacoes de timing de um MediaFileBlock."""
+    attr = block.get("attribute", {})
+    speed_attr = attr.get("SpeedAttribute", {})
+    speed_data = speed_attr.get("Speed", {}).get("baseData", {})
+    audio_attr = attr.get("AudioAttribute", {})
+
+    file_cutted_start = speed_data.get("fileCuttedStart", 0)
+    file_cutted_duration = speed_data.get("fileCuttedDuration", 0)
+    handled_cutted_duration = speed_data.get("handledCuttedDuration", 0)
+
+    # Speed factor
+    if handled_cutted_duration > 0 and file_cutted_duration > 0:
+        speed_factor = file_cutted_duration / handled_cutted_duration
+    else:
+        speed_factor = 1.0
+
+    return {
+        "title": block.get("title", ""),
+        "uuid": block.get("uuid", ""),
+        "tstart_ms": block.get("tstart", 0),
+        "tduration_ms": block.get("tduration", 0),
+        "resid": block.get("resid", ""),
+        "file_cutted_start": file_cutted_start,
+        "file_cutted_duration": file_cutted_duration,
+        "handled_cutted_duration": handled_cutted_duration,
+        "speed_factor": speed_factor,
+        "mute": audio_attr.get("mute", False),
+        "audio_speed_rate": speed_attr.get("audioSpeedRate", False),
+    }
+
+
+def to_local_path(path, vpd_dir):
+    """Converte caminho do Vlogger (Windows ou relativo) para caminho absoluto WSL/Linux."""
+    if len(path) >= 2 and path[1] == ":":
+        drive = path[0].lower()
+        return f"/mnt/{drive}" + path[2:].replace("\\", "/")
+    if not os.path.isabs(path):
+        # Caminho relativo — relativo ao diretorio do projeto
+        return os.path.join(vpd_dir, path)
+    return path
+
+
+def detect_audio(vpd_path, prefer_enhanced=True):
+    """Detecta <projeto>-enhanced.wav / <projeto>-clean.wav na pasta do projeto."""
+    vpd_dir = os.path.dirname(vpd_path)
+    project_name = os.path.splitext(os.path.basename(vpd_path))[0]
+
+    if prefer_enhanced:
+        candidates = [f"{project_name}-enhanced.wav", f"{project_name}-clean.wav"]
+    else:
+        candidates = [f"{project_name}-clean.wav", f"{project_name}-enhanced.wav"]
+
+    for name in candidates:
+        path = os.path.join(vpd_dir, name)
+        if os.path.exists(path):
+            return path
+
+    return None
+
+
+class Clip:
+    """View de um MediaFileBlock; os campos de extract_clip_info viram atributos."""
+
+    __slots__ = ("block", "_info")
+
+    def __init__(self, block):
+        self.block = block
+        self._info = None
+
+    @property
+    def info(self):
+        """Dict de extract_clip_info (calculado no primeiro acesso)."""
+        if self._info is None:
+            self._info = extract_clip_info(self.block)
+        return self._info
+
+    @property
+    def tend_ms(self):
+        return self.info["tstart_ms"] + self.info["tduration_ms"]
+
+    def __getattr__(self, name):
+        try:
+            return self.info[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f"Clip({self.info['title']!r}, {self.info['tstart_ms']:.1f}ms +{self.info['tduration_ms']:.1f}ms)"
+
+
+class Resource:
+    """View de um item de videolist/audiolist/imagelist."""
+
+    __slots__ = ("item", "kind")
+
+    def __init__(self, item, kind):
+        self.item = item
+        self.kind = kind
+
+    @property
+    def uuid(self):
+        return self.item["uuid"]
+
+    @property
+    def path(self):
+        return self.item["path"]
+
+    @property
+    def duration(self):
+        return self.item.get("duration", 0)
+
+    def __repr__(self):
+        return f"Resource({self.kind}, {self.path!r})"
+
+
+class Track:
+    """View de uma track da timeline."""
+
+    __slots__ = ("raw", "_clips")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._clips = None
+
+    @property
+    def type(self):
+        return self.raw["type"]
+
+    @property
+    def title(self):
+        return self.raw.get("title", "")
+
+    @property
+    def mute(self):
+        return self.raw.get("mute", False)
+
+    @property
+    def blocks(self):
+        return self.raw.get("subitems", [])
+
+    @property
+    def clips(self):
+        """Clips (MediaFileBlock) da track, na ordem do arquivo."""
+        if self._clips is None:
+            self._clips = [Clip(b) for b in self.blocks if b.get("type") == "MediaFileBlock"]
+        return self._clips
+
+    def __repr__(self):
+        return f"Track({self.type}, {self.title!r}, {len(self.blocks)} blocos)"
+
+
+class Project:
+    """Projeto .vpd parseado uma vez, com indices por uuid, resid e tipo de track."""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.path = os.path.abspath(doc.path)
+        self.dir = os.path.dirname(self.path)
+        self.name = os.path.splitext(os.path.basename(self.path))[0]
+        self.invalidate()
+
+    @classmethod
+    def load(cls, path):
+        return cls(VpdDocument.load(path))
+
+    @property
+    def data(self):
+        return self.doc.data
+
+    def invalidate(self):
+        """Descarta indices e views (chamar apos alterar self.data)."""
+        self._tracks = None
+        self._tracks_by_type = None
+        self._blocks_by_uuid = None
+        self._resources = None
+        self._intervals = {}
+
+    def reload_if_changed(self):
+        """Rele o arquivo se ele mudou no disco desde o load (descarta alteracoes em memoria)."""
+        if not self.doc.changed_on_disk():
+            return False
+        self.doc = VpdDocument.load(self.path)
+        self.invalidate()
+        return True
+
+    def save(self):
+        """Salva o projeto (escrita incremental e atomica)."""
+        self.doc.save(self.path)
+        self.invalidate()
+
+    # ------------------------------------------------------------------
+    # Propriedades do projeto
+    # ------------------------------------------------------------------
+
+    @property
+    def projinfo(self):
+        return self.data.get("projinfo", {})
+
+    @property
+    def timeline(self):
+        return self.data["timeline"]
+
+    @property
+    def context_ms(self):
+        """Duracao da timeline em ms (campo context)."""
+        return self.timeline.get("context", 0)
+
+    def player_info(self):
+        """(largura, altura, fps) do projeto."""
+        player = self.projinfo.get("player", {})
+        width = player.get("resolutionW", 1080)
+        height = player.get("resolutionH", 1920)
+        fps_num = player.get("frameRateNum", 30)
+        fps_den = player.get("frameRateDen", 1)
+        return width, height, fps_num / fps_den
+
+    # ------------------------------------------------------------------
+    # Indices
+    # ------------------------------------------------------------------
+
+    @property
+    def tracks(self):
+        if self._tracks is None:
+            self._tracks = [Track(t) for t in self.timeline.get("subitems", [])]
+        return self._tracks
+
+    def tracks_of(self, track_type):
+        """Tracks de um tipo, na ordem da timeline."""
+        if self._tracks_by_type is None:
+            by_type = {}
+            for track in self.tracks:
+                by_type.setdefault(track.type, []).append(track)
+            self._tracks_by_type = by_type
+        return self._tracks_by_type.get(track_type, [])
+
+    def track(self, track_type):
+        """Primeira track do tipo (ou None)."""
+        tracks = self.tracks_of(track_type)
+        return tracks[0] if tracks else None
+
+    def clips(self, track_type):
+        """Clips de todas as tracks do tipo, ordenados por tstart."""
+        clips = [c for track in self.tracks_of(track_type) for c in track.clips]
+        clips.sort(key=lambda c: c.tstart_ms)
+        return clips
+
+    def block_index(self, track_type=None):
+        """IntervalIndex dos blocos das tracks do tipo (ou de todas as tracks)."""
+        key = ("blocks", track_type)
+        if key not in self._intervals:
+            tracks = self.tracks if track_type is None else self.tracks_of(track_type)
+            self._intervals[key] = IntervalIndex.from_blocks(b for t in tracks for b in t.blocks)
+        return self._intervals[key]
+
+    def clip_index(self, track_type):
+        """IntervalIndex dos clips (Clip) das tracks do tipo."""
+        key = ("clips", track_type)
+        if key not in self._intervals:
+            self._intervals[key] = IntervalIndex.from_clips(self.clips(track_type))
+        return self._intervals[key]
+
+    @property
+    def blocks_by_uuid(self):
+        if self._blocks_by_uuid is None:
+            index = {}
+            for track in self.tracks:
+                for block in track.blocks:
+                    if "uuid" in block:
+                        index[block["uuid"]] = block
+            self._blocks_by_uuid = index
+        return self._blocks_by_uuid
+
+    def block(self, block_uuid):
+        return self.blocks_by_uuid.get(block_uuid)
+
+    @property
+    def resources(self):
+        """resid -> Resource, de videolist/audiolist/imagelist."""
+        if self._resources is None:
+            index = {}
+            for listkey in RESOURCE_LISTS:
+                for item in self.data.get(listkey, {}).get("subitems", []):
+                    if "uuid" in item and "path" in item:
+                        index[item["uuid"]] = Resource(item, listkey)
+            self._resources = index
+        return self._resources
+
+    def resource_path(self, resid):
+        """Caminho local (absoluto) do recurso, ou None se o resid nao existir."""
+        res = self.resources.get(resid)
+        if not res:
+            return None
+        return to_local_path(res.path, self.dir)
+
+    def detect_audio(self, prefer_enhanced=True):
+        return detect_audio(self.path, prefer_enhanced)
@@ -0,0 +1,359 @@
+"""
+vpd.stages — Grafo de etapas com manifests de hashes (estilo make)
+
+Cada etapa declara dependencias (outras etapas), entradas externas (hashes de
+arquivos, da timeline...), parametros e arquivos de saida. Depois de executar,
+o manifest guarda tudo isso mais o hash das saidas. Na proxima execucao a etapa
+so roda de novo se algo mudou: hash de uma dependencia, entrada, parametro, ou
+se uma saida sumiu/foi alterada.
+
+Etapas puladas nao produzem valor; se uma etapa seguinte precisar executar, o
+valor e reconstruido com stage.load() (ex.: reler o JSON do whisper) ou, sem
+load, a etapa e executada de novo.
+
+Manifest: <projeto>.vpd.stages.json (JSON, gravado atomicamente apos cada etapa).
+Hash de arquivos: sha1 do conteudo, com cache por (mtime_ns, tamanho) no manifest.
+
+Com run(workers=N > 1), etapas independentes (todas as dependencias prontas)
+rodam em paralelo em threads; util quando elas esperam subprocessos ou I/O
+(ex.: Adobe Enhance no navegador enquanto o Whisper transcreve).
+
+Lanes: cada etapa pode declarar uma lane ("cpu", "enhance", "transcribe:medium"...);
+com StageGraph(lanes=Lanes({...})) so N etapas de cada lane rodam ao mesmo tempo,
+mesmo com varios grafos (projetos) executando em paralelo e compartilhando as Lanes.
+
+Recursos: cada etapa executada roda dentro de vpd.usage.measure(); os Usage (pico
+de RSS, disco temporario, subprocessos, CPU dos filhos) ficam em graph.usage.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import trace, usage
+from .document import atomic_write
+
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".stages.json"
+HASH_CHUNK = 1024 * 1024
+
+
+def manifest_path(vpd_path):
+    return vpd_path + MANIFEST_SUFFIX
+
+
+def hash_value(value):
+    """sha1 de um valor serializavel em JSON (ordem de chaves estavel)."""
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(path):
+    """sha1 do conteudo do arquivo."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Lanes:
+    """Limite de etapas simultaneas por lane, compartilhado entre grafos.
+
+    limits mapeia lane -> vagas; "transcribe:medium" usa o limite de "transcribe"
+    mas tem vagas proprias (uma lane por modelo). Lanes sem limite nao esperam.
+    Guarda, por lane, o tempo total esperando vaga e o tempo ocupado.
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        # lane -> [etapas, segundos esperando, segundos ocupado]
+        self.stats = {}
+
+    def _semaphore(self, lane):
+        with self._lock:
+            if lane not in self._semaphores:
+                limit = self.limits.get(lane, self.limits.get(lane.split(":", 1)[0]))
+                self._semaphores[lane] = threading.BoundedSemaphore(limit) if limit else None
+                self.stats[lane] = [0, 0.0, 0.0]
+            return self._semaphores[lane]
+
+    def run(self, lane, func, *args):
+        """Executa func(*args) ocupando uma vaga da lane."""
+        semaphore = self._semaphore(lane)
+        queued = time.monotonic()
+        if semaphore is not None:
+            with trace.span(f"espera lane {lane}", "lane"):
+                semaphore.acquire()
+        started = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+            with self._lock:
+                stats = self.stats[lane]
+                stats[0] += 1
+                stats[1] += started - queued
+                stats[2] += time.monotonic() - started
+
+
+class Stage:
+    """Etapa do grafo.
+
+    run(values) -> valor, onde values mapeia cada dependencia ao seu valor.
+    inputs() -> {nome: hash} das entradas externas (avaliado na hora de decidir).
+    outputs: arquivos gerados pela etapa.
+    load() -> valor a partir das saidas, para quando a etapa foi pulada.
+    lane: recurso que a etapa ocupa enquanto roda (ver Lanes), ou None.
+    """
+
+    __slots__ = ("name", "run", "deps", "params", "inputs", "outputs", "load", "lane")
+
+    def __init__(self, name, run, deps=(), params=None, inputs=None, outputs=(), load=None, lane=None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.params = params or {}
+        self.inputs = inputs
+        self.outputs = [os.path.abspath(p) for p in outputs]
+        self.load = load
+        self.lane = lane
+
+
+class StageGraph:
+    """Executa etapas em ordem, pulando as que o manifest mostra atualizadas."""
+
+    def __init__(self, manifest_file, explain=False, force=(), lanes=None, on_event=None):
+        self.manifest_file = manifest_file
+        self.explain = explain
+        self.force = set(force)
+        self.lanes = lanes
+        # on_event(etapa, "start"|"done"|"skip"|"failed", segundos) — ex.: checkpoints da fila (vpd/jobs.py)
+        self.on_event = on_event
+        self.stages = {}
+        self.order = []
+        self.values = {}
+        self.hashes = {}
+        # nome -> ("run"|"skip", [motivos])
+        self.status = {}
+        # nome -> vpd.usage.Usage das etapas executadas
+        self.usage = {}
+        self.manifest = self._load_manifest()
+        # Protege manifest e valores quando etapas rodam em threads
+        self._lock = threading.RLock()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                manifest.setdefault("stages", {})
+                manifest.setdefault("files", {})
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {"version": MANIFEST_VERSION, "stages": {}, "files": {}}
+
+    def _save_manifest(self):
+        atomic_write(self.manifest_file, json.dumps(self.manifest, indent=2, ensure_ascii=False))
+
+    def file_hash(self, path):
+        """Hash do conteudo do arquivo (None se nao existe), com cache por mtime/tamanho."""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self.manifest["files"].get(path)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        digest = hash_file(path)
+        with self._lock:
+            self.manifest["files"][path] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def add(self, stage):
+        for dep in stage.deps:
+            if dep not in self.stages:
+                raise ValueError(f"etapa {stage.name}: dependencia desconhecida {dep}")
+        self.stages[stage.name] = stage
+        self.order.append(stage.name)
+        return stage
+
+    # ------------------------------------------------------------------
+    # Decisao
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _short(digest):
+        return digest[:10] if isinstance(digest, str) else digest
+
+    def _reasons(self, stage, record):
+        """Motivos para executar a etapa (lista vazia = atualizada)."""
+        if stage.name in self.force:
+            return ["forcada (--force)"]
+        previous = self.manifest["stages"].get(stage.name)
+        if previous is None:
+            return ["sem execucao anterior no manifest"]
+
+        reasons = []
+        labels = {"deps": "etapa", "inputs": "entrada", "params": "parametro"}
+        for section, label in labels.items():
+            old, new = previous.get(section, {}), record[section]
+            for key in sorted(set(old) | set(new)):
+                if old.get(key) != new.get(key):
+                    if self.explain:
+                        reasons.append(f"{label} '{key}' mudou ({self._short(old.get(key))} -> {self._short(new.get(key))})")
+                    else:
+                        reasons.append(f"{label} '{key}' mudou")
+        for path in stage.outputs:
+            saved = previous.get("outputs", {}).get(path)
+            current = self.file_hash(path)
+            if current is None:
+                reasons.append(f"saida ausente: {os.path.basename(path)}")
+            elif saved != current:
+                reasons.append(f"saida alterada: {os.path.basename(path)}")
+        return reasons
+
+    def _print_status(self, name, action, reasons):
+        if action == "run":
+            detail = reasons if self.explain else reasons[:1]
+            print(f"[{name}] executando: {'; '.join(detail)}")
+        else:
+            print(f"[{name}] atualizada, pulando" + (": " + "; ".join(reasons) if self.explain and reasons else ""))
+
+    # ------------------------------------------------------------------
+    # Execucao
+    # ------------------------------------------------------------------
+
+    def _record(self, stage):
+        return {
+            "deps": {dep: self.hashes[dep] for dep in stage.deps},
+            "inputs": stage.inputs() if stage.inputs else {},
+            "params": stage.params,
+        }
+
+    def _run_stage(self, stage, values):
+        with trace.span(f"etapa {stage.name}", "stage"):
+            if self.lanes is None or stage.lane is None:
+                return self._measured(stage, values)
+            return self.lanes.run(stage.lane, self._measured, stage, values)
+
+    def _measured(self, stage, values):
+        # Dentro da lane: a espera por vaga nao entra na conta da etapa
+        with usage.measure(stage.name) as used:
+            try:
+                return stage.run(values)
+            finally:
+                with self._lock:
+                    self.usage[stage.name] = used
+
+    def _notify(self, name, event, elapsed=None):
+        if self.on_event is not None:
+            self.on_event(name, event, elapsed)
+
+    def _execute(self, stage, record):
+        values = {dep: self.value(dep) for dep in stage.deps}
+        self._notify(stage.name, "start")
+        started = time.monotonic()
+        try:
+            value = self._run_stage(stage, values)
+        except BaseException:
+            self._notify(stage.name, "failed", time.monotonic() - started)
+            raise
+
+        outputs = {}
+        for path in stage.outputs:
+            digest = self.file_hash(path)
+            if digest is None:
+                raise RuntimeError(f"etapa {stage.name} nao gerou {path}")
+            outputs[path] = digest
+        output_hash = hash_value(outputs) if stage.outputs else hash_value(value)
+
+        with self._lock:
+            self.values[stage.name] = value
+            self.hashes[stage.name] = output_hash
+            self.manifest["stages"][stage.name] = dict(record, outputs=outputs, output_hash=output_hash)
+            self._save_manifest()
+        self._notify(stage.name, "done", time.monotonic() - started)
+
+    def value(self, name):
+        """Valor de uma etapa ja avaliada (reconstruido com load() ou reexecutando)."""
+        with self._lock:
+            if name not in self.values:
+                stage = self.stages[name]
+                if stage.load is not None:
+                    self.values[name] = stage.load()
+                else:
+                    print(f"[{name}] executando de novo: valor necessario para a etapa seguinte")
+                    self.values[name] = self._run_stage(stage, {dep: self.value(dep) for dep in stage.deps})
+            return self.values[name]
+
+    def _decide(self, name):
+        """Decide e registra se a etapa roda. Retorna (stage, record) se precisa rodar, senao None."""
+        stage = self.stages[name]
+        record = self._record(stage)
+        reasons = self._reasons(stage, record)
+        if reasons:
+            self._print_status(name, "run", reasons)
+            self.status[name] = ("run", reasons)
+            return stage, record
+        self._print_status(name, "skip", ["entradas, parametros e saidas inalterados"])
+        self.status[name] = ("skip", [])
+        self.hashes[name] = self.manifest["stages"][name]["output_hash"]
+        self._notify(name, "skip")
+        return None
+
+    def run(self, workers=1):
+        """Avalia todas as etapas (em paralelo se workers > 1). Retorna {nome: "run"|"skip"}."""
+        if workers <= 1:
+            for name in self.order:
+                todo = self._decide(name)
+                if todo:
+                    self._execute(*todo)
+        else:
+            self._run_parallel(workers)
+        # Atualiza o cache de hashes de arquivos mesmo quando tudo foi pulado
+        with self._lock:
+            self._save_manifest()
+        return {name: self.status[name][0] for name in self.order}
+
+    def _run_parallel(self, workers):
+        pending = list(self.order)
+        done = set()
+        running = {}
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage")
+        try:
+            while pending or running:
+                # Decide (na thread principal, em ordem) tudo que ja tem as dependencias prontas
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name in list(pending):
+                        if all(dep in done for dep in self.stages[name].deps):
+                            pending.remove(name)
+                            todo = self._decide(name)
+                            if todo:
+                                # Contexto copiado: a etapa herda o contexto de quem chamou run() (ex.: log do projeto)
+                                running[pool.submit(contextvars.copy_context().run, self._execute, *todo)] = name
+                            else:
+                                done.add(name)
+                                progressed = True
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    future.result()
+                    done.add(name)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,246 @@
+"""
+vpd.trace — Spans de tempo (wall, CPU, subprocessos, bytes) com Chrome trace
+
+Desligado por padrao: span() devolve um contexto nulo e nao mede nada. Com
+trace.start(), cada span registra:
+- wall: tempo de relogio
+- cpu: tempo de CPU da thread (time.thread_time)
+- children: CPU de subprocessos terminados durante o span (os.times; e por
+  processo, entao com etapas em paralelo o valor pode incluir filhos de outra thread)
+- read/written: bytes lidos/escritos pelo processo (/proc/self/io, so Linux;
+  mesma ressalva) — subprocessos nao entram, use span.set(bytes_out=...) neles
+
+Uso:
+    trace.start()
+    with trace.span("ffmpeg", "subprocess", desc="extrair audio") as sp:
+        ...
+        sp.set(bytes_out=os.path.getsize(saida))
+    trace.report("projeto.vpd.trace.json")  # grava o trace e imprime o resumo
+
+    with trace.session(caminho_ou_None):     # o mesmo, para o corpo de um main()
+        ...
+
+O JSON abre em chrome://tracing ou https://ui.perfetto.dev.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+TRACE_SUFFIX = ".trace.json"
+_PROC_IO = "/proc/self/io"
+
+_tracer = None
+
+
+def trace_path(vpd_path):
+    return vpd_path + TRACE_SUFFIX
+
+
+def _io_counters():
+    """(bytes lidos, bytes escritos) do processo, ou None fora do Linux."""
+    try:
+        with open(_PROC_IO, "rb") as f:
+            fields = dict(line.split(b":", 1) for line in f.read().splitlines())
+        return int(fields[b"rchar"]), int(fields[b"wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def children_cpu():
+    """CPU (user + sys) dos subprocessos ja terminados do processo (os.times)."""
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+class Tracer:
+    """Spans completos de uma execucao (todas as threads)."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.spans = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+            self.threads.setdefault(span.tid, threading.current_thread().name)
+
+    def chrome_events(self):
+        """Eventos no formato Chrome trace (ph "X" = span completo, tempos em us)."""
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self.threads.items()
+        ]
+        for sp in self.spans:
+            events.append({
+                "name": sp.name,
+                "cat": sp.cat or "vpd",
+                "ph": "X",
+                "ts": round((sp.start - self.origin) * 1e6, 1),
+                "dur": round(sp.wall * 1e6, 1),
+                "pid": self.pid,
+                "tid": sp.tid,
+                "args": dict(sp.args, cpu_s=round(sp.cpu, 6), children_s=round(sp.children, 6),
+                             read=sp.read, written=sp.written),
+            })
+        return events
+
+    def write_chrome(self, path):
+        from .document import atomic_write  # import local: document usa trace
+
+        atomic_write(path, json.dumps({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}))
+
+    def totals(self):
+        """{nome: [n, wall, cpu, filhos, lidos, escritos]} agregado por nome de span."""
+        totals = {}
+        for sp in self.spans:
+            row = totals.setdefault(sp.name, [0, 0.0, 0.0, 0.0, 0, 0])
+            row[0] += 1
+            row[1] += sp.wall
+            row[2] += sp.cpu
+            row[3] += sp.children
+            row[4] += sp.read or 0
+            row[5] += (sp.written or 0) + sp.args.get("bytes_out", 0)
+        return totals
+
+    def summary(self):
+        """Tabela de texto: spans agregados por nome, do maior wall para o menor."""
+        lines = [f"{'span':<28} {'n':>5} {'wall':>9} {'cpu':>9} {'filhos':>9} {'lido':>10} {'escrito':>10}"]
+        totals = sorted(self.totals().items(), key=lambda item: -item[1][1])
+        for name, (n, wall, cpu, children, read, written) in totals:
+            lines.append(f"{name[:28]:<28} {n:>5} {wall:>8.2f}s {cpu:>8.2f}s {children:>8.2f}s "
+                         f"{format_bytes(read):>10} {format_bytes(written):>10}")
+        return "\n".join(lines)
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+class Span:
+    """Span em andamento (context manager). set() acrescenta dados ao span."""
+
+    __slots__ = ("tracer", "name", "cat", "args", "tid", "start", "wall", "cpu", "children",
+                 "read", "written", "_cpu0", "_children0", "_io0")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.read = self.written = None
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        self.tid = threading.get_ident()
+        self._io0 = _io_counters()
+        self._children0 = children_cpu()
+        self._cpu0 = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = time.thread_time() - self._cpu0
+        self.children = children_cpu() - self._children0
+        io1 = _io_counters()
+        if self._io0 and io1:
+            self.read = io1[0] - self._io0[0]
+            self.written = io1[1] - self._io0[1]
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add(self)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def start():
+    """Liga o trace (descarta spans anteriores) e devolve o Tracer."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop():
+    """Desliga o trace e devolve o Tracer (ou None se nao estava ligado)."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def enabled():
+    return _tracer is not None
+
+
+def span(name, cat="", **args):
+    """Context manager que mede o bloco (no-op com o trace desligado)."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return Span(_tracer, name, cat, args)
+
+
+def traced(name=None, cat=""):
+    """Decorator: cada chamada da funcao vira um span."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with Span(_tracer, span_name, cat, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def report(path):
+    """Desliga o trace, grava o Chrome trace em path e imprime o resumo."""
+    tracer = stop()
+    if tracer is None:
+        return None
+    tracer.write_chrome(path)
+    print(f"\n=== Trace ===")
+    print(tracer.summary())
+    print(f"Chrome trace: {path} (chrome://tracing ou ui.perfetto.dev)")
+    return tracer
+
+
+@contextlib.contextmanager
+def session(path):
+    """Trace ligado durante o bloco, com report(path) no fim (mesmo com erro). path None = desligado."""
+    if path is None:
+        yield
+        return
+    start()
+    try:
+        yield
+    finally:
+        report(path)
@@ -0,0 +1,250 @@
+"""
+vpd.usage — Contabilidade de recursos por etapa (RSS, disco temporario, subprocessos)
+
+Cada etapa roda dentro de measure(nome), que devolve um Usage com:
+- peak_rss_kb: pico de RSS do processo durante a etapa (VmHWM, so Linux). O pico
+  so e zerado quando nenhuma outra etapa esta medindo; com etapas em paralelo o
+  valor e o pico do processo no periodo (limite superior)
+- temp_written: bytes gravados em pastas temporarias registradas (temp_dir)
+- temp_peak: maior tamanho atingido por uma pasta temporaria durante a etapa
+- subprocesses / children_cpu: subprocessos iniciados com run() e o CPU dos
+  filhos terminados durante cada um (os.times; por processo, mesma ressalva do
+  vpd.trace com etapas em paralelo)
+
+A pasta temporaria e contabilizada pelos arquivos que os scripts informam com
+wrote(caminho) (ex.: a saida de cada ffmpeg), sem varrer a pasta. Com max_bytes,
+wrote() levanta TempSpaceError assim que a pasta passa do limite, e
+check_estimate() permite falhar antes de comecar.
+
+Uso:
+    with usage.measure("render") as u, usage.temp_dir(pasta, max_bytes=2 * 1024**3):
+        usage.check_estimate(pasta, estimativa)
+        usage.run(["ffmpeg", ..., saida])
+        usage.wrote(saida)
+    print(usage.format_table({"render": u}))
+"""
+
+import contextlib
+import contextvars
+import os
+import re
+import subprocess
+import threading
+import time
+
+from .trace import children_cpu, format_bytes
+
+
+_current = contextvars.ContextVar("vpd_usage", default=None)
+_lock = threading.Lock()
+_active = 0
+_temp_dirs = {}
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+class TempSpaceError(Exception):
+    """A pasta temporaria passou (ou vai passar) do limite de bytes."""
+
+
+class Usage:
+    """Recursos consumidos por uma etapa."""
+
+    __slots__ = ("name", "wall", "peak_rss_kb", "temp_written", "temp_peak", "subprocesses", "children_cpu")
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.peak_rss_kb = None
+        self.temp_written = 0
+        self.temp_peak = 0
+        self.subprocesses = 0
+        self.children_cpu = 0.0
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+
+class TempDir:
+    """Tamanho (estimado pelos arquivos informados) de uma pasta temporaria."""
+
+    __slots__ = ("path", "max_bytes", "sizes", "current", "peak", "written")
+
+    def __init__(self, path, max_bytes=None):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.sizes = {}
+        self.current = 0
+        self.peak = 0
+        self.written = 0
+
+    def scan(self):
+        """Conta os arquivos que ja estao na pasta (ex.: fontes extraidas numa tentativa anterior)."""
+        for root, _dirs, files in os.walk(self.path):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    self.sizes[path] = os.path.getsize(path)
+                except OSError:
+                    continue
+        self.current = self.peak = sum(self.sizes.values())
+
+    def update(self, path):
+        """Registra o tamanho atual de path (0 se foi removido). Retorna os bytes novos."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        old = self.sizes.pop(path, 0)
+        if size:
+            self.sizes[path] = size
+        self.current += size - old
+        self.peak = max(self.peak, self.current)
+        grown = max(0, size - old)
+        self.written += grown
+        return grown
+
+    def check(self, extra=0, what="pasta temporaria"):
+        if self.max_bytes is not None and self.current + extra > self.max_bytes:
+            raise TempSpaceError(
+                f"{what} em {self.path}: {format_bytes(self.current + extra)} passa do limite "
+                f"--max-temp-bytes {format_bytes(self.max_bytes)}")
+
+
+# ----------------------------------------------------------------------
+# Medida
+# ----------------------------------------------------------------------
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_kb():
+    """Pico de RSS do processo (kB) desde o ultimo reset (VmHWM), ou None fora do Linux."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+@contextlib.contextmanager
+def measure(name):
+    """Mede o bloco; run()/wrote() dentro dele (mesmo contexto) entram no Usage devolvido."""
+    global _active
+    usage = Usage(name)
+    with _lock:
+        if _active == 0:
+            _reset_peak_rss()
+        _active += 1
+    token = _current.set(usage)
+    started = time.perf_counter()
+    try:
+        yield usage
+    finally:
+        usage.wall = time.perf_counter() - started
+        usage.peak_rss_kb = peak_rss_kb()
+        _current.reset(token)
+        with _lock:
+            _active -= 1
+
+
+def current():
+    return _current.get()
+
+
+def run(cmd, **kwargs):
+    """subprocess.run contado no Usage atual (numero de subprocessos e CPU dos filhos)."""
+    usage = _current.get()
+    cpu0 = children_cpu()
+    try:
+        return subprocess.run(cmd, **kwargs)
+    finally:
+        if usage is not None:
+            with _lock:
+                usage.subprocesses += 1
+                usage.children_cpu += children_cpu() - cpu0
+
+
+# ----------------------------------------------------------------------
+# Pastas temporarias
+# ----------------------------------------------------------------------
+
+@contextlib.contextmanager
+def temp_dir(path, max_bytes=None):
+    """Contabiliza a pasta durante o bloco (com limite opcional de bytes)."""
+    tracker = TempDir(path, max_bytes)
+    tracker.scan()
+    tracker.check()
+    with _lock:
+        _temp_dirs[tracker.path] = tracker
+    try:
+        yield tracker
+    finally:
+        with _lock:
+            _temp_dirs.pop(tracker.path, None)
+
+
+def _tracker_for(path):
+    parent = os.path.dirname(os.path.abspath(path))
+    while True:
+        tracker = _temp_dirs.get(parent)
+        if tracker is not None:
+            return tracker
+        up = os.path.dirname(parent)
+        if up == parent:
+            return None
+        parent = up
+
+
+def wrote(*paths):
+    """Informa arquivos criados, alterados ou removidos. Levanta TempSpaceError acima do limite."""
+    usage = _current.get()
+    for path in paths:
+        with _lock:
+            tracker = _tracker_for(path)
+            if tracker is None:
+                continue
+            grown = tracker.update(os.path.abspath(path))
+            if usage is not None:
+                usage.temp_written += grown
+                usage.temp_peak = max(usage.temp_peak, tracker.current)
+        tracker.check()
+
+
+def check_estimate(path, estimate):
+    """Falha antes de comecar se a pasta + estimate passaria do limite."""
+    with _lock:
+        tracker = _temp_dirs.get(os.path.abspath(path))
+    if tracker is not None:
+        tracker.check(estimate, what="estimativa da pasta temporaria")
+
+
+def parse_size(text):
+    """'500M', '2G', '1.5g', '1048576' -> bytes (argparse type)."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kKmMgGtT]?)i?[bB]?\s*", text)
+    if not match:
+        raise ValueError(f"tamanho invalido: {text!r} (ex.: 500M, 2G)")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+# ----------------------------------------------------------------------
+# Resumo
+# ----------------------------------------------------------------------
+
+def format_table(usages):
+    """Tabela de texto de {etapa: Usage}."""
+    lines = [f"{'etapa':<12} {'tempo':>8} {'pico RSS':>10} {'temp escrito':>13} {'pico temp':>10} "
+             f"{'subproc':>8} {'CPU filhos':>11}"]
+    for name, u in usages.items():
+        rss = format_bytes(u.peak_rss_kb * 1024) if u.peak_rss_kb is not None else "-"
+        lines.append(f"{name[:12]:<12} {u.wall:>7.2f}s {rss:>10} {format_bytes(u.temp_written):>13} "
+                     f"{format_bytes(u.temp_peak):>10} {u.subprocesses:>8} {u.children_cpu:>10.2f}s")
+    return "\n".join(lines)